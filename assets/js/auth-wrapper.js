@@ -41,5 +41,19 @@ const AUTH = (() => {
   async function post(path, body){ return request('POST', path, body); }
   function isLoggedIn(){ return BYPASS || !!token(); }
   function hasRole(role){ const u=currentUser(); return u && u.role===role; }
-  return { login, logout, token, currentUser, get, post, isLoggedIn, hasRole };
+  // Server push with polling fallback: onMessage(topic, data) per change; fallback() starts polling and returns a stop function
+  function subscribe(path, topics, onMessage, fallback){
+    let stopPoll = null;
+    const poll = ()=>{ if(!stopPoll && fallback) stopPoll = fallback(); };
+    const unpoll = ()=>{ if(stopPoll){ stopPoll(); stopPoll = null; } };
+    if(typeof EventSource === 'undefined'){ poll(); return unpoll; }
+    // Demo streams are public; never put the access token in a URL (it ends up in access logs)
+    const url = API_BASE + path + '?topics=' + encodeURIComponent(topics.join(','));
+    const es = new EventSource(url);
+    topics.forEach(topic => es.addEventListener(topic, ev => { unpoll(); try{ onMessage(topic, JSON.parse(ev.data)); }catch(e){} }));
+    es.onopen = unpoll;
+    es.onerror = poll; // EventSource keeps reconnecting by itself; poll in the meantime
+    return ()=>{ es.close(); unpoll(); };
+  }
+  return { login, logout, token, currentUser, get, post, isLoggedIn, hasRole, subscribe };
 })();
@@ -469,14 +469,18 @@ const FLOW_LIVE = (()=>{
     return arr;
   }
 
-  async function pollOnce(simBadge){
-    const [lines, orders] = await Promise.all([API.lines(), API.orders()]);
+  function applyData(lines, orders, simBadge){
     const useSim = !orders.length;
     const dataOrders = useSim ? makeSimOrders(lines) : orders;
     setTokens(dataOrders);
     if(simBadge) simBadge.style.display = useSim ? 'inline-block' : 'none';
   }
 
+  async function pollOnce(simBadge){
+    const [lines, orders] = await Promise.all([API.lines(), API.orders()]);
+    applyData(lines, orders, simBadge);
+  }
+
   const origStart = window.FLOW_LIVE.start;
   window.FLOW_LIVE.start = async function(domHost, sidePanel){
     if(started) return;
@@ -491,7 +495,12 @@ const FLOW_LIVE = (()=>{
     await pollOnce(simBadge);
 
     if(!rafId) step();
-    setInterval(()=>{ pollOnce(simBadge); }, 3000);
+    // Push updates on change; poll every 3s only while the stream is unavailable
+    const latest = { lines: [], orders: [] };
+    AUTH.subscribe('/api/v1/stream', ['lines','orders'], (topic, data)=>{
+      latest[topic] = data[topic] || [];
+      applyData(latest.lines, latest.orders, simBadge);
+    }, ()=>{ const id=setInterval(()=>{ pollOnce(simBadge); }, 3000); return ()=>clearInterval(id); });
   };
 
   try{ console.log('[Zero@Factory] flow_live-enhance-v2 active'); }catch(e){}
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# Requests/sec per read endpoint against a running server, plus in-process encode timings.
+#   python benchmark_payloads.py --url http://127.0.0.1:8084                       # serve_tolkar
+#   python benchmark_payloads.py --url http://127.0.0.1:8000 --paths /api/state,/api/v1/lines,/api/v1/orders
+#   python benchmark_payloads.py --url http://127.0.0.1:5000 --login admin:admin123 --paths /api/state,/api/events
+#   python benchmark_payloads.py --encode-only
+import argparse, http.client, json, statistics, sys, time
+from urllib.parse import urlparse
+
+DEFAULT_PATHS = "/api/state,/api/v1/status,/api/v1/lines,/api/v1/stations,/api/v1/orders,/api/v1/events"
+
+def login(conn, creds):
+    username, _, password = creds.partition(":")
+    conn.request("POST", "/api/login", body=json.dumps({"username": username, "password": password}), headers={"Content-Type": "application/json"})
+    data = json.loads(conn.getresponse().read() or b"{}")
+    token = data.get("access_token") or data.get("token")
+    if not token:
+        sys.exit(f"login failed: {data}")
+    return {"Authorization": "Bearer " + token}
+
+def bench_path(conn, path, headers, seconds):
+    samples = []
+    errors = 0
+    conn.request("GET", path, headers=headers)
+    conn.getresponse().read()  # warm-up (first build/encode)
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        conn.request("GET", path, headers=headers)
+        res = conn.getresponse()
+        res.read()
+        samples.append((time.perf_counter() - start) * 1000)
+        if res.status >= 400:
+            errors += 1
+    samples.sort()
+    return {"path": path, "requests": len(samples), "errors": errors, "rps": round(len(samples) / seconds, 1),
+            "p50_ms": round(statistics.median(samples), 3), "p99_ms": round(samples[max(int(len(samples) * 0.99) - 1, 0)], 3)}
+
+def bench_encode(rounds):
+    # Encoding cost for the serve_tolkar payloads: stdlib json, fast encoder, cached bytes
+    import serve_tolkar
+    from payloads import dumps, PayloadCache, ENCODER
+    doc = {"stations": serve_tolkar.STATIONS, "lines": serve_tolkar.LINES, "orders": serve_tolkar.ORDERS, "last_sync": 0}
+    cache = PayloadCache()
+    cases = [
+        ("json.dumps", lambda: json.dumps(doc, ensure_ascii=False).encode("utf-8")),
+        (ENCODER + ".dumps", lambda: dumps(doc)),
+        ("cached", lambda: cache.get("state", 0, lambda: doc)),
+    ]
+    out = []
+    for name, fn in cases:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        elapsed = time.perf_counter() - start
+        out.append({"encoder": name, "per_sec": round(rounds / elapsed), "us_per_call": round(elapsed / rounds * 1e6, 3)})
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Requests/sec per read endpoint")
+    ap.add_argument("--url", default="http://127.0.0.1:8084")
+    ap.add_argument("--paths", default=DEFAULT_PATHS, help="comma separated GET paths")
+    ap.add_argument("--seconds", type=float, default=3.0, help="duration per endpoint")
+    ap.add_argument("--login", default=None, help="user:password for servers that require a bearer token")
+    ap.add_argument("--encode-rounds", type=int, default=100000)
+    ap.add_argument("--encode-only", action="store_true")
+    ap.add_argument("--json", dest="json_path", default=None, help="write results as JSON to this path")
+    args = ap.parse_args()
+
+    results = {"encode": bench_encode(args.encode_rounds)}
+    for row in results["encode"]:
+        print(f"{row['encoder']:>14}: {row['per_sec']:>10,}/s  {row['us_per_call']} us")
+
+    if not args.encode_only:
+        u = urlparse(args.url)
+        conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=10)
+        headers = {"Connection": "keep-alive"}
+        if args.login:
+            headers.update(login(conn, args.login))
+        results["url"] = args.url
+        results["endpoints"] = []
+        for path in [p for p in args.paths.split(",") if p]:
+            row = bench_path(conn, path, headers, args.seconds)
+            results["endpoints"].append(row)
+            print(f"{path:<24} {row['rps']:>9} req/s  p50={row['p50_ms']}ms p99={row['p99_ms']}ms errors={row['errors']}")
+        conn.close()
+
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"results written to {args.json_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import os
+import sys
+
+# The push fan-out is shared with the factory app (tolkar-factory/fanout.py); only the
+# demo's volatile keys live here. The demo streams are public, so no session checks are
+# wired in. Appended, not prepended, so the demo's own modules still win on name clashes.
+_FACTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tolkar-factory")
+if _FACTORY_DIR not in sys.path:
+    sys.path.append(_FACTORY_DIR)
+
+import fanout
+from fanout import Message, Subscriber, sse_stream, serve_websocket
+
+# Keys that change on every build without the state changing
+VOLATILE_KEYS = {"ts", "last_sync", "timestamp", "updated_ts", "eta_ts", "start_ts", "since_ts"}
+
+def stable_digest(payload, volatile=VOLATILE_KEYS):
+    return fanout.stable_digest(payload, volatile)
+
+class Broadcaster(fanout.Broadcaster):
+    def __init__(self, max_queue=100, slow_consumer_seconds=30):
+        super().__init__(max_queue, slow_consumer_seconds, volatile=VOLATILE_KEYS)
@@ -15,5 +15,36 @@ class Settings:
     SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
     ALGORITHM = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+    PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "12"))
+    PARTITION_RETENTION_ACTION = os.getenv("PARTITION_RETENTION_ACTION", "detach")
+    BROADCAST_POLL_SECONDS = float(os.getenv("BROADCAST_POLL_SECONDS", "2"))
+    BROADCAST_HEARTBEAT_SECONDS = float(os.getenv("BROADCAST_HEARTBEAT_SECONDS", "15"))
+    BROADCAST_MAX_QUEUE = int(os.getenv("BROADCAST_MAX_QUEUE", "100"))
+    BROADCAST_SLOW_CONSUMER_SECONDS = float(os.getenv("BROADCAST_SLOW_CONSUMER_SECONDS", "30"))
+    PARTITION_CHECK_INTERVAL_SECONDS = int(os.getenv("PARTITION_CHECK_INTERVAL_SECONDS", "3600"))
+    COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+    COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+    SERVE_MODE = os.getenv("SERVE_MODE", "threaded")
+    SERVE_PORT = int(os.getenv("SERVE_PORT", "8084"))
+    SERVE_KEEPALIVE_SECONDS = float(os.getenv("SERVE_KEEPALIVE_SECONDS", "15"))
+    SERVE_LOG_SAMPLE = float(os.getenv("SERVE_LOG_SAMPLE", "0.01"))
+    SERVE_LOG_INTERVAL_SECONDS = float(os.getenv("SERVE_LOG_INTERVAL_SECONDS", "60"))
+    STATIC_MEMORY_FILE_MAX_BYTES = int(os.getenv("STATIC_MEMORY_FILE_MAX_BYTES", str(4 * 1024 * 1024)))
+    STATIC_CACHE_MAX_BYTES = int(os.getenv("STATIC_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+    ASSET_GZIP_LEVEL = int(os.getenv("ASSET_GZIP_LEVEL", "9"))
+    ASSET_BROTLI_QUALITY = int(os.getenv("ASSET_BROTLI_QUALITY", "11"))
+    SIM_COLUMNAR = os.getenv("SIM_COLUMNAR", "False").lower() == "true"
+    SIM_STATIONS = int(os.getenv("SIM_STATIONS", "1000"))
+    SIM_TELEMETRY_CAPACITY = int(os.getenv("SIM_TELEMETRY_CAPACITY", "288"))
+    SIM_TELEMETRY_MAX_ROWS = int(os.getenv("SIM_TELEMETRY_MAX_ROWS", "100000"))
+    SIM_EVENT_MAX_ROWS = int(os.getenv("SIM_EVENT_MAX_ROWS", "10000"))
+    SIM_LINE_SEED = int(os.getenv("SIM_LINE_SEED", "1"))
+    SCENARIO_WORKERS = int(os.getenv("SCENARIO_WORKERS", "0"))  # 0 = one per CPU
+    SCENARIO_MAX_SCENARIOS = int(os.getenv("SCENARIO_MAX_SCENARIOS", "256"))
+    SCENARIO_MAX_SECONDS = int(os.getenv("SCENARIO_MAX_SECONDS", str(7 * 24 * 3600)))
+    SCENARIO_MAX_REPLICATIONS = int(os.getenv("SCENARIO_MAX_REPLICATIONS", "10"))
+    SCENARIO_CACHE_SIZE = int(os.getenv("SCENARIO_CACHE_SIZE", "1024"))
 
 settings = Settings()
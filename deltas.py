@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from broadcast import stable_digest
+
+class VersionClock:
+    # Monotonic state version shared by every tracker
+    def __init__(self):
+        self.value = 0
+
+    def bump(self):
+        self.value += 1
+        return self.value
+
+class DeltaTracker:
+    # Per-key change tracking for keyed collections (lines, stations, orders), or an
+    # append log when key is None (events). since(v) returns None when v is too old.
+    def __init__(self, clock, key=None, max_history=1000):
+        self.clock = clock
+        self.key = key
+        self.max_history = max_history
+        self.items = OrderedDict()  # key -> [version, digest, item]
+        self.removed = OrderedDict()  # key -> version removed (bounded)
+        self.floor = 0  # oldest version deltas can be computed from
+        self.version = 0  # version of the last change this tracker saw
+
+    def _key(self, item):
+        # Append logs identify entries by full content, timestamps included
+        return item.get(self.key) if self.key else stable_digest(item, volatile=())
+
+    def observe(self, items):
+        items = items or []
+        changed = []
+        seen = set()
+        for item in items:
+            k = self._key(item)
+            seen.add(k)
+            digest = stable_digest(item) if self.key else k
+            cur = self.items.get(k)
+            if cur is None or cur[1] != digest:
+                changed.append((k, digest, item))
+            elif self.key:
+                cur[2] = item
+        gone = [k for k in self.items if k not in seen]
+        if not self.key:
+            # Entries that fell off the source log are forgotten, not reported as removed
+            for k in gone:
+                del self.items[k]
+            gone = []
+        if not changed and not gone:
+            return self.version
+        version = self.version = self.clock.bump()
+        for k, digest, item in changed:
+            self.items.pop(k, None)
+            self.removed.pop(k, None)
+            self.items[k] = [version, digest, item]
+        for k in gone:
+            del self.items[k]
+            self.removed[k] = version
+        # Forget the oldest removals past max_history; older versions then need a full resync
+        while len(self.removed) > self.max_history:
+            _, v = self.removed.popitem(last=False)
+            self.floor = max(self.floor, v)
+        return version
+
+    def since(self, version):
+        if version < self.floor or version > self.clock.value:
+            return None
+        changed = [(v, item) for v, _, item in self.items.values() if v > version]
+        if not self.key:
+            # Newest batch first, matching the order of the full event list
+            changed.sort(key=lambda c: -c[0])
+        changed = [item for _, item in changed]
+        removed = [k for k, v in self.removed.items() if v > version]
+        return changed, removed
+
+def delta_response(doc, name, tracker, since):
+    # doc is the full document, already observed by tracker and stamped with its version;
+    # returns only the changes since `since`, or the full document when it is too old
+    delta = tracker.since(since)
+    if delta is None:
+        return {**doc, "full": True}
+    changed, removed = delta
+    out = {**doc, name: changed, "since": since, "full": False}
+    if tracker.key:
+        out["removed"] = removed
+    return out
@@ -1,22 +1,22 @@
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import Session
-from datetime import datetime
 from config import settings
 from models import Base, Factory, Station
+from partitions import ensure_partitions
 
 def init_database():
     engine = create_engine(settings.DATABASE_URL)
     Base.metadata.create_all(bind=engine)
-    with engine.connect() as conn:
+    with engine.begin() as conn:
         conn.execute(text("""
         DO $$
         BEGIN
           IF NOT EXISTS (
             SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
-            WHERE c.relname = 'telemetry_history' AND c.relkind = 'r'
+            WHERE c.relname = 'telemetry_history' AND c.relkind IN ('r', 'p')
           ) THEN
             CREATE TABLE telemetry_history (
-              id BIGSERIAL PRIMARY KEY,
+              id BIGSERIAL,
               station_id INTEGER NOT NULL REFERENCES stations(id) ON DELETE CASCADE,
               timestamp TIMESTAMP NOT NULL,
               oee DECIMAL(5,2),
@@ -26,30 +26,13 @@ def init_database():
               power_kw DECIMAL(8,2),
               temperature_c DECIMAL(5,2),
               vibration_mm_s DECIMAL(5,2),
-              cycle_count INTEGER
+              cycle_count INTEGER,
+              PRIMARY KEY (id, timestamp)
             ) PARTITION BY RANGE (timestamp);
           END IF;
         END$$;
         """))
-        now = datetime.utcnow()
-        part_name = f"telemetry_history_{now.year}_{str(now.month).zfill(2)}"
-        start_month = f"{now.year}-{str(now.month).zfill(2)}-01"
-        if now.month == 12:
-            end_year = now.year + 1
-            end_month = 1
-        else:
-            end_year = now.year
-            end_month = now.month + 1
-        end_month_str = f"{end_year}-{str(end_month).zfill(2)}-01"
-        conn.execute(text(f"""
-        DO $$
-        BEGIN
-          IF NOT EXISTS (SELECT 1 FROM pg_class WHERE relname = '{part_name}') THEN
-            CREATE TABLE {part_name} PARTITION OF telemetry_history
-            FOR VALUES FROM ('{start_month}') TO ('{end_month_str}');
-          END IF;
-        END$$;
-        """))
+        ensure_partitions(conn)
     with Session(engine) as session:
         if not session.query(Factory).first():
             factory = Factory(name="Bursa Plant", location="Bursa, Turkey", timezone="Europe/Istanbul", target_oee=80.0)
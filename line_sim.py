@@ -0,0 +1,221 @@
+import heapq
+import random
+import time
+
+# Discrete-event model of the serial line Washing -> ... -> Packaging. Units flow through
+# stations with stochastic cycle times, finite input buffers (blocking after service),
+# scrap at each station (1 - fpy) and operation-dependent failures (exponential time to
+# failure / repair). WIP, OEE, lead time and the bottleneck come out of the run instead
+# of being set by hand. Events sit in one heap keyed (time, seq), so an 8-hour shift
+# (a few thousand events) fast-forwards in milliseconds.
+SHIFT_SECONDS = 8 * 3600
+FINISH, FAIL, REPAIR = 0, 1, 2
+IDLE, BUSY, BLOCKED, DOWN = "idle", "busy", "blocked", "down"
+
+def station_params(stations, buffer=10, mtbf=3600.0, ct_cv=0.1):
+    # Model parameters from Simulator-style station dicts. Repair time is chosen so that
+    # availability alone matches the station's nominal OEE: mttr = mtbf * (1 - a) / a.
+    out = []
+    for s in stations:
+        a = min(max(s.get("oee", 95.0) / 100.0, 0.05), 0.999)
+        out.append({"name": s["name"], "ct": float(s["ct"]), "ct_cv": ct_cv, "fpy": s.get("fpy", 100.0),
+                    "buffer": max(int(s.get("buffer", buffer)), 1), "wip": int(s.get("wip", 0)),
+                    "mtbf": mtbf, "mttr": mtbf * (1 - a) / a})
+    return out
+
+class Station:
+    __slots__ = ("name", "ct", "ct_cv", "fpy", "cap", "mtbf", "mttr", "queue", "state", "since",
+                 "held", "remaining", "ttf", "times", "done", "scrap", "wip_area", "wip_since")
+
+    def __init__(self, p, rng):
+        self.name = p["name"]
+        self.ct = p["ct"]
+        self.ct_cv = p.get("ct_cv", 0.1)
+        self.fpy = p.get("fpy", 100.0) / 100.0
+        self.cap = p.get("buffer", 10)
+        self.mtbf = p.get("mtbf", 0)
+        self.mttr = p.get("mttr", 0)
+        self.queue = []  # entry times of units waiting in the input buffer, oldest first
+        self.state = IDLE
+        self.since = 0.0
+        self.held = None  # entry time of the unit being processed or waiting to move on
+        self.remaining = 0.0
+        self.ttf = rng.expovariate(1.0 / self.mtbf) if self.mtbf > 0 and self.mttr > 0 else float("inf")
+        self.times = {IDLE: 0.0, BUSY: 0.0, BLOCKED: 0.0, DOWN: 0.0}
+        self.done = 0
+        self.scrap = 0
+        self.wip_area = 0.0
+        self.wip_since = 0.0
+
+class LineSim:
+    def __init__(self, params, seed=None, start=0.0):
+        self.rng = random.Random(seed)
+        self.stations = [Station(p, self.rng) for p in params]
+        self.now = start
+        self.start = start
+        self.heap = []
+        self.seq = 0
+        self.events = 0
+        self.output = 0
+        self.lead_sum = 0.0
+        for i, (st, p) in enumerate(zip(self.stations, params)):
+            st.since = st.wip_since = start
+            if i:
+                st.queue = [start] * min(p.get("wip", 0), st.cap)
+        for i in range(len(self.stations)):
+            self._try_start(i)
+
+    def _push(self, t, kind, i):
+        self.seq += 1
+        heapq.heappush(self.heap, (t, self.seq, kind, i))
+
+    def _set(self, st, state):
+        st.times[st.state] += self.now - st.since
+        st.state = state
+        st.since = self.now
+
+    def _queue_changed(self, st):
+        st.wip_area += len(st.queue) * (self.now - st.wip_since)
+        st.wip_since = self.now
+
+    def _cycle(self, st):
+        ct = self.rng.gauss(st.ct, st.ct * st.ct_cv) if st.ct_cv else st.ct
+        return max(ct, st.ct * 0.2)
+
+    def _run(self, i, pt):
+        # Process for pt seconds of operating time, failing part-way if ttf runs out
+        st = self.stations[i]
+        if st.ttf < pt:
+            st.remaining = pt - st.ttf
+            self._push(self.now + st.ttf, FAIL, i)
+            st.ttf = 0.0
+        else:
+            st.ttf -= pt
+            self._push(self.now + pt, FINISH, i)
+
+    def _try_start(self, i):
+        st = self.stations[i]
+        if st.state != IDLE:
+            return
+        if i == 0:
+            st.held = self.now  # raw material is always available
+        elif st.queue:
+            self._queue_changed(st)
+            st.held = st.queue.pop(0)
+        else:
+            return
+        self._set(st, BUSY)
+        self._run(i, self._cycle(st))
+        if i:
+            self._unblock(i - 1)  # the freed buffer slot may release the upstream station
+
+    def _unblock(self, i):
+        st = self.stations[i]
+        if st.state == BLOCKED:
+            self._move(i)
+
+    def _move(self, i):
+        # Hand the finished unit downstream, or block until there is room
+        st = self.stations[i]
+        if i == len(self.stations) - 1:
+            self.output += 1
+            self.lead_sum += self.now - st.held
+        else:
+            nxt = self.stations[i + 1]
+            if len(nxt.queue) >= nxt.cap:
+                if st.state != BLOCKED:
+                    self._set(st, BLOCKED)
+                return
+            self._queue_changed(nxt)
+            nxt.queue.append(st.held)
+        st.held = None
+        self._set(st, IDLE)
+        if i + 1 < len(self.stations):
+            self._try_start(i + 1)
+        self._try_start(i)
+
+    def _finish(self, i):
+        st = self.stations[i]
+        if self.rng.random() >= st.fpy:
+            st.scrap += 1
+            st.held = None
+            self._set(st, IDLE)
+            self._try_start(i)
+            return
+        st.done += 1
+        self._move(i)
+
+    def run(self, seconds=SHIFT_SECONDS, listener=None):
+        # Fast-forward: process every event up to now + seconds. listener(t, kind, station)
+        # sees each event, e.g. to replay the run as a load source.
+        until = self.now + seconds
+        heap = self.heap
+        while heap and heap[0][0] <= until:
+            t, _, kind, i = heapq.heappop(heap)
+            self.now = t
+            self.events += 1
+            st = self.stations[i]
+            if kind == FINISH:
+                self._finish(i)
+            elif kind == FAIL:
+                self._set(st, DOWN)
+                self._push(t + self.rng.expovariate(1.0 / st.mttr), REPAIR, i)
+            else:
+                st.ttf = self.rng.expovariate(1.0 / st.mtbf)
+                self._set(st, BUSY)
+                self._run(i, st.remaining)
+            if listener:
+                listener(t, kind, st.name)
+        self.now = until
+        return self.result()
+
+    def result(self):
+        elapsed = max(self.now - self.start, 1e-9)
+        stations = []
+        for st in self.stations:
+            times = dict(st.times)
+            times[st.state] += self.now - st.since
+            wip = (st.wip_area + len(st.queue) * (self.now - st.wip_since)) / elapsed
+            up = elapsed - times[DOWN]
+            made = st.done + st.scrap
+            availability = up / elapsed
+            performance = min(made * st.ct / up, 1.0) if up > 0 else 0.0
+            quality = st.done / made if made else 1.0
+            stations.append({
+                "name": st.name,
+                "wip": round(wip + (times[BUSY] + times[BLOCKED] + times[DOWN]) / elapsed, 2),
+                "oee": round(availability * performance * quality * 100, 1),
+                "fpy": round(quality * 100, 1),
+                "utilization": round(times[BUSY] / elapsed, 3),
+                "blocked": round(times[BLOCKED] / elapsed, 3),
+                "starved": round(times[IDLE] / elapsed, 3),
+                "down": round(times[DOWN] / elapsed, 3),
+                "done": st.done,
+                "scrap": st.scrap,
+            })
+        # Bottleneck: the station that is least often starved or blocked
+        active = [s["utilization"] + s["down"] for s in stations]
+        bottleneck = active.index(max(active)) if stations else None
+        return {
+            "seconds": round(elapsed, 1),
+            "output": self.output,
+            "throughput_per_hour": round(self.output * 3600 / elapsed, 2),
+            "lead_time_s": round(self.lead_sum / self.output, 1) if self.output else None,
+            "wip": round(sum(s["wip"] for s in stations), 2),
+            "bottleneck": stations[bottleneck]["name"] if stations else None,
+            "bottleneck_index": bottleneck,
+            "events": self.events,
+            "stations": stations,
+        }
+
+def simulate_shift(params, seconds=SHIFT_SECONDS, seed=None):
+    return LineSim(params, seed=seed).run(seconds)
+
+if __name__ == "__main__":
+    from simulator import BASE_STATIONS
+    t = time.perf_counter()
+    r = simulate_shift(station_params(BASE_STATIONS), seed=1)
+    ms = (time.perf_counter() - t) * 1000
+    print(f"8h shift: {r['output']} units, {r['throughput_per_hour']}/h, lead {r['lead_time_s']}s, wip {r['wip']}, bottleneck {r['bottleneck']}, {r['events']} events in {ms:.1f} ms")
+    for s in r["stations"]:
+        print(f"  {s['name']:<14} util={s['utilization']:.2f} blocked={s['blocked']:.2f} starved={s['starved']:.2f} down={s['down']:.2f} oee={s['oee']} wip={s['wip']}")
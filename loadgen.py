@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# Production load generator for the three backends. Hundreds of dashboards poll at the
+# intervals their pages use (revalidating with If-None-Match like a browser), while a
+# production feed of telemetry, events and control actions plays at Nx real time. The
+# feed is synthesized from the line model (line_sim.py) or replayed from a recording.
+#   python loadgen.py --target starlette --url http://127.0.0.1:8000 --dashboards 300 --speed 60
+#   python loadgen.py --target factory --url http://127.0.0.1:8000 --login admin:admin123 --dashboards 200
+#   python loadgen.py --target serve_tolkar --url http://127.0.0.1:8084 --record feed.jsonl
+#   python loadgen.py --target factory --replay feed.jsonl --speed 10 --json loadgen.json
+# Feed records are JSON lines {"t": production seconds, "method", "path", "body"}.
+import re, sys, json, time, random, asyncio, argparse
+from urllib.parse import urlparse
+from line_sim import LineSim, station_params, FAIL, REPAIR
+from simulator import BASE_STATIONS, TELEMETRY_RANGES
+
+# Polled paths and intervals (seconds) per page, as the pages schedule them
+PAGES = {
+    # tolkar-factory/dashboard.html: refreshData every 10s
+    "factory": {"dashboard": [("/api/state", 10), ("/api/events?limit=10", 10)]},
+    # dashboard.html, assets/js/flow_live.js, wallboard.html
+    "v1": {
+        "dashboard": [("/api/state", 5), ("/api/v1/lines", 5), ("/api/v1/orders", 4), ("/api/v1/status", 5), ("/api/v1/events?limit=200", 5)],
+        "flow_live": [("/api/v1/lines", 3), ("/api/v1/orders", 3)],
+        "wallboard": [("/api/v1/lines", 10)],
+    },
+}
+TARGETS = {
+    "factory": {"url": "http://127.0.0.1:8000", "pages": "factory", "telemetry": "/api/telemetry/batch", "maintenance": True},
+    "starlette": {"url": "http://127.0.0.1:8000", "pages": "v1", "telemetry": None, "maintenance": False},
+    "serve_tolkar": {"url": "http://127.0.0.1:8084", "pages": "v1", "telemetry": None, "maintenance": False},
+}
+# /api/maintenance/3 -> /api/maintenance/{id}; query strings are dropped
+ENDPOINT_ID = re.compile(r"/\d+(?=/|$)")
+
+class Stats:
+    def __init__(self):
+        self.samples = {}  # "GET /api/state" -> [ms]
+        self.errors = {}
+        self.not_modified = {}
+        self.lag_ms = []
+
+    def record(self, method, path, ms, code):
+        key = method + " " + ENDPOINT_ID.sub("/{id}", path.split("?")[0])
+        self.samples.setdefault(key, []).append(ms)
+        if code is None or code >= 400:
+            self.errors[key] = self.errors.get(key, 0) + 1
+        elif code == 304:
+            self.not_modified[key] = self.not_modified.get(key, 0) + 1
+
+    def report(self, elapsed):
+        def pct(v, p):
+            return round(v[min(int(len(v) * p), len(v) - 1)], 2)
+        out = {}
+        for key, v in sorted(self.samples.items()):
+            v.sort()
+            err = self.errors.get(key, 0)
+            out[key] = {"requests": len(v), "rps": round(len(v) / elapsed, 1), "errors": err, "error_rate": round(err / len(v), 4),
+                        "not_modified": self.not_modified.get(key, 0), "p50_ms": pct(v, 0.5), "p90_ms": pct(v, 0.9),
+                        "p99_ms": pct(v, 0.99), "max_ms": round(v[-1], 2)}
+        return out
+
+class Conn:
+    # One keep-alive HTTP/1.1 connection; requests on it are serialized like a browser's
+    def __init__(self, host, port, headers):
+        self.host, self.port, self.headers = host, port, headers
+        self.reader = self.writer = None
+        self.lock = asyncio.Lock()
+
+    async def request(self, method, path, body=None, headers=None):
+        # -> (status or None on transport error, response headers)
+        data = json.dumps(body).encode() if body is not None else b""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}", "Accept-Encoding: gzip, br"]
+        lines += [f"{k}: {v}" for k, v in {**self.headers, **(headers or {})}.items()]
+        if body is not None:
+            lines += ["Content-Type: application/json", f"Content-Length: {len(data)}"]
+        raw = ("\r\n".join(lines) + "\r\n\r\n").encode() + data
+        async with self.lock:
+            for attempt in (0, 1):
+                reused = self.writer is not None
+                try:
+                    if not reused:
+                        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+                    self.writer.write(raw)
+                    code, resp, close = await self._read()
+                except (ConnectionError, asyncio.IncompleteReadError, OSError, ValueError, IndexError):
+                    self.close()
+                    if reused and not attempt:
+                        continue  # idle keep-alive closed by the server: retry once, as browsers do
+                    return None, {}
+                if close:
+                    self.close()
+                return code, resp
+
+    async def _read(self):
+        status = await self.reader.readline()
+        if not status:
+            raise ConnectionError("closed")
+        code = int(status.split()[1])
+        headers, close = {}, status.startswith(b"HTTP/1.0")
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        close = close or headers.get("connection", "").lower() == "close"
+        if "content-length" in headers:
+            await self.reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+        elif close and code != 304:
+            await self.reader.read()
+        return code, headers, close
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+async def timed(conn, stats, method, path, body=None, headers=None):
+    start = time.perf_counter()
+    code, resp = await conn.request(method, path, body, headers)
+    stats.record(method, path, (time.perf_counter() - start) * 1000, code)
+    return code, resp
+
+async def poll(conn, stats, path, interval, deadline, rng):
+    etag = None
+    next_at = time.perf_counter() + rng.random() * interval  # dashboards were not opened in lockstep
+    while True:
+        await asyncio.sleep(max(0.0, min(next_at, deadline) - time.perf_counter()))
+        if time.perf_counter() >= deadline:
+            return
+        next_at += interval
+        code, resp = await timed(conn, stats, "GET", path, headers={"If-None-Match": etag} if etag else None)
+        if code == 200:
+            etag = resp.get("etag")
+
+def synthesize(target, seconds, speed, station_ids, telemetry_every, kaizen_every, seed):
+    # Feed for `seconds` of wall time at `speed`x: failures -> shock (or a corrective
+    # maintenance log on tolkar-factory), repairs -> reset, periodic kaizen, and one
+    # telemetry batch per telemetry_every production seconds where the backend ingests it
+    rng = random.Random(seed)
+    horizon = seconds * speed
+    names = {p["name"]: i for i, p in enumerate(station_params(BASE_STATIONS))}
+    ids = station_ids or list(range(1, len(names) + 1))
+    feed = []
+
+    def on_event(t, kind, name):
+        i = names[name]
+        sid = ids[i % len(ids)]
+        if kind == FAIL:
+            feed.append({"t": t, "method": "POST", "path": "/api/shock", "body": {"station_id": sid}})
+        elif kind == REPAIR:
+            if TARGETS[target]["maintenance"]:
+                feed.append({"t": t, "method": "POST", "path": f"/api/maintenance/{sid}", "body": {
+                    "maintenance_type": "corrective", "description": f"Repair after stop at {name}", "duration_minutes": 15}})
+            else:
+                feed.append({"t": t, "method": "POST", "path": "/api/reset", "body": {}})
+
+    line = LineSim(station_params(BASE_STATIONS), seed=seed)
+    line.run(horizon, listener=on_event)
+    if kaizen_every:
+        feed += [{"t": t, "method": "POST", "path": "/api/kaizen", "body": {}} for t in range(kaizen_every, int(horizon), kaizen_every)]
+    path = TARGETS[target]["telemetry"]
+    if path and telemetry_every:
+        t = 0.0
+        while t < horizon:
+            readings = []
+            for sid in ids:
+                r = {"station_id": sid}
+                for col, (low, spread, digits) in TELEMETRY_RANGES.items():
+                    r[col] = round(low + rng.random() * spread, digits)
+                readings.append(r)
+            feed.append({"t": t, "method": "POST", "path": path, "body": {"readings": readings}})
+            t += telemetry_every
+    feed.sort(key=lambda r: r["t"])
+    return feed
+
+async def play(conn, stats, feed, speed, deadline):
+    # Sends each record at start + t / speed; lag shows when the backend can't keep up
+    start = time.perf_counter()
+    for rec in feed:
+        due = start + rec["t"] / speed
+        if due > deadline:
+            break
+        now = time.perf_counter()
+        if due > now:
+            await asyncio.sleep(due - now)
+        stats.lag_ms.append(max(0.0, time.perf_counter() - due) * 1000)
+        await timed(conn, stats, rec["method"], rec["path"], rec.get("body"))
+
+async def login(host, port, creds):
+    username, _, password = creds.partition(":")
+    reader, writer = await asyncio.open_connection(host, port)
+    data = json.dumps({"username": username, "password": password}).encode()
+    writer.write((f"POST /api/login HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n").encode() + data)
+    raw = await reader.read()
+    writer.close()
+    body = json.loads(raw.split(b"\r\n\r\n", 1)[1] or b"{}")
+    token = body.get("access_token") or body.get("token")
+    if not token:
+        sys.exit(f"login failed: {body}")
+    return {"Authorization": "Bearer " + token}
+
+async def station_ids(host, port, headers):
+    # tolkar-factory rejects telemetry for unknown stations, so use the live ids
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write("GET /api/state HTTP/1.1\r\nHost: {}\r\n{}Connection: close\r\n\r\n".format(host, "".join(f"{k}: {v}\r\n" for k, v in headers.items())).encode())
+    raw = await reader.read()
+    writer.close()
+    try:
+        return [s["id"] for s in json.loads(raw.split(b"\r\n\r\n", 1)[1]).get("stations", []) if "id" in s]
+    except (ValueError, AttributeError):
+        return []
+
+async def run(args):
+    u = urlparse(args.url or TARGETS[args.target]["url"])
+    host, port = u.hostname, u.port or 80
+    headers = await login(host, port, args.login) if args.login else {}
+    if args.replay:
+        with open(args.replay) as fh:
+            feed = [json.loads(line) for line in fh if line.strip()]
+    else:
+        ids = await station_ids(host, port, headers) if TARGETS[args.target]["telemetry"] else []
+        feed = synthesize(args.target, args.seconds, args.speed, ids, args.telemetry_every, args.kaizen_every, args.seed)
+    if args.record:
+        with open(args.record, "w") as fh:
+            fh.writelines(json.dumps(rec) + "\n" for rec in feed)
+
+    stats = Stats()
+    rng = random.Random(args.seed)
+    pages = PAGES[TARGETS[args.target]["pages"]]
+    names = list(pages)
+    conns, tasks = [], []
+    start = time.perf_counter()
+    deadline = start + args.seconds
+    for n in range(args.dashboards):
+        conn = Conn(host, port, headers)
+        conns.append(conn)
+        for path, interval in pages[names[n % len(names)]]:
+            tasks.append(poll(conn, stats, path, interval, deadline, rng))
+    if not args.no_feed:
+        feed_conn = Conn(host, port, headers)
+        conns.append(feed_conn)
+        tasks.append(play(feed_conn, stats, feed, args.speed, deadline))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    for conn in conns:
+        conn.close()
+    lag = sorted(stats.lag_ms)
+    return {"target": args.target, "url": f"http://{host}:{port}", "dashboards": args.dashboards, "speed": args.speed,
+            "seconds": round(elapsed, 1), "feed_records": len(feed), "feed_sent": len(lag),
+            "feed_lag_p99_ms": round(lag[min(int(len(lag) * 0.99), len(lag) - 1)], 1) if lag else None,
+            "endpoints": stats.report(elapsed)}
+
+def main():
+    ap = argparse.ArgumentParser(description="Dashboard polling + production feed load generator")
+    ap.add_argument("--target", choices=sorted(TARGETS), required=True)
+    ap.add_argument("--url", default=None, help="base URL (default per target)")
+    ap.add_argument("--login", default=None, help="user:password for backends that require a bearer token")
+    ap.add_argument("--dashboards", type=int, default=200, help="simulated open dashboards")
+    ap.add_argument("--seconds", type=float, default=60, help="wall-clock duration")
+    ap.add_argument("--speed", type=float, default=60, help="production seconds per wall second for the feed")
+    ap.add_argument("--telemetry-every", type=float, default=10, help="production seconds between telemetry batches")
+    ap.add_argument("--kaizen-every", type=int, default=3600, help="production seconds between kaizen actions (0 = never)")
+    ap.add_argument("--replay", default=None, help="replay a recorded feed (JSON lines) instead of synthesizing")
+    ap.add_argument("--record", default=None, help="write the feed that will be played to this path")
+    ap.add_argument("--no-feed", action="store_true", help="dashboards only")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", dest="json_path", default=None, help="write results as JSON to this path")
+    args = ap.parse_args()
+
+    r = asyncio.run(run(args))
+    print(f"{r['target']} {r['url']}: {r['dashboards']} dashboards, feed {r['feed_sent']}/{r['feed_records']} records at {r['speed']}x "
+          f"(lag p99 {r['feed_lag_p99_ms']}ms) over {r['seconds']}s")
+    for key, row in r["endpoints"].items():
+        print(f"  {key:<34} n={row['requests']:<7} {row['rps']:>7}/s  p50={row['p50_ms']}ms p90={row['p90_ms']}ms "
+              f"p99={row['p99_ms']}ms max={row['max_ms']}ms 304={row['not_modified']} errors={row['errors']} ({row['error_rate']:.2%})")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump(r, fh, indent=2)
+        print(f"results written to {args.json_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# Load test: serve_tolkar.py threaded vs asyncio mode on the kiosk request mix.
+#   python loadtest_serve_tolkar.py                       # both modes, 50 connections, 10s each
+#   python loadtest_serve_tolkar.py --connections 200 --seconds 20 --json loadtest.json
+# Each client connection reuses its socket when the server keeps it alive and
+# reconnects when it does not (threaded mode closes after every response).
+import os, sys, json, time, socket, asyncio, argparse, subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MIX = ["/api/state", "/api/v1/lines", "/api/v1/stations", "/api/v1/orders", "/api/v1/events?limit=50", "/api/v1/status", "/dashboard.html", "/assets/js/auth-wrapper.js"]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def read_response(reader):
+    status = await reader.readline()
+    if not status:
+        raise ConnectionError("closed")
+    code = int(status.split()[1])
+    length, close = 0, status.startswith(b"HTTP/1.0")
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        k, _, v = line.decode("latin-1").partition(":")
+        k = k.strip().lower()
+        if k == "content-length":
+            length = int(v)
+        elif k == "connection":
+            close = v.strip().lower() == "close"
+    if length:
+        await reader.readexactly(length)
+    elif close:
+        await reader.read()
+    return code, close
+
+async def client(port, paths, deadline, samples, errors, offset):
+    reader = writer = None
+    i = offset
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(("GET %s HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept-Encoding: gzip\r\n\r\n" % path).encode())
+            code, close = await read_response(reader)
+            samples.setdefault(path.split("?")[0], []).append((time.perf_counter() - start) * 1000)
+            if code >= 400:
+                errors[path] = errors.get(path, 0) + 1
+        except (ConnectionError, asyncio.IncompleteReadError, OSError):
+            errors[path] = errors.get(path, 0) + 1
+            close = True
+        if close and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+def pct(sorted_ms, p):
+    return round(sorted_ms[min(int(len(sorted_ms) * p), len(sorted_ms) - 1)], 3)
+
+async def run_load(port, connections, seconds):
+    samples, errors = {}, {}
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*[client(port, MIX, deadline, samples, errors, n) for n in range(connections)])
+    elapsed = time.perf_counter() - started
+    all_ms = sorted(ms for v in samples.values() for ms in v)
+    per_path = {}
+    for path, v in sorted(samples.items()):
+        v.sort()
+        per_path[path] = {"requests": len(v), "p50_ms": pct(v, 0.5), "p99_ms": pct(v, 0.99)}
+    return {"requests": len(all_ms), "rps": round(len(all_ms) / elapsed, 1), "errors": sum(errors.values()),
+            "p50_ms": pct(all_ms, 0.5) if all_ms else None, "p95_ms": pct(all_ms, 0.95) if all_ms else None,
+            "p99_ms": pct(all_ms, 0.99) if all_ms else None, "paths": per_path}
+
+def run_mode(mode, args):
+    port = free_port()
+    env = dict(os.environ, SERVE_LOG_SAMPLE="0", SERVE_LOG_INTERVAL_SECONDS="3600")
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "serve_tolkar.py"), "--mode", mode, "--host", "127.0.0.1", "--port", str(port)],
+                            cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(50):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        return asyncio.run(run_load(port, args.connections, args.seconds))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare serve_tolkar.py threaded and asyncio modes")
+    ap.add_argument("--modes", default="threaded,asyncio")
+    ap.add_argument("--connections", type=int, default=50)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--json", dest="json_path", default=None)
+    args = ap.parse_args()
+
+    results = {"connections": args.connections, "seconds": args.seconds, "modes": {}}
+    for mode in [m for m in args.modes.split(",") if m]:
+        r = results["modes"][mode] = run_mode(mode, args)
+        print(f"{mode:<9} {r['rps']:>9} req/s  p50={r['p50_ms']}ms p95={r['p95_ms']}ms p99={r['p99_ms']}ms errors={r['errors']}")
+        for path, row in r["paths"].items():
+            print(f"    {path:<28} p50={row['p50_ms']}ms p99={row['p99_ms']}ms n={row['requests']}")
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"results written to {args.json_path}")
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
-import logging, time
+import logging, time, asyncio
 from config import settings
 from api import state as state_router
 from api import control as control_router
@@ -16,10 +16,17 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    partition_job = None
     if settings.DEMO_MODE:
         from services.simulator import initialize_demo_factory
         initialize_demo_factory()
+    # telemetry_history needs next month's partition on PostgreSQL whether or not the demo runs
+    from partitions import enabled, run_periodically
+    if enabled():
+        partition_job = asyncio.create_task(run_periodically())
     yield
+    if partition_job:
+        partition_job.cancel()
 
 app = FastAPI(title="TOLKAR ZERO@FACTORY API", description="Real-time production monitoring & digital twin platform", version="1.0.0", docs_url="/docs", redoc_url="/redoc", lifespan=lifespan)
 
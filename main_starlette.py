@@ -1,43 +1,104 @@
 import time
+import asyncio
+from functools import lru_cache
 from datetime import datetime
 from starlette.applications import Starlette
-from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.responses import Response, RedirectResponse, JSONResponse as StarletteJSONResponse, PlainTextResponse, StreamingResponse
 from starlette.requests import Request
 from starlette.routing import Route
-from starlette.staticfiles import StaticFiles
 from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
 from config import settings
+from broadcast import Broadcaster, sse_stream, serve_websocket, stable_digest
+from deltas import VersionClock, DeltaTracker, delta_response
+from projections import ProjectionCache
+from payloads import dumps, Encoded, not_modified
+from static_assets import AssetBundle
+from scenarios import ScenarioRunner
 from services.simulator import initialize_demo_factory, get_demo_state, reset_demo_factory, apply_demo_shock, apply_demo_kaizen
 
+class JSONResponse(StarletteJSONResponse):
+    # Fast encoder (orjson when installed) for every JSON response
+    def render(self, content):
+        return dumps(content)
+
+def cached_response(request, enc):
+    # Strong ETag + If-None-Match -> 304, gzip/br above settings.COMPRESS_MIN_BYTES
+    body, coding, etag = enc.negotiate(request.headers.get("accept-encoding"))
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if not_modified(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(body, media_type="application/json", headers=headers)
+
+broadcaster = Broadcaster(max_queue=settings.BROADCAST_MAX_QUEUE, slow_consumer_seconds=settings.BROADCAST_SLOW_CONSUMER_SECONDS)
+# State and v1 projections, rebuilt once per state change and shared by every handler
+projections = ProjectionCache()
+
 async def health(request: Request):
-    return JSONResponse({"status": "healthy", "timestamp": datetime.utcnow().isoformat(), "demo_mode": settings.DEMO_MODE})
+    return JSONResponse({"status": "healthy", "timestamp": datetime.utcnow().isoformat(), "demo_mode": settings.DEMO_MODE, "push": broadcaster.stats(), "projections": projections.stats(), "assets": ASSETS.stats(), "scenarios": scenario_runner.stats()})
 
 async def root(request: Request):
     return JSONResponse({"message": "TOLKAR ZERO@FACTORY API (starlette)", "version": "1.0.0"})
 
 async def state(request: Request):
-    return JSONResponse(get_demo_state())
+    return cached_response(request, projections.encoded("state"))
 
 async def events(request: Request):
-    data = get_demo_state()
-    return JSONResponse(data.get("events", []))
+    return cached_response(request, projections.encoded("state_events"))
+
+EMPTY_TELEMETRY = Encoded(dumps([]))
 
 async def telemetry(request: Request):
     # Stub telemetry; in demo, return empty series
-    return JSONResponse([])
+    return cached_response(request, EMPTY_TELEMETRY)
 
 async def reset(request: Request):
-    return JSONResponse({"success": True, "message": "Factory reset to initial state", "new_state": reset_demo_factory()})
+    new_state = reset_demo_factory()
+    projections.invalidate()
+    publish_state()
+    return JSONResponse({"success": True, "message": "Factory reset to initial state", "new_state": new_state})
 
 async def shock(request: Request):
     body = await request.json()
     res = apply_demo_shock(station_id=body.get("station_id"), shock_type=body.get("shock_type", "quality_issue"), severity=body.get("severity", "medium"))
+    projections.invalidate()
+    publish_state()
     return JSONResponse(res)
 
 async def kaizen(request: Request):
     body = await request.json()
     res = apply_demo_kaizen(station_id=body.get("station_id", 3), improvement_type=body.get("improvement_type", "cycle_time_reduction"), improvement_pct=float(body.get("improvement_pct", 10)))
+    projections.invalidate()
+    publish_state()
+    return JSONResponse(res)
+
+# What-if sweeps on a process pool against a model of the current line (see scenarios.py)
+scenario_runner = ScenarioRunner(settings.SCENARIO_WORKERS or None, settings.SCENARIO_CACHE_SIZE)
+
+async def scenarios_sweep(request: Request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"detail": "request body must be valid JSON"}, status_code=400)
+    if not isinstance(body, dict):
+        return JSONResponse({"detail": "request body must be a JSON object"}, status_code=400)
+    try:
+        seconds = float(body.get("seconds", 8 * 3600))
+        replications = int(body.get("replications", 1))
+        seed = int(body.get("seed", 1))
+    except (TypeError, ValueError):
+        return JSONResponse({"detail": "seconds, replications and seed must be numbers"}, status_code=400)
+    if not 0 < seconds <= settings.SCENARIO_MAX_SECONDS or not 1 <= replications <= settings.SCENARIO_MAX_REPLICATIONS:
+        return JSONResponse({"detail": f"seconds must be in (0, {settings.SCENARIO_MAX_SECONDS}] and replications in [1, {settings.SCENARIO_MAX_REPLICATIONS}]"}, status_code=400)
+    stations = projections.doc("state").get("stations", [])
+    if not stations:
+        return JSONResponse({"detail": "no stations in the current state"}, status_code=409)
+    try:
+        res = await scenario_runner.sweep(stations, body.get("grid"), seconds=seconds, replications=replications, seed=seed)
+    except ValueError as e:
+        return JSONResponse({"detail": str(e)}, status_code=400)
     return JSONResponse(res)
 
 routes = [
@@ -49,6 +110,7 @@ routes = [
     Route("/api/reset", reset, methods=["POST"]),
     Route("/api/shock", shock, methods=["POST"]),
     Route("/api/kaizen", kaizen, methods=["POST"]),
+    Route("/api/scenarios/sweep", scenarios_sweep, methods=["POST"]),
 ]
 
 middleware = [
@@ -67,9 +129,26 @@ async def process_time(request: Request, call_next):
 if settings.DEMO_MODE:
     initialize_demo_factory()
 
-# Serve UI and assets from same origin to avoid mixed content
-app.mount("/assets", StaticFiles(directory="assets"), name="assets")
-app.mount("/ui", StaticFiles(directory=".", html=True), name="ui")
+# Serve UI and assets from same origin to avoid mixed content. Whitelisted pages and
+# assets/ only, built once at startup and served from memory (see static_assets.py)
+ASSETS = AssetBundle().build()
+
+def asset_response(request, rel):
+    status, headers, body = ASSETS.serve(rel, request.headers)
+    return Response(body, status_code=status, headers=headers)
+
+async def assets_mount(request: Request):
+    return asset_response(request, "assets/" + request.path_params["path"])
+
+async def ui_mount(request: Request):
+    if "path" not in request.path_params:
+        # /ui -> /ui/ so the pages' relative links resolve under /ui
+        return RedirectResponse("/ui/")
+    return asset_response(request, request.path_params["path"])
+
+app.add_route("/assets/{path:path}", assets_mount, methods=["GET", "HEAD"])
+app.add_route("/ui", ui_mount, methods=["GET", "HEAD"])
+app.add_route("/ui/{path:path}", ui_mount, methods=["GET", "HEAD"])
 
 # API v1 contract
 def reason_label(code: str) -> str:
@@ -82,27 +161,30 @@ def reason_label(code: str) -> str:
     }
     return m.get(code or "", "Bilinmiyor")
 
+LINES_DEF = [
+    {"line_id": 1, "line_name": "Metal & Şase"},
+    {"line_id": 2, "line_name": "Boya Hattı"},
+    {"line_id": 3, "line_name": "Montaj"},
+    {"line_id": 4, "line_name": "Final Test"},
+    {"line_id": 5, "line_name": "Paketleme & Sevkiyat"},
+]
+
+@lru_cache(maxsize=1024)
+def map_line(name: str) -> int:
+    n=(name or "").lower()
+    if "metal" in n or "şa" in n: return 1
+    if "boya" in n or "paint" in n: return 2
+    if "montaj" in n or "assembly" in n: return 3
+    if "test" in n: return 4
+    if "paket" in n or "sevkiyat" in n: return 5
+    return 3
+
 def build_lines_v1():
-    d = get_demo_state()
+    d = projections.doc("state")
     stations = d.get("stations", [])
     ts = d.get("timestamp")
     site_id = "tolkar_aosb"
-    lines_def = [
-        {"line_id": 1, "line_name": "Metal & Şase"},
-        {"line_id": 2, "line_name": "Boya Hattı"},
-        {"line_id": 3, "line_name": "Montaj"},
-        {"line_id": 4, "line_name": "Final Test"},
-        {"line_id": 5, "line_name": "Paketleme & Sevkiyat"},
-    ]
-    def map_line(name: str) -> int:
-        n=(name or "").lower()
-        if "metal" in n or "şa" in n: return 1
-        if "boya" in n or "paint" in n: return 2
-        if "montaj" in n or "assembly" in n: return 3
-        if "test" in n: return 4
-        if "paket" in n or "sevkiyat" in n: return 5
-        return 3
-    groups = {ld["line_id"]: {"line_id": ld["line_id"], "line_name": ld["line_name"], "status": "Idle", "wip": 0, "throughput_ph": 0, "ct_min": 0, "oee": 0, "fpy": 0, "bottleneck_station": None, "last_event": None, "_count": 0} for ld in lines_def}
+    groups = {ld["line_id"]: {"line_id": ld["line_id"], "line_name": ld["line_name"], "status": "Idle", "wip": 0, "throughput_ph": 0, "ct_min": 0, "oee": 0, "fpy": 0, "bottleneck_station": None, "last_event": None, "_count": 0} for ld in LINES_DEF}
     for s in stations:
         lid = map_line(s.get("name"))
         g = groups.get(lid)
@@ -135,7 +217,7 @@ def build_lines_v1():
     return {"ts": ts, "site_id": site_id, "last_sync": ts, "lines": list(groups.values())}
 
 def build_stations_v1():
-    d = get_demo_state()
+    d = projections.doc("state")
     stations = d.get("stations", [])
     res=[]
     for idx, s in enumerate(stations, start=1):
@@ -153,7 +235,7 @@ def build_stations_v1():
     return {"ts": d.get("timestamp"), "site_id": "tolkar_aosb", "last_sync": d.get("timestamp"), "stations": res}
 
 def build_events_v1():
-    d = get_demo_state()
+    d = projections.doc("state")
     ev = []
     for e in d.get("events", []):
         ev.append({
@@ -169,13 +251,9 @@ def build_events_v1():
     return {"ts": d.get("timestamp"), "site_id": "tolkar_aosb", "last_sync": d.get("timestamp"), "events": ev}
 
 async def status_v1(request: Request):
-    # Use the exact same sources as /api/v1/lines and /api/v1/events
-    def get_lines_data():
-        return _use_seed_lines() or build_lines_v1()
-    def get_events_data():
-        return _use_seed_events() or build_events_v1()
-    LD = get_lines_data()
-    ED = get_events_data()
+    # Use the exact same (cached) projections as /api/v1/lines and /api/v1/events
+    LD = projections.doc("lines")
+    ED = projections.doc("events")
     lines = LD.get("lines", [])
     events = ED.get("events", [])
     # last_sync: prefer seed's last_sync, else demo timestamp
@@ -197,16 +275,44 @@ async def status_v1(request: Request):
                     health = "degraded"; reason = "stale_seed"
         except Exception:
             pass
-    return JSONResponse({"ts": last_sync, "site_id": "tolkar_aosb", "last_sync": last_sync, "health": health, "reason": reason})
+    return cached_response(request, Encoded(dumps({"ts": last_sync, "site_id": "tolkar_aosb", "last_sync": last_sync, "health": health, "reason": reason, "version": STATE_CLOCK.value})))
+
+# ?since=<version> deltas: one version clock shared by all v1 collections
+STATE_CLOCK = VersionClock()
+TRACKERS = {
+    "lines": DeltaTracker(STATE_CLOCK, key="line_id"),
+    "stations": DeltaTracker(STATE_CLOCK, key="station_id"),
+    "orders": DeltaTracker(STATE_CLOCK, key="order_id"),
+    "events": DeltaTracker(STATE_CLOCK),
+}
+
+def versioned(name, build):
+    # Trackers observe each projection once per rebuild, not once per request
+    def build_versioned():
+        doc = build()
+        tracker = TRACKERS[name]
+        tracker.observe(doc.get(name))
+        return {**doc, "version": tracker.version}
+    return build_versioned
+
+def v1_response(request, name):
+    since = request.query_params.get("since")
+    if since is None:
+        return cached_response(request, projections.encoded(name))
+    try:
+        since = int(since)
+    except ValueError:
+        return JSONResponse({"detail": "since must be an integer version"}, status_code=400)
+    return cached_response(request, Encoded(dumps(delta_response(projections.doc(name), name, TRACKERS[name], since))))
 
 async def lines_v1(request: Request):
-    return JSONResponse(_use_seed_lines() or build_lines_v1())
+    return v1_response(request, "lines")
 
 async def stations_v1(request: Request):
-    return JSONResponse(_use_seed_stations() or build_stations_v1())
+    return v1_response(request, "stations")
 
 async def events_v1(request: Request):
-    return JSONResponse(_use_seed_events() or build_events_v1())
+    return v1_response(request, "events")
 
 app.add_route("/api/v1/status", status_v1)
 app.add_route("/api/v1/lines", lines_v1)
@@ -227,6 +333,8 @@ async def seed_upload(request: Request):
     SEED["orders"] = payload.get("orders")
     from datetime import datetime
     SEED["last_sync"] = datetime.utcnow().isoformat()
+    projections.invalidate()
+    publish_state(force=True)
     return JSONResponse({"success": True, "last_sync": SEED["last_sync"]})
 
 app.add_route("/api/v1/seed/status", seed_status)
@@ -246,26 +354,26 @@ def _use_seed_orders():
     return bool(SEED["orders"]) and {"ts": SEED.get("last_sync"), "site_id": "tolkar_aosb", "last_sync": SEED.get("last_sync"), "orders": SEED["orders"]}
 
 def build_orders_v1():
-    d = get_demo_state()
+    d = projections.doc("state")
     ts = d.get("timestamp")
-    lines = build_lines_v1().get("lines", [])
+    lines = projections.doc("demo_lines").get("lines", [])
     out = []
+    # Timestamps come from the state snapshot, like the stations: a wall-clock "now" would be
+    # frozen into the memoized bytes and would make every rebuild look like an order change
     def mk(order_id, lid, sid, state, energy, co2, risk, rc, note):
-        from datetime import datetime, timedelta
-        now = datetime.utcnow().isoformat()
         return {
             "order_id": order_id,
             "line_id": lid,
             "station_id": sid,
             "state": state,
             "start_ts": ts,
-            "updated_ts": now,
+            "updated_ts": ts,
             "elapsed_min": 30.0,
             "energy_kwh": energy,
             "co2e_kg": co2,
             "scrap_units": 0,
             "rework_units": 0,
-            "eta_ts": now,
+            "eta_ts": ts,
             "risk": risk,
             "reason_code": rc,
             "payload": {"note": note}
@@ -283,10 +391,71 @@ def build_orders_v1():
     return {"ts": ts, "site_id": "tolkar_aosb", "last_sync": ts, "orders": out[:8]}
 
 async def orders_v1(request: Request):
-    return JSONResponse(_use_seed_orders() or build_orders_v1())
+    return v1_response(request, "orders")
 
 app.add_route("/api/v1/orders", orders_v1)
 
+projections.register("state", get_demo_state)
+projections.register("state_events", lambda: projections.doc("state").get("events", []))
+projections.register("demo_lines", build_lines_v1)
+projections.register("lines", versioned("lines", lambda: _use_seed_lines() or projections.doc("demo_lines")))
+projections.register("stations", versioned("stations", lambda: _use_seed_stations() or build_stations_v1()))
+projections.register("orders", versioned("orders", lambda: _use_seed_orders() or build_orders_v1()))
+projections.register("events", versioned("events", lambda: _use_seed_events() or build_events_v1()))
+
+# Push channel: SSE (/api/v1/stream) and WebSocket (/api/v1/ws)
+PUSH_TOPICS = {topic: (lambda topic=topic: projections.doc(topic)) for topic in ("lines", "stations", "orders", "events", "state")}
+
+def publish_state(force=False):
+    # Builds each topic once per change for all subscribers; unchanged topics are skipped
+    for topic, build in PUSH_TOPICS.items():
+        broadcaster.publish(topic, build(), force=force)
+
+def _push_topics(params):
+    raw = params.get("topics") or ",".join(PUSH_TOPICS)
+    return [t for t in raw.split(",") if t in PUSH_TOPICS]
+
+async def watch_state():
+    # Catches state changes made outside the control endpoints (simulator ticks)
+    last = None
+    while True:
+        try:
+            digest = stable_digest(get_demo_state())
+            if digest != last:
+                if last is not None:
+                    projections.invalidate()
+                last = digest
+            if broadcaster.subscribers:
+                publish_state()
+        except Exception:
+            pass
+        await asyncio.sleep(settings.BROADCAST_POLL_SECONDS)
+
+async def stream_v1(request: Request):
+    topics = _push_topics(request.query_params)
+    if not topics:
+        return JSONResponse({"detail": f"topics must be one or more of {','.join(PUSH_TOPICS)}"}, status_code=400)
+    publish_state()
+    sub = broadcaster.subscribe(topics)
+    return StreamingResponse(sse_stream(broadcaster, sub, settings.BROADCAST_HEARTBEAT_SECONDS), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def ws_v1(websocket):
+    topics = _push_topics(websocket.query_params)
+    await websocket.accept()
+    if not topics:
+        await websocket.close(code=1008)
+        return
+    publish_state()
+    await serve_websocket(broadcaster, websocket, topics, settings.BROADCAST_HEARTBEAT_SECONDS)
+
+app.add_route("/api/v1/stream", stream_v1)
+app.add_websocket_route("/api/v1/ws", ws_v1)
+async def start_push():
+    app.state.push_watcher = asyncio.create_task(watch_state())
+
+app.add_event_handler("startup", start_push)
+app.add_event_handler("shutdown", scenario_runner.shutdown)
+
 # Demo auth endpoints
 USERS = {
     "admin": {"password": "admin123", "role": "admin"},
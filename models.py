@@ -58,9 +58,10 @@ class TelemetryHistory(Base):
         Index("idx_station_timestamp", "station_id", "timestamp"),
         {"postgresql_partition_by": "RANGE (timestamp)"},
     )
-    id = Column(Integer, primary_key=True, index=True)
+    # Partitioned tables need the partition key in the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     station_id = Column(Integer, ForeignKey("stations.id", ondelete="CASCADE"), nullable=False)
-    timestamp = Column(DateTime, nullable=False, index=True)
+    timestamp = Column(DateTime, primary_key=True, nullable=False, index=True)
     oee = Column(Numeric(5, 2))
     cycle_time_sec = Column(Integer)
     fpy = Column(Numeric(5, 2))
@@ -0,0 +1,133 @@
+import re
+import time
+import zlib
+import asyncio
+import logging
+import argparse
+from datetime import datetime
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+PARENT = "telemetry_history"
+NAME_RE = re.compile(r"^telemetry_history_(\d{4})_(\d{2})$")
+# Advisory lock key: every API worker (and cron) runs maintain(), only the holder issues DDL
+LOCK_KEY = zlib.crc32(PARENT.encode())
+
+def enabled(url=None):
+    # Partitioned telemetry_history only exists on PostgreSQL
+    return make_url(url or settings.DATABASE_URL).get_backend_name() == "postgresql"
+
+def month_start(dt):
+    return datetime(dt.year, dt.month, 1)
+
+def add_months(dt, n):
+    idx = dt.year * 12 + dt.month - 1 + n
+    return datetime(idx // 12, idx % 12 + 1, 1)
+
+def partition_name(start):
+    return f"{PARENT}_{start.year}_{str(start.month).zfill(2)}"
+
+def list_partitions(conn):
+    rows = conn.execute(text("""
+        SELECT c.relname, pg_total_relation_size(c.oid) AS bytes, c.reltuples::bigint AS est_rows
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :parent
+        ORDER BY c.relname
+    """), {"parent": PARENT}).all()
+    parts = []
+    for name, size, est_rows in rows:
+        m = NAME_RE.match(name)
+        start = datetime(int(m.group(1)), int(m.group(2)), 1) if m else None
+        parts.append({"name": name, "start": start, "end": add_months(start, 1) if start else None, "bytes": size, "est_rows": max(est_rows, 0)})
+    return parts
+
+def ensure_partitions(conn, months_ahead=None, now=None):
+    # Current month plus N future months; existing partitions are left alone
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    first = month_start(now or datetime.utcnow())
+    existing = {p["name"] for p in list_partitions(conn)}
+    created = []
+    for i in range(months_ahead + 1):
+        start = add_months(first, i)
+        name = partition_name(start)
+        if name in existing:
+            continue
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{add_months(start, 1):%Y-%m-%d}')"))
+        created.append(name)
+    return created
+
+def enforce_retention(conn, retention_months=None, action=None, now=None):
+    # Partitions that end on or before the cutoff are detached (kept as plain tables) or dropped
+    retention_months = settings.PARTITION_RETENTION_MONTHS if retention_months is None else retention_months
+    action = action or settings.PARTITION_RETENTION_ACTION
+    if retention_months <= 0:
+        return []
+    if action not in ("detach", "drop"):
+        raise ValueError(f"PARTITION_RETENTION_ACTION must be 'detach' or 'drop', got {action!r}")
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retention_months)
+    removed = []
+    for p in list_partitions(conn):
+        if p["end"] is None or p["end"] > cutoff:
+            continue
+        conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {p['name']}"))
+        if action == "drop":
+            conn.execute(text(f"DROP TABLE {p['name']}"))
+        removed.append(p["name"])
+    return removed
+
+def report(conn):
+    parts = list_partitions(conn)
+    return {"parent": PARENT, "partitions": [{**p, "start": p["start"].isoformat() if p["start"] else None, "end": p["end"].isoformat() if p["end"] else None} for p in parts], "total_bytes": sum(p["bytes"] for p in parts)}
+
+def maintain(engine=None, now=None):
+    engine = engine or create_engine(settings.DATABASE_URL)
+    with engine.begin() as conn:
+        # Released at commit; processes that miss it skip this round instead of racing the DDL
+        leader = bool(conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": LOCK_KEY}).scalar())
+        created = ensure_partitions(conn, now=now) if leader else []
+        removed = enforce_retention(conn, now=now) if leader else []
+    with engine.connect() as conn:
+        result = report(conn)
+    result.update({"created": created, "removed": removed, "action": settings.PARTITION_RETENTION_ACTION, "skipped": not leader})
+    if created or removed:
+        logger.info(f"telemetry_history partitions: created={created} {settings.PARTITION_RETENTION_ACTION}={removed}")
+    return result
+
+async def run_periodically(engine=None, interval=None):
+    # Background job for the API process; blocking DDL runs in a worker thread
+    engine = engine or create_engine(settings.DATABASE_URL)
+    interval = interval or settings.PARTITION_CHECK_INTERVAL_SECONDS
+    while True:
+        try:
+            await asyncio.to_thread(maintain, engine)
+        except Exception as e:
+            logger.error(f"partition maintenance failed: {e}")
+        await asyncio.sleep(interval)
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain telemetry_history monthly partitions")
+    parser.add_argument("--loop", action="store_true", help="keep running every PARTITION_CHECK_INTERVAL_SECONDS")
+    parser.add_argument("--report", action="store_true", help="only print partition sizes")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    engine = create_engine(settings.DATABASE_URL)
+    while True:
+        if args.report:
+            with engine.connect() as conn:
+                result = report(conn)
+        else:
+            result = maintain(engine)
+        for p in result["partitions"]:
+            print(f"{p['name']:<32} {p['start'] or '-':<20} {p['est_rows']:>12,} rows {p['bytes'] / 1048576:>10.1f} MB")
+        print(f"total {result['total_bytes'] / 1048576:.1f} MB")
+        if not args.loop or args.report:
+            break
+        time.sleep(settings.PARTITION_CHECK_INTERVAL_SECONDS)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import gzip
+import json
+import hashlib
+from config import settings
+
+# Fast JSON encoding (orjson when installed), per-version caching of encoded bodies,
+# strong ETags and gzip/brotli (brotli when installed) content negotiation
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODER = "orjson" if orjson else "json"
+
+def dumps(obj):
+    # UTF-8 JSON bytes, non-ASCII kept as-is (same output as json.dumps(ensure_ascii=False))
+    if orjson:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+def pick_encoding(accept_encoding):
+    # Preferred content coding the client accepts: br, then gzip, else None
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip()] = q
+    if brotli and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+def compress(body, coding):
+    if coding == "br":
+        return brotli.compress(body, quality=settings.COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.COMPRESS_GZIP_LEVEL, mtime=0)
+
+def not_modified(if_none_match, etag):
+    # If-None-Match uses weak comparison (RFC 9110 13.1.2)
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any((t[2:] if t.startswith("W/") else t) == etag for t in tags)
+
+class Encoded:
+    # One encoded body, its strong ETag and its compressed variants, each built once
+    __slots__ = ("body", "etag", "variants")
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        self.variants = {}
+
+    def negotiate(self, accept_encoding, min_size=None):
+        # -> (body, content coding or None, etag of that representation)
+        min_size = settings.COMPRESS_MIN_BYTES if min_size is None else min_size
+        coding = pick_encoding(accept_encoding) if len(self.body) >= min_size else None
+        if coding is None:
+            return self.body, None, self.etag
+        body = self.variants.get(coding)
+        if body is None:
+            body = self.variants[coding] = compress(self.body, coding)
+        return body, coding, self.etag[:-1] + "-" + coding + '"'
+
+class PayloadCache:
+    # name -> (version, Encoded). get() only calls build() and encodes when the version
+    # changed since the last call; otherwise the same Encoded (and its compressed
+    # variants) is returned.
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.encodes = 0
+        self.hits = 0
+
+    def get(self, name, version, build):
+        entry = self.entries.get(name)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+        body = Encoded(dumps(build()))
+        if entry is None and len(self.entries) >= self.max_entries:
+            self.entries.pop(next(iter(self.entries)), None)
+        self.entries[name] = (version, body)
+        self.encodes += 1
+        return body
+
+    def stats(self):
+        total = self.encodes + self.hits
+        return {"encoder": ENCODER, "encodes": self.encodes, "hits": self.hits, "hit_ratio": round(self.hits / total, 3) if total else 0.0}
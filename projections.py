@@ -0,0 +1,45 @@
+from payloads import dumps, Encoded, ENCODER
+
+class ProjectionCache:
+    # Named projections rebuilt at most once per source version. invalidate() is
+    # called on every state change (demo mutation, seed upload); until then every
+    # handler shares the same document and its serialized bytes.
+    def __init__(self):
+        self.version = 0
+        self.builders = {}
+        self.entries = {}  # name -> [version, doc, Encoded]
+        self.builds = 0
+        self.hits = 0
+
+    def register(self, name, build):
+        self.builders[name] = build
+
+    def invalidate(self):
+        self.version += 1
+        return self.version
+
+    def _entry(self, name):
+        entry = self.entries.get(name)
+        if entry is not None and entry[0] == self.version:
+            self.hits += 1
+            return entry
+        version = self.version
+        entry = [version, self.builders[name](), None]
+        self.entries[name] = entry
+        self.builds += 1
+        return entry
+
+    def doc(self, name):
+        # Shared document: callers must not mutate it
+        return self._entry(name)[1]
+
+    def encoded(self, name):
+        # Serialized bytes, ETag and compressed variants, built once per version
+        entry = self._entry(name)
+        if entry[2] is None:
+            entry[2] = Encoded(dumps(entry[1]))
+        return entry[2]
+
+    def stats(self):
+        total = self.builds + self.hits
+        return {"encoder": ENCODER, "version": self.version, "builds": self.builds, "hits": self.hits, "hit_ratio": round(self.hits / total, 3) if total else 0.0}
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import itertools
+import multiprocessing
+import os
+import time
+from collections import OrderedDict, Counter
+from concurrent.futures import ProcessPoolExecutor
+from payloads import dumps
+from line_sim import station_params, simulate_shift, SHIFT_SECONDS
+from config import settings
+
+# What-if sweeps: every combination of a grid of parameter changes is simulated with the
+# line model (line_sim.py) on a process pool and compared with the unchanged line.
+#   {"grid": [{"param": "ct", "station": "Finishing", "values": [-10, -20]},
+#             {"param": "buffer", "station": "*", "values": [4, 8]}],
+#    "seconds": 28800, "replications": 3, "seed": 1}
+# ct: cycle time change in %; buffer: input buffer (WIP cap) in units; fpy: first pass
+# yield in %; downtime: share of time down for repairs in %. station: name, 1-based
+# index or "*" for all stations.
+PARAMS = ("ct", "buffer", "fpy", "downtime")
+
+def line_from_state(stations):
+    # Model parameters for the stations in the current demo state
+    return station_params([{**s, "ct": s.get("ct") or s.get("cycle_time_sec") or 60, "name": s.get("name") or f"Station {i}"}
+                           for i, s in enumerate(stations, start=1)])
+
+def _targets(line, station):
+    if station in (None, "*"):
+        return list(range(len(line)))
+    if isinstance(station, int) and not isinstance(station, bool):
+        if 1 <= station <= len(line):
+            return [station - 1]
+    else:
+        idx = [i for i, p in enumerate(line) if p["name"] == station]
+        if idx:
+            return idx
+    raise ValueError(f"unknown station {station!r}")
+
+def expand_grid(line, grid):
+    # -> list of scenarios, each a list of (param, station, value) changes
+    if not isinstance(grid, list) or not grid:
+        raise ValueError("grid must be a non-empty list of {param, station, values}")
+    axes = []
+    for axis in grid:
+        if not isinstance(axis, dict):
+            raise ValueError("each grid axis must be an object {param, station, values}")
+        param, station, values = axis.get("param"), axis.get("station", "*"), axis.get("values")
+        if param not in PARAMS:
+            raise ValueError(f"param must be one of {', '.join(PARAMS)}")
+        _targets(line, station)
+        if not isinstance(values, list) or not values or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            raise ValueError(f"values for {param} must be a non-empty list of numbers")
+        axes.append([(param, station, v) for v in values])
+    count = 1
+    for axis in axes:
+        count *= len(axis)
+    if count > settings.SCENARIO_MAX_SCENARIOS:
+        raise ValueError(f"grid expands to {count} scenarios (max {settings.SCENARIO_MAX_SCENARIOS})")
+    return [list(combo) for combo in itertools.product(*axes)]
+
+def apply_changes(line, changes):
+    line = [dict(p) for p in line]
+    for param, station, value in changes:
+        for i in _targets(line, station):
+            p = line[i]
+            if param == "ct":
+                p["ct"] = max(p["ct"] * (1 + value / 100.0), 0.1)
+            elif param == "buffer":
+                p["buffer"] = max(int(value), 1)
+            elif param == "fpy":
+                p["fpy"] = min(max(float(value), 0.0), 100.0)
+            else:
+                d = min(max(value / 100.0, 0.0), 0.95)
+                p["mttr"] = p["mtbf"] * d / (1 - d) if d else 0.0
+    return line
+
+def scenario_key(line, changes, seconds, seed, replications):
+    doc = {"line": line, "changes": changes, "seconds": seconds, "seed": seed, "replications": replications}
+    return hashlib.sha1(dumps(doc)).hexdigest()
+
+def run_scenario(line, changes, seconds, seed, replications):
+    # Replications share seeds across scenarios (common random numbers), so deltas
+    # reflect the change rather than sampling noise
+    params = apply_changes(line, changes)
+    runs = [simulate_shift(params, seconds, seed=seed + r) for r in range(replications)]
+    lead = [r["lead_time_s"] for r in runs if r["lead_time_s"] is not None]
+    return {
+        "throughput_per_hour": round(sum(r["throughput_per_hour"] for r in runs) / len(runs), 2),
+        "lead_time_s": round(sum(lead) / len(lead), 1) if lead else None,
+        "wip": round(sum(r["wip"] for r in runs) / len(runs), 2),
+        "bottleneck": Counter(r["bottleneck"] for r in runs).most_common(1)[0][0],
+        "utilization": {s["name"]: round(sum(r["stations"][i]["utilization"] for r in runs) / len(runs), 3) for i, s in enumerate(runs[0]["stations"])},
+    }
+
+def run_batch(jobs):
+    # One pool task per chunk of scenarios keeps IPC overhead below the simulation cost
+    return [run_scenario(*job) for job in jobs]
+
+class ScenarioRunner:
+    def __init__(self, workers=None, cache_size=1024):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # scenario hash -> result
+        self.pool = None
+        self.hits = 0
+        self.misses = 0
+
+    def _pool(self):
+        if self.pool is None:
+            # spawn: workers only import line_sim, never the web app or its event loop
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.pool
+
+    def _remember(self, key, result):
+        self.cache[key] = result
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def _run(self, jobs):
+        # jobs: {hash: (line, changes, seconds, seed, replications)} not in the cache -> {hash: result}
+        if not jobs:
+            return {}
+        keys = list(jobs)
+        size = max(1, -(-len(keys) // (self.workers * 2)))
+        chunks = [keys[i:i + size] for i in range(0, len(keys), size)]
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*[loop.run_in_executor(self._pool(), run_batch, [jobs[k] for k in chunk]) for chunk in chunks])
+        out = {}
+        for chunk, rows in zip(chunks, results):
+            for key, row in zip(chunk, rows):
+                out[key] = row
+                self._remember(key, row)
+        return out
+
+    async def sweep(self, stations, grid, seconds=SHIFT_SECONDS, replications=1, seed=1):
+        start = time.perf_counter()
+        line = line_from_state(stations)
+        scenarios = expand_grid(line, grid)
+        baseline_key = scenario_key(line, [], seconds, seed, replications)
+        keys = [scenario_key(line, changes, seconds, seed, replications) for changes in scenarios]
+        # The cache is only a lookup: this sweep's results stay in `results`, since a large
+        # grid or a concurrent sweep can evict entries before they are read back
+        results, jobs = {}, {}
+        for key, changes in [(baseline_key, [])] + list(zip(keys, scenarios)):
+            if key in results or key in jobs:
+                continue
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                results[key] = self.cache[key]
+            else:
+                jobs[key] = (line, changes, seconds, seed, replications)
+        self.hits += len(scenarios) + 1 - len(jobs)
+        self.misses += len(jobs)
+        results.update(await self._run(jobs))
+        base = results[baseline_key]
+        out = []
+        for key, changes in zip(keys, scenarios):
+            r = results[key]
+            tp, lead = r["throughput_per_hour"], r["lead_time_s"]
+            out.append({
+                "id": key[:12],
+                "changes": [{"param": p, "station": s, "value": v} for p, s, v in changes],
+                **r,
+                "delta": {
+                    "throughput_per_hour": round(tp - base["throughput_per_hour"], 2),
+                    "throughput_pct": round((tp / base["throughput_per_hour"] - 1) * 100, 1) if base["throughput_per_hour"] else None,
+                    "lead_time_s": round(lead - base["lead_time_s"], 1) if lead is not None and base["lead_time_s"] is not None else None,
+                    "wip": round(r["wip"] - base["wip"], 2),
+                    "bottleneck_changed": r["bottleneck"] != base["bottleneck"],
+                },
+                "cached": key not in jobs,
+            })
+        best = max(out, key=lambda s: s["throughput_per_hour"])
+        return {"baseline": base, "scenarios": out, "best": best["id"], "simulated": len(jobs), "cached": len(scenarios) + 1 - len(jobs),
+                "seconds": seconds, "replications": replications, "seed": seed, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"workers": self.workers, "cached": len(self.cache), "hits": self.hits, "misses": self.misses, "hit_ratio": round(self.hits / total, 3) if total else None}
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
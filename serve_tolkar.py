@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
-import json, time
-from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs
+import os, sys, time, random, asyncio, argparse, mimetypes, posixpath, threading
+from email.utils import formatdate
+from config import settings
+from payloads import dumps, PayloadCache, Encoded, not_modified
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
 
 TOKEN="demo-token-001"
+ROOT = os.getcwd()  # static files, as SimpleHTTPRequestHandler served them
 
-def j(obj): return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+def j(obj): return dumps(obj)
+
+# Bumped by every action that changes the demo data; GET bodies are encoded once per version
+STATE_VERSION = 0
+PAYLOADS = PayloadCache()
+
+def cached(name, build, version=None):
+  return PAYLOADS.get(name, STATE_VERSION if version is None else version, build)
 
 LINES = [
   {"id":"L1","name":"Metal & Şase","wip":18,"oee":85,"status":"running"},
@@ -22,127 +33,326 @@ STATIONS = [
 ORDERS = [{"id":"O-1001","sku":"Smartex Miracle","qty":210,"done":96,"status":"active"}]
 EVENTS = [{"ts":int(time.time())-120,"type":"info","msg":"Demo server online"}]
 
-def ok_headers(h):
-  h.send_header("Cache-Control","no-store")
-  h.send_header("Access-Control-Allow-Origin","*")
-  h.send_header("Access-Control-Allow-Headers","Content-Type, Authorization")
-  h.send_header("Access-Control-Allow-Methods","GET, POST, OPTIONS")
+JSON_TYPE = "application/json; charset=utf-8"
+CORS = [
+  ("Access-Control-Allow-Origin","*"),
+  ("Access-Control-Allow-Headers","Content-Type, Authorization"),
+  ("Access-Control-Allow-Methods","GET, POST, OPTIONS"),
+]
 
-class H(SimpleHTTPRequestHandler):
-  def log_message(self, fmt, *args):
-    print('[HTTP]', fmt % args)
+# Routes: shared by the threaded and the asyncio server. Each returns (code, body) where
+# body is an Encoded (polled reads: ETag/304/compression) or plain bytes (no-store).
+def route_get(p, qs):
+  if p in ("/api/v1/status", "/api/status"):
+    return 200, Encoded(j({"health":"ok","reason":"demo-safe","ts":int(time.time())}))
 
-  def _send(self, code=200, ctype="application/json; charset=utf-8", body=b"{}"):
-    self.send_response(code)
-    self.send_header("Content-Type", ctype)
-    ok_headers(self)
-    self.end_headers()
-    if body:
-      self.wfile.write(body)
+  if p == "/api/v1/lines":
+    return 200, cached("lines", lambda: {"lines": LINES})
 
-  def do_OPTIONS(self):
-    return self._send(204, body=b"")
+  if p == "/api/v1/stations":
+    return 200, cached("stations", lambda: {"stations": STATIONS})
 
-  def do_GET(self):
-    p = urlparse(self.path).path
-    qs = parse_qs(urlparse(self.path).query)
+  if p == "/api/v1/orders":
+    return 200, cached("orders", lambda: {"orders": ORDERS})
 
-    if p in ("/api/v1/status", "/api/status"):
-      return self._send(200, body=j({"health":"ok","reason":"demo-safe","ts":int(time.time())}))
+  if p.startswith("/api/v1/events"):
+    lim = int(qs.get("limit",[200])[0])
+    return 200, cached("events:%d" % lim, lambda: {"events": EVENTS[-lim:]})
 
-    if p == "/api/v1/lines":
-      return self._send(200, body=j({"lines": LINES}))
+  if p == "/api/state":
+    # dashboard.html içinde okunan shape: {stations:[] ...}
+    now = int(time.time())
+    return 200, cached("state", lambda: {
+      "stations": STATIONS,
+      "lines": LINES,
+      "orders": ORDERS,
+      "last_sync": now
+    }, (STATE_VERSION, now))
 
-    if p == "/api/v1/stations":
-      return self._send(200, body=j({"stations": STATIONS}))
+  if p.startswith("/api/telemetry"):
+    # boş da olsa array bekleniyor
+    return 200, cached("telemetry", lambda: {"rows": []})
 
-    if p == "/api/v1/orders":
-      return self._send(200, body=j({"orders": ORDERS}))
+  if p == "/api/me":
+    return 200, j({"ok": True, "user":{"id":"admin","role":"Admin"}})
 
-    if p.startswith("/api/v1/events"):
-      lim = int(qs.get("limit",[200])[0])
-      return self._send(200, body=j({"events": EVENTS[-lim:]}))
+  # static fallback
+  return None
 
-    if p == "/api/state":
-      # dashboard.html içinde okunan shape: {stations:[] ...}
-      return self._send(200, body=j({
-        "stations": STATIONS,
-        "lines": LINES,
-        "orders": ORDERS,
-        "last_sync": int(time.time())
-      }))
+def route_post(p, body):
+  global STATE_VERSION
 
-    if p.startswith("/api/telemetry"):
-      # boş da olsa array bekleniyor
-      return self._send(200, body=j({"rows": []}))
+  # LOGIN catch-all
+  if p in ("/api/login", "/api/v1/login", "/api/auth/login"):
+    u = body.get("username") or body.get("user") or body.get("u") or ""
+    pw = body.get("password") or body.get("pass") or body.get("p") or ""
+    # demo: her şeyi kabul et, ama boşsa 401
+    if not u or not pw:
+      return 401, j({"ok": False, "message":"Eksik kullanıcı adı/şifre"})
+    return 200, j({"ok": True, "token": TOKEN, "user":{"id":u,"role":"Admin"}})
 
-    if p == "/api/me":
-      return self._send(200, body=j({"ok": True, "user":{"id":"admin","role":"Admin"}}))
+  # action endpoints
+  if p in ("/api/reset","/api/shock","/api/kaizen"):
+    EVENTS.append({"ts":int(time.time()),"type":"action","msg":f"{p} applied"})
+    STATE_VERSION += 1
+    return 200, j({"ok": True, "message": f"{p} ok"})
 
-    # static fallback
-    return super().do_GET()
+  return 404, j({"ok": False, "message": "not found", "path": p})
 
-  def _read_body(self):
-    try:
-      n = int(self.headers.get("Content-Length","0") or "0")
-      raw = self.rfile.read(n) if n>0 else b""
-      ct = (self.headers.get("Content-Type","") or "").lower()
-
-      # JSON
-      if "application/json" in ct:
-        import json
-        try:
-          return json.loads((raw.decode("utf-8", errors="ignore") or "{}"))
-        except Exception:
-          return {}
-
-      # x-www-form-urlencoded
-      if "application/x-www-form-urlencoded" in ct:
-        from urllib.parse import parse_qs
-        qs = parse_qs(raw.decode("utf-8", errors="ignore"))
-        return {k:(v[0] if isinstance(v,list) and v else "") for k,v in qs.items()}
-
-      # multipart/form-data (basit fallback: içinde username/password geçen düz metin)
-      txt = raw.decode("utf-8", errors="ignore")
-      if "username" in txt or "password" in txt:
-        # çok basit çıkarım: yine de AUTH tarafı genelde urlencoded kullanır
-        pass
-
-      # son çare: önce json dene, olmazsa urlencoded dene
+def parse_body(raw, ct):
+  try:
+    ct = (ct or "").lower()
+
+    # JSON
+    if "application/json" in ct:
       import json
       try:
-        return json.loads(txt or "{}")
+        return json.loads((raw.decode("utf-8", errors="ignore") or "{}"))
       except Exception:
-        from urllib.parse import parse_qs
-        qs = parse_qs(txt)
-        return {k:(v[0] if isinstance(v,list) and v else "") for k,v in qs.items()}
+        return {}
+
+    # x-www-form-urlencoded
+    if "application/x-www-form-urlencoded" in ct:
+      qs = parse_qs(raw.decode("utf-8", errors="ignore"))
+      return {k:(v[0] if isinstance(v,list) and v else "") for k,v in qs.items()}
 
+    # multipart/form-data (basit fallback: içinde username/password geçen düz metin)
+    txt = raw.decode("utf-8", errors="ignore")
+    if "username" in txt or "password" in txt:
+      # çok basit çıkarım: yine de AUTH tarafı genelde urlencoded kullanır
+      pass
+
+    # son çare: önce json dene, olmazsa urlencoded dene
+    import json
+    try:
+      return json.loads(txt or "{}")
     except Exception:
-      return {}
-
-  def do_POST(self):
-    p = urlparse(self.path).path
-    body = self._read_body()
-    ct = self.headers.get('Content-Type','')
-    print('[POST]', p, 'CT=', ct, 'BODY=', body)
-
-    # LOGIN catch-all
-    if p in ("/api/login", "/api/v1/login", "/api/auth/login"):
-      u = body.get("username") or body.get("user") or body.get("u") or ""
-      pw = body.get("password") or body.get("pass") or body.get("p") or ""
-      # demo: her şeyi kabul et, ama boşsa 401
-      if not u or not pw:
-        return self._send(401, body=j({"ok": False, "message":"Eksik kullanıcı adı/şifre"}))
-      return self._send(200, body=j({"ok": True, "token": TOKEN, "user":{"id":u,"role":"Admin"}}))
-
-    # action endpoints
-    if p in ("/api/reset","/api/shock","/api/kaizen"):
-      EVENTS.append({"ts":int(time.time()),"type":"action","msg":f"{p} applied"})
-      return self._send(200, body=j({"ok": True, "message": f"{p} ok"}))
-
-    return self._send(404, body=j({"ok": False, "message": "not found", "path": p}))
+      qs = parse_qs(txt)
+      return {k:(v[0] if isinstance(v,list) and v else "") for k,v in qs.items()}
+
+  except Exception:
+    return {}
+
+def reply(code, body, headers):
+  # -> (code, header list, body bytes); headers.get must be case-insensitive or lower-case keyed
+  if isinstance(body, Encoded):
+    data, coding, etag = body.negotiate(headers.get("accept-encoding"))
+    hdrs = [("ETag", etag), ("Vary", "Accept-Encoding"), ("Cache-Control", "no-cache")] + CORS
+    if not_modified(headers.get("if-none-match"), etag):
+      return 304, hdrs, b""
+    hdrs.append(("Content-Type", JSON_TYPE))
+    if coding:
+      hdrs.append(("Content-Encoding", coding))
+    return code, hdrs, data
+  return code, [("Content-Type", JSON_TYPE), ("Cache-Control", "no-store")] + CORS, body
+
+class StaticFile:
+  __slots__ = ("path", "size", "ctype", "etag", "last_modified", "data")
+
+class StaticCache:
+  # Static files resolved and stat'ed once, then served from memory; files above
+  # STATIC_MEMORY_FILE_MAX_BYTES (or once the cache is full) go out with sendfile.
+  # Entries live for the life of the process: restart to pick up edited files.
+  def __init__(self, root, max_file_bytes, max_total_bytes):
+    self.root = root
+    self.max_file_bytes = max_file_bytes
+    self.max_total_bytes = max_total_bytes
+    self.total = 0
+    self.files = {}
+    self.lock = threading.Lock()
+
+  def resolve(self, url_path):
+    rel = posixpath.normpath(unquote(url_path)).lstrip("/")
+    if rel.startswith(".."):
+      return None
+    path = os.path.join(self.root, *[part for part in rel.split("/") if part and part != "."])
+    if os.path.isdir(path):
+      path = os.path.join(path, "index.html")
+    return path if os.path.isfile(path) else None
+
+  def lookup(self, url_path):
+    f = self.files.get(url_path)
+    if f is not None:
+      return f
+    path = self.resolve(url_path)
+    if path is None:
+      return None
+    st = os.stat(path)
+    f = StaticFile()
+    f.path = path
+    f.size = st.st_size
+    f.ctype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    f.etag = '"%x-%x"' % (int(st.st_mtime), st.st_size)
+    f.last_modified = formatdate(st.st_mtime, usegmt=True)
+    f.data = None
+    with self.lock:
+      if f.size <= self.max_file_bytes and self.total + f.size <= self.max_total_bytes:
+        with open(path, "rb") as fh:
+          f.data = fh.read()
+        self.total += f.size
+      self.files[url_path] = f
+    return f
+
+  def serve(self, url_path, headers):
+    # -> (code, header list, body bytes, StaticFile to sendfile or None)
+    f = self.lookup(url_path)
+    if f is None:
+      return 404, [("Content-Type", "text/plain; charset=utf-8")], b"File not found", None
+    hdrs = [("ETag", f.etag), ("Last-Modified", f.last_modified), ("Cache-Control", "no-cache")]
+    if not_modified(headers.get("if-none-match"), f.etag):
+      return 304, hdrs, b"", None
+    hdrs.append(("Content-Type", f.ctype))
+    if f.data is not None:
+      return 200, hdrs, f.data, None
+    hdrs.append(("Content-Length", str(f.size)))
+    return 200, hdrs, b"", f
+
+STATIC = StaticCache(ROOT, settings.STATIC_MEMORY_FILE_MAX_BYTES, settings.STATIC_CACHE_MAX_BYTES)
+
+def dispatch(method, target, headers, raw):
+  # -> (code, header list, body bytes, StaticFile to sendfile or None)
+  u = urlparse(target)
+  p = u.path
+  try:
+    if method == "OPTIONS":
+      return 204, list(CORS), b"", None
+    if method in ("GET", "HEAD"):
+      res = route_get(p, parse_qs(u.query))
+      if res is None:
+        return STATIC.serve(p, headers)
+      return reply(*res, headers) + (None,)
+    if method == "POST":
+      return reply(*route_post(p, parse_body(raw, headers.get("content-type"))), headers) + (None,)
+    return 501, [("Content-Type", JSON_TYPE)] + CORS, j({"ok": False, "message": "unsupported method"}), None
+  except Exception as e:
+    return 500, [("Content-Type", JSON_TYPE)] + CORS, j({"ok": False, "message": str(e)}), None
+
+class RequestLog:
+  # Sampled + buffered access log: one line per `sample` fraction of requests and a
+  # summary every `interval` seconds, instead of a print per request
+  def __init__(self, sample, interval):
+    self.sample = sample
+    self.interval = interval
+    self.count = 0
+    self.errors = 0
+    self.total_ms = 0.0
+    self.since = time.monotonic()
+    self.lock = threading.Lock()
+
+  def record(self, method, path, code, ms):
+    with self.lock:
+      self.count += 1
+      self.total_ms += ms
+      if code >= 500:
+        self.errors += 1
+      now = time.monotonic()
+      flush = now - self.since >= self.interval
+      if flush:
+        count, errors, total_ms, elapsed = self.count, self.errors, self.total_ms, now - self.since
+        self.count = self.errors = 0
+        self.total_ms = 0.0
+        self.since = now
+    if self.sample and random.random() < self.sample:
+      print('[HTTP]', method, path, code, '%.2fms' % ms)
+    if flush:
+      print('[HTTP] %d requests in %.0fs (%.0f req/s, avg %.2fms, %d errors)' % (count, elapsed, count / elapsed, total_ms / max(count, 1), errors))
+
+LOG = RequestLog(settings.SERVE_LOG_SAMPLE, settings.SERVE_LOG_INTERVAL_SECONDS)
+
+def no_body(method, code):
+  return method == "HEAD" or code in (204, 304)
+
+class H(BaseHTTPRequestHandler):
+  # Threaded mode: one thread per connection, HTTP/1.0 (connection closed after each response)
+  def log_message(self, fmt, *args):
+    pass
+
+  def _serve(self):
+    start = time.perf_counter()
+    n = int(self.headers.get("Content-Length","0") or "0")
+    raw = self.rfile.read(n) if n>0 else b""
+    code, hdrs, body, f = dispatch(self.command, self.path, self.headers, raw)
+    self.send_response(code)
+    for k, v in hdrs:
+      self.send_header(k, v)
+    if f is None and code not in (204, 304):
+      self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    if not no_body(self.command, code):
+      if f is not None:
+        with open(f.path, "rb") as fh:
+          self.wfile.flush()
+          self.connection.sendfile(fh)
+      elif body:
+        self.wfile.write(body)
+    LOG.record(self.command, self.path, code, (time.perf_counter() - start) * 1000)
+
+  do_GET = do_HEAD = do_POST = do_OPTIONS = _serve
+
+REASONS = {200: "OK", 204: "No Content", 304: "Not Modified", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 500: "Internal Server Error", 501: "Not Implemented"}
+
+async def handle_connection(reader, writer):
+  # Asyncio mode: HTTP/1.1 keep-alive, idle connections closed after SERVE_KEEPALIVE_SECONDS
+  loop = asyncio.get_running_loop()
+  try:
+    while True:
+      try:
+        line = await asyncio.wait_for(reader.readline(), settings.SERVE_KEEPALIVE_SECONDS)
+      except asyncio.TimeoutError:
+        break
+      if not line.strip():
+        break
+      start = time.perf_counter()
+      method, target, version = line.decode("latin-1").split()
+      headers = {}
+      while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+          break
+        k, _, v = h.decode("latin-1").partition(":")
+        headers[k.strip().lower()] = v.strip()
+      n = int(headers.get("content-length") or 0)
+      raw = await reader.readexactly(n) if n > 0 else b""
+      conn = headers.get("connection", "").lower()
+      keep_alive = conn == "keep-alive" or (version == "HTTP/1.1" and conn != "close")
+
+      code, hdrs, body, f = dispatch(method, target, headers, raw)
+      head = ["HTTP/1.1 %d %s" % (code, REASONS.get(code, "")), "Date: " + formatdate(usegmt=True), "Connection: " + ("keep-alive" if keep_alive else "close")]
+      head += ["%s: %s" % kv for kv in hdrs]
+      if f is None and code not in (204, 304):
+        head.append("Content-Length: %d" % len(body))
+      writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+      if not no_body(method, code):
+        if f is not None:
+          await writer.drain()
+          with open(f.path, "rb") as fh:
+            await loop.sendfile(writer.transport, fh)
+        elif body:
+          writer.write(body)
+      await writer.drain()
+      LOG.record(method, target, code, (time.perf_counter() - start) * 1000)
+      if not keep_alive:
+        break
+  except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+    pass
+  finally:
+    writer.close()
+
+async def serve_async(host, port):
+  server = await asyncio.start_server(handle_connection, host, port, backlog=1024)
+  async with server:
+    await server.serve_forever()
 
 if __name__ == "__main__":
-  srv = ThreadingHTTPServer(("0.0.0.0", 8084), H)
-  print("Serving on http://0.0.0.0:8084")
-  srv.serve_forever()
+  ap = argparse.ArgumentParser(description="TOLKAR kiosk demo server")
+  ap.add_argument("--mode", choices=("threaded", "asyncio"), default=settings.SERVE_MODE)
+  ap.add_argument("--host", default="0.0.0.0")
+  ap.add_argument("--port", type=int, default=settings.SERVE_PORT)
+  args = ap.parse_args()
+  print("Serving on http://%s:%d (%s)" % (args.host, args.port, args.mode))
+  sys.stdout.flush()
+  if args.mode == "asyncio":
+    asyncio.run(serve_async(args.host, args.port))
+  else:
+    srv = ThreadingHTTPServer((args.host, args.port), H)
+    srv.serve_forever()
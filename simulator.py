@@ -1,96 +1,345 @@
 import time
 import random
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
+from config import settings
+from line_sim import station_params, simulate_shift
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+METRICS = {"vibration": "vibration_mms", "temperature": "temperature_c", "pressure": "pressure_bar", "power": "power_kw_idx"}
+
+BASE_STATIONS = [
+    {"name": "Washing", "wip": 3, "ct": 45, "fpy": 98.0, "oee": 94.0},
+    {"name": "Pre-treatment", "wip": 3, "ct": 45, "fpy": 98.0, "oee": 94.0},
+    {"name": "Finishing", "wip": 4, "ct": 50, "fpy": 96.0, "oee": 90.0},
+    {"name": "Inspection", "wip": 2, "ct": 25, "fpy": 97.0, "oee": 92.0},
+    {"name": "Packaging", "wip": 2, "ct": 20, "fpy": 99.0, "oee": 95.0},
+]
+
+# Simulated reading = low + random() * spread, rounded to `digits`
+TELEMETRY_RANGES = {"vibration_mms": (2.0, 0.6, 2), "temperature_c": (76, 6, 1), "pressure_bar": (5.8, 0.6, 2), "power_kw_idx": (80, 8, 1)}
+
+EPOCH = datetime(1970, 1, 1)
+
+class TimeSeries:
+    # Rows kept in timestamp order next to a parallel key list, so range + limit queries
+    # bisect instead of filtering and sorting: O(log n + limit). Bounded to `capacity`
+    # rows, oldest evicted first. With `index`, rows are also kept per value of that
+    # field (e.g. station_id) in sub-series trimmed together with the main one.
+    def __init__(self, field, capacity, index=None):
+        self.field = field
+        self.capacity = capacity
+        self.index = index
+        self.keys = []
+        self.rows = []
+        self.head = 0  # rows[:head] are evicted; compacted in batches
+        self.parts = {}
+
+    def __len__(self):
+        return len(self.rows) - self.head
+
+    def __iter__(self):
+        return iter(self.rows[self.head:])
+
+    def __reversed__(self):
+        for i in range(len(self.rows) - 1, self.head - 1, -1):
+            yield self.rows[i]
+
+    def _insert(self, key, row):
+        if not self.rows or key >= self.keys[-1]:
+            self.keys.append(key)
+            self.rows.append(row)
+        else:
+            i = bisect_right(self.keys, key, self.head)
+            self.keys.insert(i, key)
+            self.rows.insert(i, row)
+
+    def append(self, row):
+        key = row[self.field] or datetime.utcnow()
+        self._insert(key, row)
+        if self.index:
+            part = self.parts.get(row[self.index])
+            if part is None:
+                part = self.parts[row[self.index]] = TimeSeries(self.field, self.capacity)
+            part._insert(key, row)
+        if len(self) > self.capacity:
+            self._evict()
+
+    def _evict(self):
+        row = self.rows[self.head]
+        self.rows[self.head] = None
+        self.head += 1
+        if self.index:
+            part = self.parts[row[self.index]]
+            i = part.head
+            while part.rows[i] is not row:  # only differs when timestamps tie
+                i += 1
+            part.rows[i], part.rows[part.head] = part.rows[part.head], None
+            part.head += 1
+            part._compact()
+            if not len(part):
+                del self.parts[row[self.index]]
+        self._compact()
+
+    def _compact(self):
+        if self.head >= 1024 and self.head * 2 >= len(self.rows):
+            del self.keys[:self.head]
+            del self.rows[:self.head]
+            self.head = 0
+
+    def newest(self, start=None, end=None, limit=100, key=None):
+        # Rows with start <= ts <= end, newest first
+        if key is not None:
+            part = self.parts.get(key)
+            return part.newest(start, end, limit) if part else []
+        lo = bisect_left(self.keys, start, self.head) if start else self.head
+        hi = bisect_right(self.keys, end, self.head) if end else len(self.rows)
+        return self.rows[max(lo, hi - limit):hi][::-1]
 
 class Simulator:
-    def __init__(self):
-        self.stations = [
-            {"id": 1, "name": "Washing", "wip": 3, "ct": 45, "fpy": 98.0, "oee": 94.0, "status": "ok"},
-            {"id": 2, "name": "Pre-treatment", "wip": 3, "ct": 45, "fpy": 98.0, "oee": 94.0, "status": "ok"},
-            {"id": 3, "name": "Finishing", "wip": 4, "ct": 50, "fpy": 96.0, "oee": 90.0, "status": "ok"},
-            {"id": 4, "name": "Inspection", "wip": 2, "ct": 25, "fpy": 97.0, "oee": 92.0, "status": "ok"},
-            {"id": 5, "name": "Packaging", "wip": 2, "ct": 20, "fpy": 99.0, "oee": 95.0, "status": "ok"},
-        ]
-        self.events = []
-        self.telemetry = []
+    def __init__(self, telemetry_capacity=None, event_capacity=None):
+        self.stations = [{"id": i, **b, "status": "ok"} for i, b in enumerate(BASE_STATIONS, start=1)]
+        self.events = TimeSeries("created_at", event_capacity or settings.SIM_EVENT_MAX_ROWS)
+        self.telemetry = TimeSeries("recorded_at", telemetry_capacity or settings.SIM_TELEMETRY_MAX_ROWS, index="station_id")
+        self.ticks = 0
+        self.baseline = station_params(self.stations)
+        self.baseline_run = simulate_shift(self.baseline, seed=settings.SIM_LINE_SEED)
+        self.kaizen_steps = 0
+        self.shocked = False
+        self.line = [dict(p) for p in self.baseline]
+        self.last_run = None
         self._seed()
+        self._simulate()
 
     def _seed(self):
         now = datetime.utcnow()
-        for s in self.stations:
-            for i in range(24):
-                t = now - timedelta(minutes=5*i)
-                self.telemetry.append({
-                    "id": f"t-{s['id']}-{i}", "station_id": s["id"],
-                    "vibration_mms": round(2.0 + random.random()*0.6, 2),
-                    "temperature_c": round(76 + random.random()*6, 1),
-                    "pressure_bar": round(5.8 + random.random()*0.6, 2),
-                    "power_kw_idx": round(80 + random.random()*8, 1),
-                    "recorded_at": t
-                })
+        for i in range(23, -1, -1):
+            self.tick(now - timedelta(minutes=5*i))
         self.events.append({"id": "e-1", "event_type": "shock", "station_id": 3, "label": "Bottleneck detected @ Finishing", "severity": "critical", "created_at": now - timedelta(hours=1)})
 
+    def tick(self, now=None):
+        # One reading per station
+        now = now or datetime.utcnow()
+        for s in self.stations:
+            row = {"id": f"t-{s['id']}-{self.ticks}", "station_id": s["id"]}
+            for col, (low, spread, digits) in TELEMETRY_RANGES.items():
+                row[col] = round(low + random.random()*spread, digits)
+            row["recorded_at"] = now
+            self.telemetry.append(row)
+        self.ticks += 1
+
+    def _telemetry_history(self, points=12, resolution=60):
+        # Plant-wide average per time bucket, oldest first; walks back from the newest row
+        buckets = {}
+        for r in reversed(self.telemetry):
+            key = int((r["recorded_at"] - EPOCH).total_seconds()) // resolution
+            if key not in buckets and len(buckets) == points:
+                break
+            buckets.setdefault(key, []).append(r)
+        history = {m: [] for m in METRICS}
+        for key in sorted(buckets):
+            rows = buckets[key]
+            for m, col in METRICS.items():
+                history[m].append(round(sum(r[col] for r in rows) / len(rows), 2))
+        return history
+
+    def _station_dicts(self):
+        return self.stations
+
+    def _build_line(self):
+        # Model parameters = baseline + kaizen steps + active disruption, always rebuilt from
+        # the baseline so repeated shocks or kaizens never compound without bound
+        line = [dict(p) for p in self.baseline]
+        for p in line:
+            p["ct"] *= 0.95 ** self.kaizen_steps
+            p["mttr"] *= 0.8 ** self.kaizen_steps
+            p["fpy"] = min(99.5, p["fpy"] + self.kaizen_steps)
+        fin = next((i for i, x in enumerate(self.stations) if x["name"] == "Finishing"), None)
+        if self.shocked and fin is not None:
+            # Slower, less reliable, more scrap at Finishing; the queue in front of it follows
+            p = line[fin]
+            p["ct"] *= 1.3
+            p["mttr"] *= 3
+            p["fpy"] = max(90.0, p["fpy"] - 4.0)
+        return line
+
+    def _simulate(self):
+        # Fast-forward one shift of the line model and publish what emerged. The seed is
+        # fixed so a parameter change, not sampling noise, explains the difference. Every
+        # line has a constraint, so a station is only flagged when the line lost throughput
+        # against the baseline run, or the constraint moved, and that station is the cause.
+        self.line = self._build_line()
+        run = self.last_run = simulate_shift(self.line, seed=settings.SIM_LINE_SEED)
+        base = self.baseline_run
+        degraded = run["bottleneck_index"] != base["bottleneck_index"] or run["throughput_per_hour"] < base["throughput_per_hour"] * 0.98
+        for i, (s, p, r) in enumerate(zip(self.stations, self.line, run["stations"])):
+            s["ct"] = round(p["ct"], 1)
+            s["wip"] = round(r["wip"])
+            s["oee"] = r["oee"]
+            s["fpy"] = r["fpy"]
+            s["status"] = "bottleneck" if degraded and i == run["bottleneck_index"] else "ok"
+        return run
+
     def get_state(self):
         ts = datetime.utcnow()
+        history = self._telemetry_history()
+        if not history["vibration"]:
+            history = {"vibration": [2.0, 2.1, 2.2, 2.3], "temperature": [80, 79, 78, 78],
+                       "pressure": [5.9, 6.0, 6.1, 6.2], "power": [81, 82, 84, 85]}
         return {
-            "stations": self.stations,
+            "stations": self._station_dicts(),
             "telemetry": {
-                "vibration": 2.3,
-                "temperature": 78,
-                "pressure": 6.2,
-                "power": 85,
-                "history": {
-                    "vibration": [2.0, 2.1, 2.2, 2.3],
-                    "temperature": [80, 79, 78, 78],
-                    "pressure": [5.9, 6.0, 6.1, 6.2],
-                    "power": [81, 82, 84, 85]
-                }
+                "vibration": history["vibration"][-1],
+                "temperature": history["temperature"][-1],
+                "pressure": history["pressure"][-1],
+                "power": history["power"][-1],
+                "history": history
             },
             "timestamp": ts
         }
 
     def reset(self):
-        for s in self.stations:
-            s["status"] = "ok"
+        self.kaizen_steps, self.shocked = 0, False
+        self._simulate()
         self.events.append({"id": f"e-{int(time.time())}", "event_type": "reset", "station_id": None, "label": "Stations reset to baseline", "severity": "info", "created_at": datetime.utcnow()})
         return {"status": "success", "message": "All stations reset to baseline"}
 
     def shock(self):
         fin = next((x for x in self.stations if x["name"] == "Finishing"), None)
         if fin:
-            fin["status"] = "bottleneck"
-            fin["wip"] = 8
-            fin["fpy"] = max(90.0, fin["fpy"] - 4.0)
+            self.shocked = True
+            self._simulate()
             self.events.append({"id": f"e-{int(time.time())}", "event_type": "shock", "station_id": fin["id"], "label": "Bottleneck detected @ Finishing", "severity": "critical", "created_at": datetime.utcnow()})
         return {"status": "success", "message": "Disruption simulated", "disruption": "Finishing station bottleneck"}
 
     def kaizen(self):
+        # Clears the disruption (as before) and improves every station, up to three steps
+        self.kaizen_steps = min(self.kaizen_steps + 1, 3)
+        self.shocked = False
+        self._simulate()
         for s in self.stations:
-            s["status"] = "ok"
-            s["wip"] = max(1, s["wip"] - 1)
-            s["oee"] = min(96.0, s["oee"] + 1.0)
-            s["fpy"] = min(99.0, s["fpy"] + 1.0)
             self.events.append({"id": f"e-{int(time.time())}", "event_type": "kaizen", "station_id": s["id"], "label": "Kaizen applied", "severity": "info", "created_at": datetime.utcnow()})
         return {"status": "success", "message": "Kaizen improvement completed"}
 
     def get_events(self, limit=20, start=None, end=None):
-        rows = list(self.events)
-        rows.sort(key=lambda r: (r["created_at"] or datetime.utcnow()), reverse=True)
-        if start:
-            rows = [r for r in rows if r["created_at"] and r["created_at"] >= start]
-        if end:
-            rows = [r for r in rows if r["created_at"] and r["created_at"] <= end]
-        return rows[:limit]
+        return self.events.newest(start, end, limit)
+
+    def get_telemetry(self, start=None, end=None, station_id=None, limit=100):
+        return self.telemetry.newest(start, end, limit, key=station_id or None)
+
+class ColumnarSimulator(Simulator):
+    # Capacity-testing mode: same interface and dict-shaped outputs as Simulator, but
+    # station fields are NumPy columns and telemetry is one (stations x ticks) ring buffer
+    # per metric, so thousands of stations tick in one vectorized step. Stations repeat
+    # the five BASE_STATIONS profiles; shock and kaizen adjust the columns directly rather
+    # than running the line model, and kaizen logs one plant-wide event.
+    def __init__(self, stations=1000, capacity=288, seed_ticks=24, interval=300, rng_seed=None):
+        if np is None:
+            raise RuntimeError("ColumnarSimulator requires numpy")
+        self.n = stations
+        self.capacity = capacity
+        self.rng = np.random.default_rng(rng_seed)
+        k = len(BASE_STATIONS)
+        self.profile = np.arange(stations) % k
+        self.ids = np.arange(1, stations + 1)
+        self.names = [BASE_STATIONS[p]["name"] if stations <= k else "%s %d" % (BASE_STATIONS[p]["name"], i // k + 1) for i, p in enumerate(self.profile.tolist())]
+        self.wip = np.array([b["wip"] for b in BASE_STATIONS], dtype=np.int32)[self.profile]
+        self.ct = np.array([b["ct"] for b in BASE_STATIONS], dtype=np.int32)[self.profile]
+        self.fpy = np.array([b["fpy"] for b in BASE_STATIONS])[self.profile]
+        self.oee = np.array([b["oee"] for b in BASE_STATIONS])[self.profile]
+        self.bottleneck = np.zeros(stations, dtype=bool)
+        self.tel = {col: np.zeros((stations, capacity), dtype=np.float32) for col in TELEMETRY_RANGES}
+        self.tick_ts = np.zeros(capacity)  # epoch seconds of each ring slot
+        self.ticks = 0  # readings per station so far; tick n lives in slot n % capacity
+        self.events = TimeSeries("created_at", settings.SIM_EVENT_MAX_ROWS)
+        now = datetime.utcnow()
+        for i in range(seed_ticks - 1, -1, -1):
+            self.tick(now - timedelta(seconds=interval * i))
+        fin = int(np.argmax(self.profile == 2))
+        self.events.append({"id": "e-1", "event_type": "shock", "station_id": fin + 1, "label": "Bottleneck detected @ Finishing", "severity": "critical", "created_at": datetime.utcnow() - timedelta(hours=1)})
+
+    def tick(self, now=None):
+        # One reading per station and metric, written as a single ring column
+        slot = self.ticks % self.capacity
+        for col, (low, spread, _) in TELEMETRY_RANGES.items():
+            self.tel[col][:, slot] = low + self.rng.random(self.n, dtype=np.float32) * spread
+        self.tick_ts[slot] = ((now or datetime.utcnow()) - EPOCH).total_seconds()
+        self.ticks += 1
+
+    def _slots(self):
+        # Valid ring slots, oldest first (tick times ascending)
+        seqs = np.arange(max(0, self.ticks - self.capacity), self.ticks)
+        return seqs, seqs % self.capacity
+
+    def _telemetry_history(self, points=12, resolution=60):
+        seqs, slots = self._slots()
+        buckets = (self.tick_ts[slots] // resolution).astype(np.int64)
+        keep = buckets >= np.unique(buckets)[-points:][0] if len(buckets) else buckets.astype(bool)
+        slots, buckets = slots[keep], buckets[keep]
+        _, first = np.unique(buckets, return_index=True)
+        history = {}
+        for m, col in METRICS.items():
+            # All stations read once per tick, so the bucket mean is the mean of per-tick means
+            per_tick = self.tel[col][:, slots].mean(axis=0, dtype=np.float64)
+            sums = np.add.reduceat(per_tick, first) if len(first) else per_tick
+            counts = np.diff(np.append(first, len(per_tick)))
+            history[m] = np.round(sums / counts, 2).tolist() if len(first) else []
+        return history
+
+    def _station_dicts(self):
+        status = np.where(self.bottleneck, "bottleneck", "ok").tolist()
+        return [{"id": i, "name": n, "wip": w, "ct": c, "fpy": f, "oee": o, "status": st}
+                for i, n, w, c, f, o, st in zip(self.ids.tolist(), self.names, self.wip.tolist(), self.ct.tolist(), self.fpy.tolist(), self.oee.tolist(), status)]
+
+    def reset(self):
+        self.bottleneck[:] = False
+        self.events.append({"id": f"e-{int(time.time())}", "event_type": "reset", "station_id": None, "label": "Stations reset to baseline", "severity": "info", "created_at": datetime.utcnow()})
+        return {"status": "success", "message": "All stations reset to baseline"}
+
+    def shock(self):
+        fin = int(np.argmax(self.profile == 2)) if self.n > 2 else None
+        if fin is not None:
+            self.bottleneck[fin] = True
+            self.wip[fin] = 8
+            self.fpy[fin] = max(90.0, self.fpy[fin] - 4.0)
+            self.events.append({"id": f"e-{int(time.time())}", "event_type": "shock", "station_id": fin + 1, "label": "Bottleneck detected @ Finishing", "severity": "critical", "created_at": datetime.utcnow()})
+        return {"status": "success", "message": "Disruption simulated", "disruption": "Finishing station bottleneck"}
+
+    def kaizen(self):
+        self.bottleneck[:] = False
+        np.maximum(self.wip - 1, 1, out=self.wip)
+        np.minimum(self.oee + 1.0, 96.0, out=self.oee)
+        np.minimum(self.fpy + 1.0, 99.0, out=self.fpy)
+        self.events.append({"id": f"e-{int(time.time())}", "event_type": "kaizen", "station_id": None, "label": "Kaizen applied", "severity": "info", "created_at": datetime.utcnow()})
+        return {"status": "success", "message": "Kaizen improvement completed"}
 
     def get_telemetry(self, start=None, end=None, station_id=None, limit=100):
-        rows = list(self.telemetry)
+        seqs, slots = self._slots()
+        ts = self.tick_ts[slots]
+        lo = int(np.searchsorted(ts, (start - EPOCH).total_seconds(), "left")) if start else 0
+        hi = int(np.searchsorted(ts, (end - EPOCH).total_seconds(), "right")) if end else len(ts)
         if station_id:
-            rows = [r for r in rows if r["station_id"] == station_id]
-        if start:
-            rows = [r for r in rows if r["recorded_at"] and r["recorded_at"] >= start]
-        if end:
-            rows = [r for r in rows if r["recorded_at"] and r["recorded_at"] <= end]
-        rows.sort(key=lambda r: r["recorded_at"], reverse=True)
-        return rows[:limit]
-
-sim = Simulator()
+            rows = np.array([station_id - 1]) if 1 <= station_id <= self.n else np.array([], dtype=np.int64)
+        else:
+            rows = np.arange(self.n)
+        out = []
+        # Newest tick first, stations in id order within a tick; only `limit` dicts are built
+        for seq, slot, t in zip(seqs[lo:hi][::-1].tolist(), slots[lo:hi][::-1].tolist(), ts[lo:hi][::-1].tolist()):
+            if len(out) >= limit:
+                break
+            take = rows[:limit - len(out)]
+            recorded_at = EPOCH + timedelta(seconds=t)
+            cols = {col: np.round(self.tel[col][take, slot].astype(np.float64), digits).tolist() for col, (_, _, digits) in TELEMETRY_RANGES.items()}
+            for j, r in enumerate(take.tolist()):
+                row = {"id": f"t-{r + 1}-{seq}", "station_id": r + 1}
+                for col in TELEMETRY_RANGES:
+                    row[col] = cols[col][j]
+                row["recorded_at"] = recorded_at
+                out.append(row)
+        return out
+
+sim = ColumnarSimulator(settings.SIM_STATIONS, settings.SIM_TELEMETRY_CAPACITY) if settings.SIM_COLUMNAR else Simulator()
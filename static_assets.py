@@ -0,0 +1,125 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+from email.utils import formatdate
+from payloads import brotli, pick_encoding, not_modified
+from config import settings
+
+# Startup asset pipeline for the /ui and /assets mounts: only whitelisted pages and the
+# assets/ tree are served, JS/CSS get content-hashed URLs with immutable caching, and
+# every file is held in memory with its gzip/brotli variants precompressed.
+UI_PAGES = [
+    "index.html", "login.html", "dashboard.html", "FactoryFlowLine.html", "MES.html",
+    "flow_live.html", "wallboard.html", "greenfactory.html", "historical.html", "lines.html",
+    "maintenance.html", "materials.html", "quality.html", "reports.html", "shipping.html",
+    "sites.html", "tolkar_dashboard_v3.html", "factory-logo 2.svg",
+]
+ASSET_DIR = "assets"
+FINGERPRINTED = (".js", ".css")
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# src="assets/js/x.js", href="/assets/css/y.css", src="./assets/..."
+ASSET_REF = re.compile(r'((?:src|href)\s*=\s*["\'])((?:\.?/)?)(assets/[^"\'?#]+)')
+
+class Asset:
+    __slots__ = ("body", "ctype", "etag", "cache_control", "last_modified", "variants")
+
+    def __init__(self, body, ctype, cache_control, mtime):
+        self.body = body
+        self.ctype = ctype
+        self.etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        self.cache_control = cache_control
+        self.last_modified = formatdate(mtime, usegmt=True)
+        self.variants = {}
+        if ctype.startswith(COMPRESSIBLE) and len(body) >= settings.COMPRESS_MIN_BYTES:
+            # Precompressed once at startup at the highest levels; only kept when smaller
+            gz = gzip.compress(body, compresslevel=settings.ASSET_GZIP_LEVEL, mtime=0)
+            if len(gz) < len(body):
+                self.variants["gzip"] = gz
+            if brotli:
+                br = brotli.compress(body, quality=settings.ASSET_BROTLI_QUALITY)
+                if len(br) < len(body):
+                    self.variants["br"] = br
+
+class AssetBundle:
+    def __init__(self, root=".", pages=None):
+        self.root = root
+        self.pages = pages or UI_PAGES
+        self.files = {}  # url path relative to the mount ("dashboard.html", "assets/js/x.abc123.js") -> Asset
+        self.fingerprints = {}  # "assets/js/x.js" -> "assets/js/x.abc123.js"
+
+    def _read(self, rel):
+        path = os.path.join(self.root, *rel.split("/"))
+        with open(path, "rb") as fh:
+            return fh.read(), os.stat(path).st_mtime
+
+    def _ctype(self, rel):
+        ctype = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+        return ctype + "; charset=utf-8" if ctype.startswith("text/") or ctype == "application/javascript" else ctype
+
+    def build(self):
+        asset_root = os.path.join(self.root, ASSET_DIR)
+        for dirpath, _, names in os.walk(asset_root):
+            for name in sorted(names):
+                rel = os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, "/")
+                body, mtime = self._read(rel)
+                ctype = self._ctype(rel)
+                # The plain URL stays valid (revalidated); the hashed one is cacheable forever
+                self.files[rel] = Asset(body, ctype, REVALIDATE, mtime)
+                if rel.endswith(FINGERPRINTED):
+                    stem, ext = os.path.splitext(rel)
+                    hashed = "%s.%s%s" % (stem, hashlib.sha1(body).hexdigest()[:10], ext)
+                    self.fingerprints[rel] = hashed
+                    self.files[hashed] = Asset(body, ctype, IMMUTABLE, mtime)
+        for rel in self.pages:
+            if not os.path.isfile(os.path.join(self.root, rel)):
+                continue
+            body, mtime = self._read(rel)
+            if rel.endswith(".html"):
+                body = self.rewrite(body.decode("utf-8")).encode("utf-8")
+            self.files[rel] = Asset(body, self._ctype(rel), REVALIDATE, mtime)
+        return self
+
+    def rewrite(self, html):
+        def sub(m):
+            return m.group(1) + m.group(2) + self.fingerprints.get(m.group(3), m.group(3))
+        return ASSET_REF.sub(sub, html)
+
+    def get(self, rel):
+        return self.files.get(rel or "index.html")
+
+    def serve(self, rel, headers):
+        # -> (status, header dict, body)
+        asset = self.get(rel)
+        if asset is None:
+            return 404, {"Content-Type": "text/plain; charset=utf-8"}, b"Not Found"
+        coding = pick_encoding(headers.get("accept-encoding")) if asset.variants else None
+        if coding not in asset.variants:
+            coding = None
+        etag = asset.etag if coding is None else asset.etag[:-1] + "-" + coding + '"'
+        out = {"ETag": etag, "Cache-Control": asset.cache_control, "Last-Modified": asset.last_modified}
+        if asset.variants:
+            out["Vary"] = "Accept-Encoding"
+        if not_modified(headers.get("if-none-match"), etag):
+            return 304, out, b""
+        out["Content-Type"] = asset.ctype
+        if coding:
+            out["Content-Encoding"] = coding
+            return 200, out, asset.variants[coding]
+        return 200, out, asset.body
+
+    def stats(self):
+        raw = sum(len(a.body) for a in self.files.values())
+        best = sum(min([len(a.body)] + [len(v) for v in a.variants.values()]) for a in self.files.values())
+        return {"files": len(self.files), "fingerprinted": len(self.fingerprints), "bytes": raw, "compressed_bytes": best}
+
+if __name__ == "__main__":
+    # Build report: what would be served and how well it compresses
+    bundle = AssetBundle().build()
+    for rel, a in sorted(bundle.files.items()):
+        sizes = " ".join("%s=%d" % kv for kv in ((k, len(v)) for k, v in sorted(a.variants.items())))
+        print("%-48s %8d %s %s" % (rel, len(a.body), "immutable" if a.cache_control == IMMUTABLE else "", sizes))
+    print(bundle.stats())
@@ -0,0 +1,31 @@
+import os, sys, types
+from datetime import datetime
+import pytest
+
+# Tests import the demo modules (simulator, scenarios, ...) from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _demo_services():
+    # main_starlette imports its demo factory from services.simulator, which is not part of
+    # this tree: stand in with a fixed two-station line (Montaj, Boya) when it is missing
+    state = {"stations": [{"name": "Montaj 1", "wip": 3, "cycle_time_sec": 120, "oee": 90, "fpy": 97, "status": "ok"},
+                          {"name": "Boya 1", "wip": 2, "cycle_time_sec": 100, "oee": 80, "fpy": 95, "status": "ok"}],
+             "events": [], "timestamp": datetime(2026, 1, 1).isoformat()}
+    module = types.ModuleType("services.simulator")
+    module.initialize_demo_factory = lambda: None
+    module.get_demo_state = lambda: {**state, "timestamp": datetime.utcnow().isoformat()}
+    module.reset_demo_factory = module.get_demo_state
+    module.apply_demo_shock = lambda **kwargs: {"success": True}
+    module.apply_demo_kaizen = lambda **kwargs: {"success": True}
+    package = types.ModuleType("services")
+    package.simulator = module
+    return {"services": package, "services.simulator": module}
+
+@pytest.fixture(scope="session")
+def main_starlette():
+    try:
+        import services.simulator  # noqa: F401
+    except ImportError:
+        sys.modules.update(_demo_services())
+    import main_starlette
+    return main_starlette
@@ -0,0 +1,24 @@
+import asyncio
+from broadcast import Broadcaster, fanout, sse_stream, stable_digest
+
+def test_demo_streams_use_the_shared_fanout():
+    assert issubclass(Broadcaster, fanout.Broadcaster) and sse_stream is fanout.sse_stream
+    broadcaster = Broadcaster(max_queue=5)
+    sub = broadcaster.subscribe(["state"])
+
+    assert broadcaster.publish("state", {"ts": 1, "units": 3})
+    # Demo volatile keys are ignored unless the publish is forced
+    assert broadcaster.publish("state", {"ts": 2, "units": 3}) is None
+    assert broadcaster.publish("state", {"ts": 2, "units": 3}, force=True)
+    assert stable_digest({"ts": 1, "eta_ts": 1}) == stable_digest({"ts": 2, "eta_ts": 2})
+
+    async def first_chunks():
+        stream = sse_stream(broadcaster, sub, 5)
+        chunks = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        return chunks
+
+    retry, event = asyncio.run(first_chunks())
+    assert retry == b"retry: 3000\n\n"
+    assert event.startswith(b"event: state\nid: 2\n") and b'"ts":2' in event
+    assert not broadcaster.subscribers
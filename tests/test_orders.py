@@ -0,0 +1,13 @@
+import time
+
+def test_orders_timestamps_come_from_the_state_snapshot(main_starlette):
+    projections = main_starlette.projections
+    projections.invalidate()
+    ts = projections.doc("state").get("timestamp")
+    orders = projections.doc("orders")["orders"]
+    assert orders and all(o["updated_ts"] == ts and o["eta_ts"] == ts for o in orders)
+    # A rebuild of unchanged state must not look like an order change
+    version = main_starlette.TRACKERS["orders"].version
+    time.sleep(0.01)
+    assert main_starlette.build_orders_v1()["orders"] == orders
+    assert main_starlette.TRACKERS["orders"].version == version
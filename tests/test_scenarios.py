@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+from scenarios import ScenarioRunner, expand_grid, line_from_state
+from simulator import BASE_STATIONS
+
+STATIONS = [dict(s) for s in BASE_STATIONS]
+GRID = [{"param": "ct", "station": "Finishing", "values": [-5, -10, -15, -20]},
+        {"param": "buffer", "station": "*", "values": [4, 8, 12]}]  # 12 scenarios
+
+@pytest.fixture
+def runner():
+    r = ScenarioRunner(workers=2, cache_size=8)
+    yield r
+    r.shutdown()
+
+def test_sweep_larger_than_cache(runner):
+    res = asyncio.run(runner.sweep(STATIONS, GRID, seconds=600))
+    assert len(res["scenarios"]) == 12 and res["simulated"] == 13
+    assert len(runner.cache) == 8
+    assert all(s["throughput_per_hour"] is not None for s in res["scenarios"])
+
+def test_concurrent_sweeps_do_not_evict_each_other(runner):
+    other = [{"param": "fpy", "station": "*", "values": [90, 92, 94, 96, 98, 99]}]
+    async def both():
+        return await asyncio.gather(runner.sweep(STATIONS, GRID, seconds=600), runner.sweep(STATIONS, other, seconds=600))
+    a, b = asyncio.run(both())
+    assert len(a["scenarios"]) == 12 and len(b["scenarios"]) == 6
+
+def test_repeat_sweep_is_served_from_cache():
+    r = ScenarioRunner(workers=2, cache_size=64)
+    try:
+        first = asyncio.run(r.sweep(STATIONS, GRID, seconds=600))
+        second = asyncio.run(r.sweep(STATIONS, GRID, seconds=600))
+    finally:
+        r.shutdown()
+    assert second["simulated"] == 0 and second["cached"] == 13
+    assert [s["throughput_per_hour"] for s in second["scenarios"]] == [s["throughput_per_hour"] for s in first["scenarios"]]
+    assert all(s["cached"] for s in second["scenarios"])
+
+@pytest.mark.parametrize("grid", [None, [], {"param": "ct"}, ["ct"], [{"param": "speed", "values": [1]}],
+                                  [{"param": "ct", "station": "Nowhere", "values": [1]}], [{"param": "ct", "values": []}]])
+def test_invalid_grid(grid):
+    with pytest.raises(ValueError):
+        expand_grid(line_from_state(STATIONS), grid)
+
+def test_sweep_endpoint_rejects_malformed_bodies(main_starlette):
+    from starlette.testclient import TestClient
+    client = TestClient(main_starlette.app)
+    for body in (b"{not json", b"[1, 2]", b'"grid"', b'{"grid": ["ct"]}', b'{"grid": [{"param": "ct"}], "seconds": "x"}'):
+        assert client.post("/api/scenarios/sweep", content=body, headers={"content-type": "application/json"}).status_code == 400
+
+def test_sweep_endpoint_returns_ranked_scenarios(main_starlette):
+    from starlette.testclient import TestClient
+    client = TestClient(main_starlette.app)
+    body = {"grid": [{"param": "ct", "station": "Boya 1", "values": [-10, -20]}], "seconds": 600}
+    res = client.post("/api/scenarios/sweep", json=body)
+    assert res.status_code == 200
+    data = res.json()
+    assert {"baseline", "scenarios", "best", "simulated", "cached", "seconds", "replications", "seed"} <= data.keys()
+    assert len(data["scenarios"]) == 2 and data["best"] in {s["id"] for s in data["scenarios"]}
+    assert [c["value"] for s in data["scenarios"] for c in s["changes"]] == [-10, -20]
+    assert all("throughput_pct" in s["delta"] for s in data["scenarios"])
+    assert client.post("/api/scenarios/sweep", json={**body, "seconds": 0}).status_code == 400
+    assert client.post("/api/scenarios/sweep", json={"grid": [{"param": "ct", "station": "Nowhere", "values": [1]}]}).status_code == 400
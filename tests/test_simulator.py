@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from simulator import Simulator, TimeSeries
+
+T0 = datetime(2026, 1, 1)
+
+def row(seconds, station_id=1, n=0):
+    return {"recorded_at": T0 + timedelta(seconds=seconds), "station_id": station_id, "n": n}
+
+def statuses(sim):
+    return {s["name"]: (s["ct"], s["status"]) for s in sim.stations}
+
+def test_reset_clears_the_bottleneck():
+    sim = Simulator()
+    sim.shock()
+    sim.reset()
+    assert all(status == "ok" for _, status in statuses(sim).values())
+
+def test_shock_is_idempotent_and_publishes_model_ct():
+    sim = Simulator()
+    sim.shock()
+    once = statuses(sim)
+    for _ in range(5):
+        sim.shock()
+    assert statuses(sim) == once
+    assert once["Finishing"] == (65.0, "bottleneck")
+
+def test_kaizen_is_bounded_and_clears_shock():
+    sim = Simulator()
+    sim.shock()
+    for _ in range(10):
+        sim.kaizen()
+    assert sim.kaizen_steps == 3 and not sim.shocked
+    assert statuses(sim)["Finishing"] == (round(50 * 0.95 ** 3, 1), "ok")
+
+def test_timeseries_keeps_out_of_order_rows_sorted():
+    ts = TimeSeries("recorded_at", 100, index="station_id")
+    for i, sec in enumerate([5, 1, 9, 3, 3, 7]):
+        ts.append(row(sec, station_id=1 + i % 2, n=i))
+    assert [r["recorded_at"].second for r in ts] == [1, 3, 3, 5, 7, 9]
+    assert [r["n"] for r in ts if r["recorded_at"].second == 3] == [3, 4]  # ties keep arrival order
+    assert [r["recorded_at"].second for r in reversed(ts)] == [9, 7, 5, 3, 3, 1]
+    assert [r["recorded_at"].second for r in ts.newest(T0 + timedelta(seconds=3), T0 + timedelta(seconds=7), limit=2)] == [7, 5]
+    assert [r["n"] for r in ts.newest(key=2)] == [5, 3, 1]
+    assert ts.newest(key=3) == []
+
+def test_timeseries_evicts_oldest_across_station_index():
+    ts = TimeSeries("recorded_at", 3000, index="station_id")
+    for i in range(7000):
+        ts.append(row(i, station_id=1 + i % 3, n=i))
+    assert len(ts) == 3000 and len(ts.rows) < 7000  # evicted slots are compacted
+    assert [r["n"] for r in ts][:2] == [4000, 4001] and ts.newest(limit=1)[0]["n"] == 6999
+    assert sum(len(part) for part in ts.parts.values()) == 3000
+    assert all(r["n"] >= 4000 and r["station_id"] == k for k, part in ts.parts.items() for r in part)
+
+def test_timeseries_eviction_with_tied_timestamps_and_late_rows():
+    ts = TimeSeries("recorded_at", 4, index="station_id")
+    for i in range(4):
+        ts.append(row(10, station_id=1 + i % 2, n=i))
+    ts.append(row(0, station_id=2, n=4))  # late row is the oldest, so it is evicted at once
+    assert [r["n"] for r in ts] == [0, 1, 2, 3]
+    ts.append(row(20, station_id=2, n=5))
+    assert [r["n"] for r in ts] == [1, 2, 3, 5]
+    assert [r["n"] for r in ts.parts[1]] == [2] and [r["n"] for r in ts.parts[2]] == [1, 3, 5]
+    ts.append(row(30, station_id=2, n=6))
+    ts.append(row(40, station_id=2, n=7))
+    assert [r["n"] for r in ts] == [3, 5, 6, 7]
+    assert 1 not in ts.parts  # empty station sub-series are dropped
@@ -4,10 +4,11 @@ Production Intelligence Platform for Smartex Machines
 Phase 9.5 - Production Ready
 """
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, WebSocket, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime, timedelta
 import os
 import uuid
@@ -15,12 +16,24 @@ import logging
 from typing import Optional, List, Dict, Any
 
 # Import our modules
+from sqlalchemy import select
 from models import (
     User, Station, ProductionRun, Telemetry, 
-    MaintenanceLog, SystemEvent, SessionLocal
+    MaintenanceLog, SystemEvent
 )
-from auth import AuthService
-from database import get_db, init_db, health_check
+from auth import AuthService, STREAM_TICKET_SECONDS
+from hashing import HashingPoolSaturated
+from database import init_db, async_health_check, engine, async_engine, AsyncSessionLocal
+from queries import get_latest_runs
+from state_cache import state_cache, run_update
+from ingest import telemetry_ingestor, IngestQueueFull, TELEMETRY_MAX_BATCH_SIZE
+from audit import audit_queue, event_sort_key
+from rollups import query_history, to_utc_naive
+from retention import retention_job, read_rows
+from export import stream_export, export_stats, EXPORT_FORMATS
+from broadcast import broadcaster, sse_stream, serve_websocket, BROADCAST_HEARTBEAT_SECONDS
+from payloads import FastJSONResponse, Encoded, dumps, encoded_response
+from metrics import metrics, PrometheusMiddleware
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -32,7 +45,8 @@ app = FastAPI(
     description="Production Intelligence Platform for Smartex Industrial Washing Machines",
     version="2.0.0",
     docs_url="/docs" if os.getenv("ENVIRONMENT") != "production" else None,
-    redoc_url="/redoc" if os.getenv("ENVIRONMENT") != "production" else None
+    redoc_url="/redoc" if os.getenv("ENVIRONMENT") != "production" else None,
+    default_response_class=FastJSONResponse
 )
 
 # CORS configuration
@@ -44,10 +58,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus metrics (PROMETHEUS_ENABLED=true; see metrics.py)
+if metrics.enabled:
+    app.add_middleware(PrometheusMiddleware, exporter=metrics)
+
 # Security
 security = HTTPBearer()
+optional_bearer = HTTPBearer(auto_error=False)
 auth_service = AuthService()
 
+metrics.instrument_engine("sync", engine)
+metrics.instrument_engine("async", async_engine.sync_engine)
+metrics.register_cache("token", auth_service.token_cache.stats)
+metrics.register_cache("state", state_cache.stats, hits="reads", misses="loads")
+
 # Pydantic models
 class LoginRequest(BaseModel):
     username: str
@@ -76,9 +100,25 @@ class MaintenanceRequest(BaseModel):
     parts_replaced: Optional[str] = None
     cost_eur: Optional[float] = None
 
+class TelemetryReading(BaseModel):
+    station_id: int
+    vibration_mms: Optional[float] = None
+    temperature_c: Optional[float] = None
+    pressure_bar: Optional[float] = None
+    power_kw_idx: Optional[float] = None
+    recorded_at: Optional[datetime] = None
+
+class TelemetryBatchRequest(BaseModel):
+    readings: List[TelemetryReading] = Field(..., min_length=1, max_length=TELEMETRY_MAX_BATCH_SIZE)
+
 class ErrorResponse(BaseModel):
     detail: str
 
+# Push channel topics: station state snapshots and the audit trail
+PUSH_TOPICS = ("stations", "events")
+state_cache.add_listener(lambda version, payload: broadcaster.publish("stations", {**payload, "version": version}))
+audit_queue.add_listener(lambda event: broadcaster.publish("events", event, coalesce=False))
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
@@ -86,16 +126,37 @@ async def startup_event():
     try:
         init_db()
         logger.info("Database initialized successfully")
+        
+        # Materialize station state for the polling endpoints
+        async with AsyncSessionLocal() as db:
+            await state_cache.load(db)
+        
+        # Start the bulk telemetry writer and audit queue
+        await telemetry_ingestor.start()
+        await audit_queue.start()
+        await retention_job.start()
+        await metrics.start()
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
 
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release background resources"""
+    await metrics.stop()
+    await retention_job.stop()
+    await telemetry_ingestor.stop()
+    await audit_queue.stop()
+    auth_service.hashing_pool.shutdown()
+    await async_engine.dispose()
+
 # Health check endpoint
 @app.get("/health", response_model=Dict[str, Any])
 async def health_check_endpoint():
     """System health check with database status"""
     try:
-        db_status = health_check()
+        db_status = await async_health_check()
         return {
             "status": "healthy",
             "service": "TOLKAR Zero@Factory API v2.0",
@@ -103,6 +164,17 @@ async def health_check_endpoint():
                 "status": "healthy" if db_status else "unhealthy",
                 "database": "connected" if db_status else "disconnected"
             },
+            "caches": {
+                "state": state_cache.stats(),
+                "token": auth_service.token_cache.stats()
+            },
+            "password_hashing": auth_service.hashing_pool.stats(),
+            "telemetry_ingest": telemetry_ingestor.stats(),
+            "audit_queue": audit_queue.stats(),
+            "retention": retention_job.stats(),
+            "exports": export_stats.stats(),
+            "push": broadcaster.stats(),
+            "metrics": metrics.stats(),
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
@@ -112,6 +184,18 @@ async def health_check_endpoint():
             detail="Service unhealthy"
         )
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text exposition (aggregated across gunicorn workers)"""
+    if not metrics.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Metrics are disabled (set PROMETHEUS_ENABLED=true)"
+        )
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 # Config endpoint
 @app.get("/api/config", response_model=Dict[str, Any])
 async def get_config():
@@ -133,7 +217,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     """Get current user from JWT token"""
     token = credentials.credentials
     try:
-        user = auth_service.verify_token(token)
+        user = await auth_service.verify_token(token)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -150,7 +234,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 # Role-based access control
 def require_role(allowed_roles: List[str]):
     """Dependency to check user role"""
-    def role_checker(current_user: User = Depends(get_current_user)) -> User:
+    async def role_checker(current_user: User = Depends(get_current_user)) -> User:
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -164,7 +248,7 @@ def require_role(allowed_roles: List[str]):
 async def login(login_request: LoginRequest):
     """Authenticate user and return JWT token"""
     try:
-        user = auth_service.authenticate_user(login_request.username, login_request.password)
+        user = await auth_service.authenticate_user(login_request.username, login_request.password)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -174,15 +258,11 @@ async def login(login_request: LoginRequest):
         access_token = auth_service.create_access_token(data={"sub": user.username})
         
         # Log successful login
-        with SessionLocal() as db:
-            event = SystemEvent(
-                id=str(uuid.uuid4()),
-                event_type="login",
-                label=f"User {user.username} logged in",
-                severity="info"
-            )
-            db.add(event)
-            db.commit()
+        audit_queue.record(
+            event_type="login",
+            label=f"User {user.username} logged in",
+            severity="info"
+        )
         
         return LoginResponse(
             access_token=access_token,
@@ -195,6 +275,13 @@ async def login(login_request: LoginRequest):
         )
     except HTTPException:
         raise
+    except HashingPoolSaturated:
+        logger.warning("Login rejected: password hashing queue is full")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent logins, please retry",
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         logger.error(f"Login failed: {e}")
         raise HTTPException(
@@ -215,53 +302,17 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 # Production state endpoint
 @app.get("/api/state", response_model=ProductionState)
-async def get_production_state(current_user: User = Depends(get_current_user)):
-    """Get current production state with telemetry"""
+async def get_production_state(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Get current production state with telemetry (served from the materialized state cache)"""
     try:
-        with SessionLocal() as db:
-            # Get all stations
-            stations = db.query(Station).all()
-            
-            # Get latest telemetry data
-            latest_telemetry = db.query(Telemetry).order_by(Telemetry.recorded_at.desc()).first()
-            
-            # Build response
-            stations_data = []
-            for station in stations:
-                # Get latest production run for this station
-                latest_run = db.query(ProductionRun).filter(
-                    ProductionRun.station_id == station.id
-                ).order_by(ProductionRun.created_at.desc()).first()
-                
-                stations_data.append({
-                    "id": station.id,
-                    "name": station.name,
-                    "wip": latest_run.wip if latest_run else station.wip_baseline,
-                    "ct": latest_run.ct if latest_run else station.ct_baseline,
-                    "fpy": latest_run.fpy if latest_run else station.fpy_baseline,
-                    "oee": latest_run.oee if latest_run else station.oee_baseline,
-                    "status": latest_run.status if latest_run else station.status
-                })
-            
-            # Build telemetry data
-            telemetry_data = {
-                "vibration": latest_telemetry.vibration_mms if latest_telemetry else 2.3,
-                "temperature": latest_telemetry.temperature_c if latest_telemetry else 78,
-                "pressure": latest_telemetry.pressure_bar if latest_telemetry else 6.2,
-                "power": latest_telemetry.power_kw_idx if latest_telemetry else 85,
-                "history": {
-                    "vibration": [2.0, 2.1, 2.2, 2.3],
-                    "temperature": [80, 79, 78, 78],
-                    "pressure": [5.9, 6.0, 6.1, 6.2],
-                    "power": [81, 82, 84, 85]
-                }
-            }
-            
-            return ProductionState(
-                stations=stations_data,
-                telemetry=telemetry_data,
-                timestamp=datetime.utcnow().isoformat()
-            )
+        # One reload per process at a time; concurrent polls share it
+        await state_cache.refresh(AsyncSessionLocal)
+        
+        # Encoded and compressed once per state version; 304 when the client's copy is current
+        return encoded_response(request, state_cache.snapshot_encoded())
     except Exception as e:
         logger.error(f"Failed to get production state: {e}")
         raise HTTPException(
@@ -276,9 +327,10 @@ async def reset_stations(
 ):
     """Reset all production stations to baseline values"""
     try:
-        with SessionLocal() as db:
+        async with AsyncSessionLocal() as db:
             # Get all stations
-            stations = db.query(Station).all()
+            stations = (await db.execute(select(Station).order_by(Station.id))).scalars().all()
+            updates = []
             
             for station in stations:
                 # Create new production run with baseline values
@@ -293,17 +345,18 @@ async def reset_stations(
                     status="ok"
                 )
                 db.add(production_run)
+                updates.append(run_update(production_run))
             
-            # Log the reset action
-            event = SystemEvent(
-                id=str(uuid.uuid4()),
-                event_type="reset",
-                label=f"All stations reset to baseline by {current_user.username}",
-                severity="info"
-            )
-            db.add(event)
-            
-            db.commit()
+            await db.commit()
+        
+        state_cache.apply_updates(updates)
+        
+        # Log the reset action
+        audit_queue.record(
+            event_type="reset",
+            label=f"All stations reset to baseline by {current_user.username}",
+            severity="info"
+        )
         
         return {
             "status": "success",
@@ -322,15 +375,19 @@ async def reset_stations(
 async def simulate_disruption(current_user: User = Depends(get_current_user)):
     """Simulate production disruption (create bottleneck)"""
     try:
-        with SessionLocal() as db:
+        async with AsyncSessionLocal() as db:
             # Find finishing station (typically station 4 or 5)
-            finishing_station = db.query(Station).filter(
-                Station.name.ilike("%finishing%")
-            ).first()
+            finishing_station = (await db.execute(
+                select(Station).where(Station.name.ilike("%finishing%")).limit(1)
+            )).scalars().first()
             
             if not finishing_station:
                 # Fallback to last station
-                finishing_station = db.query(Station).order_by(Station.id.desc()).first()
+                finishing_station = (await db.execute(
+                    select(Station).order_by(Station.id.desc()).limit(1)
+                )).scalars().first()
+            
+            station_name = finishing_station.name
             
             # Create disruption
             production_run = ProductionRun(
@@ -345,23 +402,24 @@ async def simulate_disruption(current_user: User = Depends(get_current_user)):
                 disruption_type="simulated_bottleneck"
             )
             db.add(production_run)
+            update = run_update(production_run)
             
-            # Log the shock event
-            event = SystemEvent(
-                id=str(uuid.uuid4()),
-                event_type="shock",
-                station_id=finishing_station.id,
-                label=f"Bottleneck detected @ {finishing_station.name}",
-                severity="critical"
-            )
-            db.add(event)
-            
-            db.commit()
+            await db.commit()
+        
+        state_cache.apply_updates([update])
+        
+        # Log the shock event
+        audit_queue.record(
+            event_type="shock",
+            station_id=update["station_id"],
+            label=f"Bottleneck detected @ {station_name}",
+            severity="critical"
+        )
         
         return {
             "status": "success",
             "message": "Disruption simulated",
-            "disruption": f"{finishing_station.name} station bottleneck",
+            "disruption": f"{station_name} station bottleneck",
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
@@ -378,22 +436,18 @@ async def apply_kaizen(
 ):
     """Apply Kaizen improvement to reduce WIP and improve metrics"""
     try:
-        with SessionLocal() as db:
-            # Get all stations
-            stations = db.query(Station).all()
+        async with AsyncSessionLocal() as db:
+            # Get all stations with their current state
+            station_runs = await get_latest_runs(db)
             
+            updates = []
             improvements = {
                 "wip_reduced": False,
                 "fpy_improved": False,
                 "oee_improved": False
             }
             
-            for station in stations:
-                # Get current state
-                latest_run = db.query(ProductionRun).filter(
-                    ProductionRun.station_id == station.id
-                ).order_by(ProductionRun.created_at.desc()).first()
-                
+            for station, latest_run in station_runs:
                 current_wip = latest_run.wip if latest_run else station.wip_baseline
                 current_fpy = latest_run.fpy if latest_run else station.fpy_baseline
                 current_oee = latest_run.oee if latest_run else station.oee_baseline
@@ -416,6 +470,7 @@ async def apply_kaizen(
                     disruption_type=None
                 )
                 db.add(production_run)
+                updates.append(run_update(production_run))
                 
                 # Track improvements
                 if improved_wip < current_wip:
@@ -425,16 +480,16 @@ async def apply_kaizen(
                 if improved_oee > current_oee:
                     improvements["oee_improved"] = True
             
-            # Log the kaizen event
-            event = SystemEvent(
-                id=str(uuid.uuid4()),
-                event_type="kaizen",
-                label=f"Kaizen improvement applied by {current_user.username}",
-                severity="info"
-            )
-            db.add(event)
-            
-            db.commit()
+            await db.commit()
+        
+        state_cache.apply_updates(updates)
+        
+        # Log the kaizen event
+        audit_queue.record(
+            event_type="kaizen",
+            label=f"Kaizen improvement applied by {current_user.username}",
+            severity="info"
+        )
         
         return {
             "status": "success",
@@ -449,6 +504,187 @@ async def apply_kaizen(
             detail="Failed to apply Kaizen improvement"
         )
 
+# Bulk telemetry ingestion
+@app.post("/api/telemetry/batch", status_code=status.HTTP_202_ACCEPTED, response_model=Dict[str, Any])
+async def ingest_telemetry_batch(
+    batch: TelemetryBatchRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Queue a batch of sensor readings for bulk insertion"""
+    known_stations = set(state_cache.station_ids())
+    unknown = sorted({r.station_id for r in batch.readings} - known_stations)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown station_id(s): {', '.join(str(s) for s in unknown)}"
+        )
+    
+    try:
+        accepted = telemetry_ingestor.submit([r.model_dump() for r in batch.readings])
+    except IngestQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Telemetry write queue is full",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        logger.error(f"Telemetry ingestion failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to queue telemetry"
+        )
+    
+    stats = telemetry_ingestor.stats()
+    return {
+        "status": "accepted",
+        "accepted": accepted,
+        "queued_rows": stats["queued_rows"],
+        "rows_per_sec": stats["rows_per_sec"],
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+# Get raw telemetry readings (hot table + archive)
+@app.get("/api/telemetry", response_model=List[Dict[str, Any]])
+async def get_telemetry(
+    request: Request,
+    station_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user)
+):
+    """Get raw sensor readings, newest first; reads the archive when the range reaches back that far"""
+    if not 1 <= limit <= 10000:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="limit must be between 1 and 10000"
+        )
+    
+    try:
+        async with AsyncSessionLocal() as db:
+            rows = await read_rows(db, "telemetry", start=start, end=end, station_id=station_id, limit=limit)
+        return encoded_response(request, Encoded(dumps([
+            {**row, "recorded_at": row["recorded_at"].isoformat() if row["recorded_at"] else None}
+            for row in rows
+        ])))
+    except Exception as e:
+        logger.error(f"Telemetry query failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get telemetry"
+        )
+
+def push_topics(raw: Optional[str]) -> List[str]:
+    """Validate a comma separated topic list (default: all topics)"""
+    topics = [topic for topic in (raw or ",".join(PUSH_TOPICS)).split(",") if topic]
+    unknown = [topic for topic in topics if topic not in PUSH_TOPICS]
+    if unknown or not topics:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown topic(s): {', '.join(unknown)} (use {', '.join(PUSH_TOPICS)})"
+        )
+    return topics
+
+# Stream ticket for the push channels
+@app.post("/api/stream/ticket", response_model=Dict[str, Any])
+async def create_stream_ticket(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: User = Depends(get_current_user)
+):
+    """Short-lived ticket for /api/stream and /api/ws (EventSource cannot send headers, and access tokens stay out of URLs)"""
+    ticket = auth_service.create_stream_ticket(credentials.credentials)
+    if not ticket:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_SECONDS}
+
+async def stream_session(ticket: Optional[str], credentials: Optional[HTTPAuthorizationCredentials]):
+    """(authorize, expires_at) for a push stream from a ?ticket= or an Authorization header, or None"""
+    if credentials:
+        verified = await auth_service.verify_stream_credentials(credentials.credentials)
+    elif ticket:
+        # Only stream tickets may travel in the query string
+        verified = await auth_service.verify_stream_credentials(ticket, ticket_only=True)
+    else:
+        verified = None
+    if not verified:
+        return None
+    user, expires_at = verified
+    return (lambda: auth_service.get_active_user(user.username)), expires_at
+
+# Server-Sent Events push channel
+@app.get("/api/stream")
+async def stream_updates(
+    topics: Optional[str] = None,
+    ticket: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer)
+):
+    """Push station state and audit events as they change, until the session ends or the user is deactivated"""
+    session = await stream_session(ticket, credentials)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+    authorize, expires_at = session
+    subscriber = broadcaster.subscribe(push_topics(topics))
+    return StreamingResponse(
+        sse_stream(broadcaster, subscriber, BROADCAST_HEARTBEAT_SECONDS, authorize=authorize, expires_at=expires_at),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# WebSocket push channel
+@app.websocket("/api/ws")
+async def websocket_updates(websocket: WebSocket, topics: Optional[str] = None, ticket: Optional[str] = None):
+    """Same messages as /api/stream over a WebSocket"""
+    await websocket.accept()
+    try:
+        selected = push_topics(topics)
+        scheme, _, header_token = (websocket.headers.get("authorization") or "").partition(" ")
+        credentials = HTTPAuthorizationCredentials(scheme=scheme, credentials=header_token) if scheme.lower() == "bearer" and header_token else None
+        session = await stream_session(ticket, credentials)
+    except Exception:
+        selected, session = None, None
+    if not selected or not session:
+        await websocket.close(code=1008)
+        return
+    authorize, expires_at = session
+    await serve_websocket(broadcaster, websocket, selected, BROADCAST_HEARTBEAT_SECONDS,
+                          authorize=authorize, expires_at=expires_at)
+
+# Get telemetry history from rollups
+@app.get("/api/telemetry/history", response_model=Dict[str, Any])
+async def get_telemetry_history(
+    request: Request,
+    station_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    points: int = 60,
+    current_user: User = Depends(get_current_user)
+):
+    """Get min/max/avg telemetry trends for a station (or plant-wide) over a time range"""
+    end = to_utc_naive(end) if end else datetime.utcnow()
+    start = to_utc_naive(start) if start else end - timedelta(hours=1)
+    if start >= end or not 1 <= points <= 10000:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="start must be before end and points between 1 and 10000"
+        )
+    
+    try:
+        async with AsyncSessionLocal() as db:
+            history = await query_history(db, start, end, points=points, station_id=station_id)
+        return encoded_response(request, Encoded(dumps(history)))
+    except Exception as e:
+        logger.error(f"Telemetry history query failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get telemetry history"
+        )
+
 # Get system events
 @app.get("/api/events", response_model=List[Dict[str, Any]])
 async def get_events(
@@ -457,22 +693,28 @@ async def get_events(
 ):
     """Get system events (audit trail)"""
     try:
-        with SessionLocal() as db:
-            events = db.query(SystemEvent).order_by(
-                SystemEvent.created_at.desc()
-            ).limit(limit).all()
-            
-            return [
-                {
-                    "id": event.id,
-                    "event_type": event.event_type,
-                    "station_id": event.station_id,
-                    "label": event.label,
-                    "severity": event.severity,
-                    "created_at": event.created_at.isoformat()
-                }
-                for event in events
-            ]
+        async with AsyncSessionLocal() as db:
+            stored = (await db.execute(
+                select(SystemEvent).order_by(SystemEvent.created_at.desc()).limit(limit)
+            )).scalars().all()
+        
+        # Merge events still waiting in the audit queue
+        merged = {event["id"]: event for event in audit_queue.pending()}
+        for event in stored:
+            merged[event.id] = {
+                "id": event.id,
+                "event_type": event.event_type,
+                "station_id": event.station_id,
+                "label": event.label,
+                "severity": event.severity,
+                "created_at": event.created_at
+            }
+        events = sorted(merged.values(), key=lambda event: event_sort_key(event["created_at"]), reverse=True)
+        
+        return [
+            {**event, "created_at": event["created_at"].isoformat()}
+            for event in events[:limit]
+        ]
     except Exception as e:
         logger.error(f"Failed to get events: {e}")
         raise HTTPException(
@@ -480,6 +722,47 @@ async def get_events(
             detail="Failed to retrieve events"
         )
 
+def export_response(dataset: str, fmt: str, start: Optional[datetime], end: Optional[datetime],
+                    station_id: Optional[int]) -> StreamingResponse:
+    """Build a streaming download for an export dataset"""
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format '{fmt}' (use {', '.join(EXPORT_FORMATS)})"
+        )
+    filename = f"{dataset}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return StreamingResponse(
+        stream_export(dataset, fmt, start=start, end=end, station_id=station_id),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Export telemetry (CSV / NDJSON)
+@app.get("/api/export/telemetry")
+@app.get("/api/export/telemetry.{fmt}")
+async def export_telemetry(
+    fmt: str = "csv",
+    station_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream telemetry readings, including archived rows, oldest first"""
+    return export_response("telemetry", fmt, start, end, station_id)
+
+# Export system events (CSV / NDJSON)
+@app.get("/api/export/events")
+@app.get("/api/export/events.{fmt}")
+async def export_events(
+    fmt: str = "csv",
+    station_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream the audit trail, oldest first"""
+    return export_response("events", fmt, start, end, station_id)
+
 # Get maintenance logs for a station
 @app.get("/api/maintenance/{station_id}", response_model=List[Dict[str, Any]])
 async def get_maintenance_logs(
@@ -488,10 +771,12 @@ async def get_maintenance_logs(
 ):
     """Get maintenance logs for a specific station"""
     try:
-        with SessionLocal() as db:
-            logs = db.query(MaintenanceLog).filter(
-                MaintenanceLog.station_id == station_id
-            ).order_by(MaintenanceLog.created_at.desc()).all()
+        async with AsyncSessionLocal() as db:
+            logs = (await db.execute(
+                select(MaintenanceLog)
+                .where(MaintenanceLog.station_id == station_id)
+                .order_by(MaintenanceLog.created_at.desc())
+            )).scalars().all()
             
             return [
                 {
@@ -522,9 +807,9 @@ async def log_maintenance(
 ):
     """Log maintenance work for a station"""
     try:
-        with SessionLocal() as db:
+        async with AsyncSessionLocal() as db:
             # Verify station exists
-            station = db.query(Station).filter(Station.id == station_id).first()
+            station = await db.get(Station, station_id)
             if not station:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -543,17 +828,19 @@ async def log_maintenance(
             )
             db.add(maintenance_log)
             
+            await db.commit()
+            await db.refresh(maintenance_log)
+            
             # Log the maintenance event
-            event = SystemEvent(
-                id=str(uuid.uuid4()),
+            audit_queue.record(
                 event_type="maintenance",
                 station_id=station_id,
                 label=f"Maintenance logged by {current_user.username}: {maintenance_request.maintenance_type}",
                 severity="info"
             )
-            db.add(event)
             
-            db.commit()
+            # Keep the materialized state in step with the station record
+            await state_cache.reload_station(db, station_id)
             
             return {
                 "id": maintenance_log.id,
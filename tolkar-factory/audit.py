@@ -0,0 +1,251 @@
+"""
+TOLKAR Zero@Factory - Audit Event Queue
+Write-behind batching of SystemEvent rows
+Phase 9.5 - Production Ready
+
+Handlers call ``audit_queue.record(...)`` instead of adding a SystemEvent to
+their own transaction.  Events are buffered in process and inserted in bulk
+when AUDIT_BATCH_SIZE events are waiting or every AUDIT_FLUSH_SECONDS,
+whichever comes first.  If the database is unavailable (or on shutdown when
+a final flush fails) the batch is appended to a spool file next to
+AUDIT_SPOOL_PATH and replayed at the next startup.  Events still in memory
+when the process is killed without a shutdown are lost, bounded by one flush
+interval.
+
+Every process appends only to its own spool (``audit_spool.<pid>.jsonl``),
+so gunicorn workers never interleave writes.  On startup a worker claims the
+spools of processes that are no longer running by renaming them to its own
+pid first; the rename is atomic, so exactly one worker replays each file.
+"""
+
+import asyncio
+import glob
+import json
+import os
+import uuid
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, select
+
+from models import SystemEvent
+from database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Audit queue configuration
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "100"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "1.0"))
+AUDIT_SPOOL_PATH = os.getenv("AUDIT_SPOOL_PATH", "audit_spool.jsonl")
+
+
+def event_sort_key(created_at: Optional[datetime]) -> datetime:
+    """Comparable UTC-naive timestamp for merging queued and stored events"""
+    if created_at is None:
+        return datetime.min
+    if created_at.tzinfo is not None:
+        return created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return created_at
+
+
+class AuditQueue:
+    """Buffers audit events and flushes them in bulk on a size or time trigger"""
+
+    def __init__(self, batch_size: int = AUDIT_BATCH_SIZE, flush_seconds: float = AUDIT_FLUSH_SECONDS,
+                 spool_path: str = AUDIT_SPOOL_PATH):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.spool_path = spool_path
+        self._spool_base, self._spool_ext = os.path.splitext(spool_path)
+        self._buffer: List[Dict[str, Any]] = []
+        self._inflight: List[Dict[str, Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.spooled = 0
+        self.replayed = 0
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """Register ``listener(event)``, called synchronously for every recorded event"""
+        self._listeners.append(listener)
+
+    def record(self, event_type: str, label: str, severity: str = "info",
+               station_id: Optional[int] = None) -> Dict[str, Any]:
+        """Queue an audit event; returns the event as it will be stored"""
+        event = {
+            "id": str(uuid.uuid4()),
+            "event_type": event_type,
+            "station_id": station_id,
+            "label": label,
+            "severity": severity,
+            "created_at": datetime.utcnow()
+        }
+        self._buffer.append(event)
+        self.recorded += 1
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.warning(f"⚠️  Audit listener failed: {e}")
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return event
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Events recorded but not yet committed to the database"""
+        return self._inflight + self._buffer
+
+    async def start(self):
+        """Replay any spooled events and start the periodic flusher"""
+        if self._flusher_task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        await self._replay_spool()
+        self._flusher_task = asyncio.create_task(self._flusher(), name="audit-flusher")
+        logger.info("✅ Audit queue started")
+
+    async def stop(self):
+        """Stop the flusher and persist everything still buffered"""
+        if self._flusher_task is not None:
+            self._flusher_task.cancel()
+            try:
+                await self._flusher_task
+            except asyncio.CancelledError:
+                pass
+            self._flusher_task = None
+        await self.flush()
+
+    async def flush(self):
+        """Write all buffered events in one bulk insert, spooling on failure"""
+        if not self._buffer:
+            return
+        lock = self._flush_lock or asyncio.Lock()
+        async with lock:
+            batch, self._buffer = self._buffer, []
+            if not batch:
+                return
+            # Keep the batch visible to readers until it is committed
+            self._inflight = batch
+            try:
+                await self._insert(batch)
+                self.flushed += len(batch)
+                self.flushes += 1
+            except Exception as e:
+                logger.error(f"❌ Audit flush of {len(batch)} events failed, spooling: {e}")
+                self._spool(batch)
+            finally:
+                self._inflight = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._buffer),
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "spooled": self.spooled,
+            "replayed": self.replayed
+        }
+
+    async def _flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def _insert(self, batch: List[Dict[str, Any]]):
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(SystemEvent), batch)
+            await db.commit()
+
+    def _own_spool(self) -> str:
+        return f"{self._spool_base}.{os.getpid()}{self._spool_ext}"
+
+    def _spool(self, batch: List[Dict[str, Any]]):
+        try:
+            with open(self._own_spool(), "a", encoding="utf-8") as fh:
+                for event in batch:
+                    fh.write(json.dumps({**event, "created_at": event["created_at"].isoformat()}) + "\n")
+            self.spooled += len(batch)
+        except Exception as e:
+            logger.error(f"❌ Audit spool write failed, {len(batch)} events lost: {e}")
+
+    def _claim_spools(self) -> List[str]:
+        """Rename the spools of exited processes (and any legacy shared spool) to this pid"""
+        pid = os.getpid()
+        candidates = glob.glob(glob.escape(self._spool_base) + ".*" + glob.escape(self._spool_ext))
+        if os.path.exists(self.spool_path):
+            candidates.append(self.spool_path)
+        claimed = []
+        for path in sorted(candidates):
+            owner = path[len(self._spool_base):len(path) - len(self._spool_ext)].lstrip(".").split(".")[0]
+            if owner:
+                if not owner.isdigit():
+                    continue
+                if int(owner) != pid and _process_alive(int(owner)):
+                    # Still appending to it; its owner or a later worker replays it
+                    continue
+            target = f"{self._spool_base}.{pid}.{uuid.uuid4().hex[:8]}{self._spool_ext}"
+            try:
+                os.rename(path, target)
+            except FileNotFoundError:
+                continue  # Claimed by another worker first
+            claimed.append(target)
+        return claimed
+
+    async def _replay_spool(self):
+        try:
+            claimed = self._claim_spools()
+        except OSError as e:
+            logger.error(f"❌ Audit spool claim failed: {e}")
+            return
+        for path in claimed:
+            await self._replay_file(path)
+
+    async def _replay_file(self, path: str):
+        try:
+            with open(path, encoding="utf-8") as fh:
+                batch = [json.loads(line) for line in fh if line.strip()]
+            for event in batch:
+                event["created_at"] = datetime.fromisoformat(event["created_at"])
+            if batch:
+                # Skip events already written by an interrupted earlier replay
+                async with AsyncSessionLocal() as db:
+                    existing = set()
+                    for offset in range(0, len(batch), 500):
+                        ids = [event["id"] for event in batch[offset:offset + 500]]
+                        result = await db.execute(select(SystemEvent.id).where(SystemEvent.id.in_(ids)))
+                        existing.update(result.scalars().all())
+                batch = [event for event in batch if event["id"] not in existing]
+            if batch:
+                await self._insert(batch)
+            os.remove(path)
+            self.replayed += len(batch)
+            logger.info(f"✅ Replayed {len(batch)} spooled audit events")
+        except Exception as e:
+            # Left under this pid, so the next worker to start claims it again
+            logger.error(f"❌ Audit spool replay failed, keeping {path}: {e}")
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+# Global audit queue instance
+audit_queue = AuditQueue()
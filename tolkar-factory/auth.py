@@ -5,15 +5,144 @@ Phase 9.5 - Production Ready
 """
 
 import jwt
-import bcrypt
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Set, Tuple
 import os
+import time
+import uuid
+import threading
 import logging
-from models import User, SessionLocal
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import User
+from database import AsyncSessionLocal
+from hashing import (
+    hashing_pool, needs_rehash, hash_password_sync, verify_password_sync,
+    HashingPoolSaturated, BCRYPT_ROUNDS
+)
 
 logger = logging.getLogger(__name__)
 
+# Verified-token cache configuration
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+
+# Lifetime of a push-stream ticket (the only credential allowed in a stream URL)
+STREAM_TICKET_SECONDS = int(os.getenv("STREAM_TICKET_SECONDS", "30"))
+STREAM_SCOPE = "stream"
+
+class UserSnapshot:
+    """Immutable copy of the user fields needed to authorize a request"""
+    
+    __slots__ = ("id", "username", "email", "role", "is_active")
+    
+    def __init__(self, user: User):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.role = user.role
+        self.is_active = user.is_active
+    
+    def __repr__(self):
+        return f"<UserSnapshot(username='{self.username}', role='{self.role}')>"
+
+class TokenCache:
+    """Bounded TTL/LRU cache of verified JWT -> user snapshot
+    
+    Entries live for TOKEN_CACHE_TTL_SECONDS or until the token expires,
+    whichever comes first.  User changes must call ``invalidate_user`` so a
+    deactivated user or changed role takes effect on the next request.  The
+    cache is per process; other workers pick up changes once their entries
+    reach the TTL.
+    """
+    
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, ttl_seconds: float = TOKEN_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, UserSnapshot]]" = OrderedDict()
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, token: str) -> Optional[UserSnapshot]:
+        """Return the cached user for a token, or None on miss/expiry"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user = entry
+            if expires_at <= now:
+                self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user
+    
+    def put(self, token: str, user: UserSnapshot, token_exp: Optional[float] = None):
+        """Cache a verified token, never beyond the token's own expiry"""
+        if self.max_size <= 0 or self.ttl_seconds <= 0:
+            return
+        ttl = self.ttl_seconds
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+            if ttl <= 0:
+                return
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (time.monotonic() + ttl, user)
+            self._tokens_by_user.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+    
+    def invalidate_user(self, user_id: str):
+        """Drop every cached token belonging to a user"""
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+                self.invalidations += 1
+    
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._tokens_by_user.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+    
+    def _remove(self, token: str):
+        """Remove a token entry (lock must be held)"""
+        _, user = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(user.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user.id]
+
+# Shared by every AuthService instance so invalidation reaches all callers
+token_cache = TokenCache()
+# Username -> user for open push streams; kept apart so a username is never accepted as a token
+stream_user_cache = TokenCache()
+
 class AuthService:
     """JWT Authentication service for TOLKAR Zero@Factory"""
     
@@ -21,25 +150,36 @@ class AuthService:
         self.secret_key = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
         self.algorithm = "HS256"
         self.access_token_expire_minutes = int(os.getenv("JWT_EXPIRATION_MINUTES", "480"))  # 8 hours
+        self.token_cache = token_cache
+        self.stream_user_cache = stream_user_cache
+        self.hashing_pool = hashing_pool
     
     def hash_password(self, password: str) -> str:
-        """Hash a password using bcrypt"""
+        """Hash a password using bcrypt (blocking; use hash_password_async on the event loop)"""
         try:
-            # Generate salt and hash password
-            salt = bcrypt.gensalt(rounds=12)
-            hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-            return hashed.decode('utf-8')
+            return hash_password_sync(password, BCRYPT_ROUNDS)
         except Exception as e:
             logger.error(f"Password hashing failed: {e}")
             raise
     
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Verify a password against its hash"""
+        """Verify a password against its hash (blocking; use verify_password_async on the event loop)"""
         try:
-            return bcrypt.checkpw(
-                plain_password.encode('utf-8'), 
-                hashed_password.encode('utf-8')
-            )
+            return verify_password_sync(plain_password, hashed_password)
+        except Exception as e:
+            logger.error(f"Password verification failed: {e}")
+            return False
+    
+    async def hash_password_async(self, password: str) -> str:
+        """Hash a password on the bounded hashing pool"""
+        return await self.hashing_pool.hash_password(password, BCRYPT_ROUNDS)
+    
+    async def verify_password_async(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password on the bounded hashing pool"""
+        try:
+            return await self.hashing_pool.verify_password(plain_password, hashed_password)
+        except HashingPoolSaturated:
+            raise
         except Exception as e:
             logger.error(f"Password verification failed: {e}")
             return False
@@ -64,96 +204,193 @@ class AuthService:
             logger.error(f"JWT token creation failed: {e}")
             raise
     
-    def verify_token(self, token: str) -> Optional[User]:
-        """Verify JWT token and return user"""
+    async def verify_token(self, token: str) -> Optional[UserSnapshot]:
+        """Verify JWT token and return user (cached per token)"""
         try:
+            cached_user = self.token_cache.get(token)
+            if cached_user is not None:
+                return cached_user
+            
             # Decode JWT token
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
             username: str = payload.get("sub")
             
-            if username is None:
+            # Stream tickets travel in URLs and open push streams only
+            if username is None or payload.get("scope") == STREAM_SCOPE:
                 return None
             
             # Get user from database
-            with SessionLocal() as db:
-                user = db.query(User).filter(User.username == username).first()
+            async with AsyncSessionLocal() as db:
+                user = await self._get_user(db, User.username == username)
                 if user and user.is_active:
-                    return user
+                    snapshot = UserSnapshot(user)
+                    self.token_cache.put(token, snapshot, token_exp=payload.get("exp"))
+                    return snapshot
                 return None
                 
         except jwt.ExpiredSignatureError:
             logger.warning("JWT token has expired")
             return None
-        except jwt.JWTError as e:
+        except jwt.PyJWTError as e:
             logger.warning(f"JWT token verification failed: {e}")
             return None
         except Exception as e:
             logger.error(f"Token verification error: {e}")
             return None
     
-    def authenticate_user(self, username: str, password: str) -> Optional[User]:
-        """Authenticate user with username and password"""
+    def create_stream_ticket(self, access_token: str) -> Optional[str]:
+        """Short-lived, stream-only token for EventSource/WebSocket URLs
+        
+        Access tokens stay out of URLs (and so out of access logs); a logged
+        ticket expires within STREAM_TICKET_SECONDS and is refused by every
+        other endpoint.  The ticket carries the access token's expiry, which
+        also ends the stream it opens.
+        """
+        try:
+            payload = jwt.decode(access_token, self.secret_key, algorithms=[self.algorithm])
+        except jwt.PyJWTError:
+            return None
+        if payload.get("sub") is None or payload.get("scope") == STREAM_SCOPE:
+            return None
+        session_exp = int(payload["exp"])
+        ticket = {
+            "sub": payload["sub"],
+            "scope": STREAM_SCOPE,
+            "session_exp": session_exp,
+            "exp": min(int(time.time()) + STREAM_TICKET_SECONDS, session_exp)
+        }
+        return jwt.encode(ticket, self.secret_key, algorithm=self.algorithm)
+    
+    async def verify_stream_credentials(self, token: str, ticket_only: bool = False) -> Optional[Tuple[UserSnapshot, float]]:
+        """Verify a stream ticket or access token; returns the user and when the stream must end
+        
+        With ``ticket_only`` (credentials taken from a URL) access tokens are refused.
+        """
+        try:
+            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except jwt.PyJWTError as e:
+            logger.warning(f"Stream credential verification failed: {e}")
+            return None
+        username = payload.get("sub")
+        if username is None:
+            return None
+        if ticket_only and payload.get("scope") != STREAM_SCOPE:
+            logger.warning("Stream credential verification failed: access token passed in the URL")
+            return None
+        user = await self.get_active_user(username)
+        if user is None:
+            return None
+        ends_at = payload.get("session_exp") if payload.get("scope") == STREAM_SCOPE else payload.get("exp")
+        return user, float(ends_at)
+    
+    async def get_active_user(self, username: str) -> Optional[UserSnapshot]:
+        """Active user by name, cached like verified tokens (re-checked by open streams on every heartbeat)"""
+        cached_user = self.stream_user_cache.get(username)
+        if cached_user is not None:
+            return cached_user
+        try:
+            async with AsyncSessionLocal() as db:
+                user = await self._get_user(db, User.username == username)
+                if user and user.is_active:
+                    snapshot = UserSnapshot(user)
+                    self.stream_user_cache.put(username, snapshot)
+                    return snapshot
+                return None
+        except Exception as e:
+            logger.error(f"User lookup error: {e}")
+            return None
+    
+    async def authenticate_user(self, username: str, password: str) -> Optional[User]:
+        """Authenticate user without blocking the event loop on bcrypt
+        
+        Hashes created with a cost factor other than BCRYPT_ROUNDS are
+        transparently re-hashed after a successful login.
+        """
         try:
-            with SessionLocal() as db:
+            async with AsyncSessionLocal() as db:
                 # Get user from database
-                user = db.query(User).filter(User.username == username).first()
-                
-                if not user:
-                    logger.warning(f"Authentication failed: User '{username}' not found")
-                    return None
-                
-                if not user.is_active:
-                    logger.warning(f"Authentication failed: User '{username}' is inactive")
-                    return None
-                
-                # Verify password
-                if not self.verify_password(password, user.password_hash):
-                    logger.warning(f"Authentication failed: Invalid password for user '{username}'")
-                    return None
-                
-                logger.info(f"User '{username}' authenticated successfully")
-                return user
-                
+                user = await self._get_user(db, User.username == username)
+            
+            if not user:
+                logger.warning(f"Authentication failed: User '{username}' not found")
+                return None
+            
+            if not user.is_active:
+                logger.warning(f"Authentication failed: User '{username}' is inactive")
+                return None
+            
+            # Verify password on the hashing pool
+            if not await self.verify_password_async(password, user.password_hash):
+                logger.warning(f"Authentication failed: Invalid password for user '{username}'")
+                return None
+            
+            if needs_rehash(user.password_hash):
+                await self._rehash_password(user, password)
+            
+            logger.info(f"User '{username}' authenticated successfully")
+            return user
+            
+        except HashingPoolSaturated:
+            raise
         except Exception as e:
             logger.error(f"User authentication failed: {e}")
             return None
     
-    def get_user_by_username(self, username: str) -> Optional[User]:
+    async def _rehash_password(self, user: User, password: str):
+        """Upgrade a stored hash to the configured cost factor"""
+        try:
+            new_hash = await self.hash_password_async(password)
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(User).where(User.id == user.id).values(password_hash=new_hash)
+                )
+                await db.commit()
+            logger.info(f"Password hash for user '{user.username}' upgraded to {BCRYPT_ROUNDS} rounds")
+        except Exception as e:
+            # Login already succeeded; the upgrade is retried on the next login
+            logger.warning(f"Password rehash failed for user '{user.username}': {e}")
+    
+    async def _get_user(self, db: AsyncSession, *criteria) -> Optional[User]:
+        """Load the first user matching the given criteria"""
+        result = await db.execute(select(User).where(*criteria).limit(1))
+        return result.scalars().first()
+    
+    async def get_user_by_username(self, username: str) -> Optional[User]:
         """Get user by username"""
         try:
-            with SessionLocal() as db:
-                return db.query(User).filter(User.username == username).first()
+            async with AsyncSessionLocal() as db:
+                return await self._get_user(db, User.username == username)
         except Exception as e:
             logger.error(f"Failed to get user by username: {e}")
             return None
     
-    def get_user_by_id(self, user_id: str) -> Optional[User]:
+    async def get_user_by_id(self, user_id: str) -> Optional[User]:
         """Get user by ID"""
         try:
-            with SessionLocal() as db:
-                return db.query(User).filter(User.id == user_id).first()
+            async with AsyncSessionLocal() as db:
+                return await db.get(User, user_id)
         except Exception as e:
             logger.error(f"Failed to get user by ID: {e}")
             return None
     
-    def create_user(self, username: str, email: str, password: str, role: str = "operator") -> Optional[User]:
+    async def create_user(self, username: str, email: str, password: str, role: str = "operator") -> Optional[User]:
         """Create new user"""
         try:
-            with SessionLocal() as db:
+            async with AsyncSessionLocal() as db:
                 # Check if username already exists
-                existing_user = db.query(User).filter(User.username == username).first()
+                existing_user = await self._get_user(db, User.username == username)
                 if existing_user:
                     logger.warning(f"User creation failed: Username '{username}' already exists")
                     return None
                 
                 # Check if email already exists
-                existing_email = db.query(User).filter(User.email == email).first()
+                existing_email = await self._get_user(db, User.email == email)
                 if existing_email:
                     logger.warning(f"User creation failed: Email '{email}' already exists")
                     return None
                 
                 # Hash password
-                password_hash = self.hash_password(password)
+                password_hash = await self.hash_password_async(password)
                 
                 # Create new user
                 new_user = User(
@@ -166,8 +403,8 @@ class AuthService:
                 )
                 
                 db.add(new_user)
-                db.commit()
-                db.refresh(new_user)
+                await db.commit()
+                await db.refresh(new_user)
                 
                 logger.info(f"User '{username}' created successfully with role '{role}'")
                 return new_user
@@ -176,21 +413,23 @@ class AuthService:
             logger.error(f"User creation failed: {e}")
             return None
     
-    def update_user_password(self, user_id: str, new_password: str) -> bool:
+    async def update_user_password(self, user_id: str, new_password: str) -> bool:
         """Update user password"""
         try:
-            with SessionLocal() as db:
-                user = db.query(User).filter(User.id == user_id).first()
+            async with AsyncSessionLocal() as db:
+                user = await db.get(User, user_id)
                 if not user:
                     logger.warning(f"Password update failed: User ID '{user_id}' not found")
                     return False
                 
                 # Hash new password
-                password_hash = self.hash_password(new_password)
+                password_hash = await self.hash_password_async(new_password)
                 
                 # Update password
                 user.password_hash = password_hash
-                db.commit()
+                await db.commit()
+                self.token_cache.invalidate_user(user_id)
+                self.stream_user_cache.invalidate_user(user_id)
                 
                 logger.info(f"Password updated successfully for user '{user.username}'")
                 return True
@@ -199,18 +438,20 @@ class AuthService:
             logger.error(f"Password update failed: {e}")
             return False
     
-    def deactivate_user(self, user_id: str) -> bool:
+    async def deactivate_user(self, user_id: str) -> bool:
         """Deactivate user account"""
         try:
-            with SessionLocal() as db:
-                user = db.query(User).filter(User.id == user_id).first()
+            async with AsyncSessionLocal() as db:
+                user = await db.get(User, user_id)
                 if not user:
                     logger.warning(f"User deactivation failed: User ID '{user_id}' not found")
                     return False
                 
                 # Deactivate user
                 user.is_active = False
-                db.commit()
+                await db.commit()
+                self.token_cache.invalidate_user(user_id)
+                self.stream_user_cache.invalidate_user(user_id)
                 
                 logger.info(f"User '{user.username}' deactivated successfully")
                 return True
@@ -219,26 +460,48 @@ class AuthService:
             logger.error(f"User deactivation failed: {e}")
             return False
     
-    def get_all_users(self, include_inactive: bool = False) -> list:
+    async def update_user_role(self, user_id: str, role: str) -> bool:
+        """Change a user's role"""
+        try:
+            async with AsyncSessionLocal() as db:
+                user = await db.get(User, user_id)
+                if not user:
+                    logger.warning(f"Role update failed: User ID '{user_id}' not found")
+                    return False
+                
+                # Update role
+                user.role = role
+                await db.commit()
+                self.token_cache.invalidate_user(user_id)
+                self.stream_user_cache.invalidate_user(user_id)
+                
+                logger.info(f"Role updated to '{role}' for user '{user.username}'")
+                return True
+                
+        except Exception as e:
+            logger.error(f"Role update failed: {e}")
+            return False
+    
+    async def get_all_users(self, include_inactive: bool = False) -> list:
         """Get all users"""
         try:
-            with SessionLocal() as db:
-                query = db.query(User)
+            async with AsyncSessionLocal() as db:
+                query = select(User)
                 if not include_inactive:
-                    query = query.filter(User.is_active == True)
-                return query.all()
+                    query = query.where(User.is_active == True)
+                return list((await db.execute(query)).scalars().all())
         except Exception as e:
             logger.error(f"Failed to get all users: {e}")
             return []
     
-    def get_users_by_role(self, role: str, include_inactive: bool = False) -> list:
+    async def get_users_by_role(self, role: str, include_inactive: bool = False) -> list:
         """Get users by role"""
         try:
-            with SessionLocal() as db:
-                query = db.query(User).filter(User.role == role)
+            async with AsyncSessionLocal() as db:
+                query = select(User).where(User.role == role)
                 if not include_inactive:
-                    query = query.filter(User.is_active == True)
-                return query.all()
+                    query = query.where(User.is_active == True)
+                return list((await db.execute(query)).scalars().all())
         except Exception as e:
             logger.error(f"Failed to get users by role: {e}")
             return []
@@ -257,15 +520,15 @@ def require_role(required_roles: list) -> callable:
         return wrapper
     return decorator
 
-def get_current_user_from_token(token: str) -> Optional[User]:
+async def get_current_user_from_token(token: str) -> Optional[UserSnapshot]:
     """Get current user from JWT token"""
-    return auth_service.verify_token(token)
+    return await auth_service.verify_token(token)
 
-def create_demo_users():
+async def create_demo_users():
     """Create demo users for testing"""
     try:
         # Create admin user
-        admin = auth_service.create_user(
+        admin = await auth_service.create_user(
             username="admin",
             email="admin@tolkar.local",
             password="admin123",
@@ -273,7 +536,7 @@ def create_demo_users():
         )
         
         # Create supervisor user
-        supervisor = auth_service.create_user(
+        supervisor = await auth_service.create_user(
             username="supervisor",
             email="supervisor@tolkar.local",
             password="supervisor123",
@@ -281,7 +544,7 @@ def create_demo_users():
         )
         
         # Create operator user
-        operator = auth_service.create_user(
+        operator = await auth_service.create_user(
             username="operator1",
             email="operator1@tolkar.local",
             password="operator123",
@@ -295,15 +558,13 @@ def create_demo_users():
         print(f"❌ Demo user creation failed: {e}")
         return False
 
-if __name__ == "__main__":
-    # Test authentication service
-    print("🧪 Testing TOLKAR Authentication Service")
-    
+async def _self_test():
+    """Exercise user creation, login and token verification"""
     # Create demo users
-    create_demo_users()
+    await create_demo_users()
     
     # Test authentication
-    user = auth_service.authenticate_user("admin", "admin123")
+    user = await auth_service.authenticate_user("admin", "admin123")
     if user:
         print(f"✅ Authentication test passed for user: {user.username}")
         
@@ -311,12 +572,20 @@ if __name__ == "__main__":
         token = auth_service.create_access_token({"sub": user.username})
         print(f"✅ JWT token created: {token[:50]}...")
         
-        verified_user = auth_service.verify_token(token)
+        verified_user = await auth_service.verify_token(token)
         if verified_user and verified_user.username == user.username:
             print("✅ JWT token verification passed")
         else:
             print("❌ JWT token verification failed")
     else:
         print("❌ Authentication test failed")
+
+if __name__ == "__main__":
+    import asyncio
+    
+    # Test authentication service
+    print("🧪 Testing TOLKAR Authentication Service")
+    
+    asyncio.run(_self_test())
     
-    print("✅ Authentication service tests completed")
\ No newline at end of file
+    print("✅ Authentication service tests completed")
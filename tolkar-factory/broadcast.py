@@ -0,0 +1,37 @@
+"""
+TOLKAR Zero@Factory - Push Broadcaster
+Topic fan-out behind the SSE (/api/stream) and WebSocket (/api/ws) channels
+Phase 9.5 - Production Ready
+
+The fan-out itself lives in fanout.py, shared with the root demo app; this
+module holds the factory's push configuration and its broadcaster.  The
+``stations`` topic is a coalesced snapshot and ``events`` an append topic.
+
+Factory streams are authenticated once at connect, so app.py opens each one
+with the time its session ends and an ``authorize`` check for its user (see
+``stream_session``); the demo streams are public and pass neither.
+"""
+
+import os
+
+from fanout import (
+    EXPIRED_SSE,
+    EXPIRED_TEXT,
+    Broadcaster,
+    Message,
+    Subscriber,
+    serve_websocket,
+    sse_stream,
+    stable_digest,
+)
+
+# Push channel configuration
+BROADCAST_HEARTBEAT_SECONDS = float(os.getenv("BROADCAST_HEARTBEAT_SECONDS", "15"))
+BROADCAST_MAX_QUEUE = int(os.getenv("BROADCAST_MAX_QUEUE", "100"))
+BROADCAST_SLOW_CONSUMER_SECONDS = float(os.getenv("BROADCAST_SLOW_CONSUMER_SECONDS", "30"))
+
+# Keys that change on every rebuild without the state changing
+VOLATILE_KEYS = {"timestamp"}
+
+# Global broadcaster instance
+broadcaster = Broadcaster(BROADCAST_MAX_QUEUE, BROADCAST_SLOW_CONSUMER_SECONDS, volatile=VOLATILE_KEYS)
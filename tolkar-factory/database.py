@@ -4,12 +4,13 @@ Production Intelligence Platform Database Setup
 Phase 9.5 - Production Ready
 """
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, select, func
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 import os
 import logging
-from typing import Generator
+from typing import Generator, AsyncGenerator
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -24,6 +25,23 @@ MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
 POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
 POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
 
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver (aiosqlite, asyncpg, aiomysql)"""
+    scheme, sep, rest = url.partition("://")
+    base = scheme.split("+", 1)[0].lower()
+    async_drivers = {
+        "sqlite": "sqlite+aiosqlite",
+        "postgresql": "postgresql+asyncpg",
+        "postgres": "postgresql+asyncpg",
+        "mysql": "mysql+aiomysql",
+    }
+    if base in async_drivers:
+        return f"{async_drivers[base]}{sep}{rest}"
+    return url
+
+# Async database URL used by the API handlers (derived from DATABASE_URL by default)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
 # Create engine with appropriate configuration
 def create_database_engine():
     """Create database engine with proper configuration"""
@@ -100,6 +118,70 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+# Create async engine for the request path
+def create_async_database_engine():
+    """Create asyncio database engine with proper configuration"""
+    
+    if "sqlite" in ASYNC_DATABASE_URL.lower():
+        # aiosqlite runs each connection on its own thread
+        async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            pool_pre_ping=True,
+            echo=False
+        )
+        logger.info("✅ Async SQLite engine created (aiosqlite)")
+    
+    elif "postgresql" in ASYNC_DATABASE_URL.lower():
+        async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+            pool_pre_ping=True,
+            echo=False,
+            isolation_level="READ COMMITTED"
+        )
+        logger.info("✅ Async PostgreSQL engine created (asyncpg)")
+    
+    elif "mysql" in ASYNC_DATABASE_URL.lower():
+        async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+            pool_pre_ping=True,
+            echo=False
+        )
+        logger.info("✅ Async MySQL engine created (aiomysql)")
+    
+    else:
+        async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            pool_pre_ping=True,
+            echo=False
+        )
+        logger.info("✅ Async database engine created (default configuration)")
+    
+    return async_engine
+
+# Create async engine instance
+async_engine = create_async_database_engine()
+
+# Async session factory; attributes stay loaded after commit so handlers never lazy-load
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Get async database session with automatic cleanup"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
     """Initialize database and create tables"""
     try:
@@ -160,8 +242,10 @@ def create_indexes():
                 "CREATE INDEX IF NOT EXISTS idx_production_runs_station_id ON production_runs (station_id);",
                 "CREATE INDEX IF NOT EXISTS idx_production_runs_created_at ON production_runs (created_at);",
                 "CREATE INDEX IF NOT EXISTS idx_production_runs_status ON production_runs (status);",
+                "CREATE INDEX IF NOT EXISTS idx_production_runs_station_created_at_id ON production_runs (station_id, created_at, id);",
                 "CREATE INDEX IF NOT EXISTS idx_telemetry_station_id ON telemetry (station_id);",
                 "CREATE INDEX IF NOT EXISTS idx_telemetry_recorded_at ON telemetry (recorded_at);",
+                "CREATE INDEX IF NOT EXISTS idx_telemetry_rollups_resolution_bucket ON telemetry_rollups (resolution_seconds, bucket_start);",
                 "CREATE INDEX IF NOT EXISTS idx_maintenance_logs_station_id ON maintenance_logs (station_id);",
                 "CREATE INDEX IF NOT EXISTS idx_maintenance_logs_user_id ON maintenance_logs (user_id);",
                 "CREATE INDEX IF NOT EXISTS idx_maintenance_logs_maintenance_type ON maintenance_logs (maintenance_type);",
@@ -181,8 +265,10 @@ def create_indexes():
                 "CREATE INDEX IF NOT EXISTS idx_production_runs_station_id ON production_runs (station_id);",
                 "CREATE INDEX IF NOT EXISTS idx_production_runs_created_at ON production_runs (created_at);",
                 "CREATE INDEX IF NOT EXISTS idx_production_runs_status ON production_runs (status);",
+                "CREATE INDEX IF NOT EXISTS idx_production_runs_station_created_at_id ON production_runs (station_id, created_at, id);",
                 "CREATE INDEX IF NOT EXISTS idx_telemetry_station_id ON telemetry (station_id);",
                 "CREATE INDEX IF NOT EXISTS idx_telemetry_recorded_at ON telemetry (recorded_at);",
+                "CREATE INDEX IF NOT EXISTS idx_telemetry_rollups_resolution_bucket ON telemetry_rollups (resolution_seconds, bucket_start);",
                 "CREATE INDEX IF NOT EXISTS idx_maintenance_logs_station_id ON maintenance_logs (station_id);",
                 "CREATE INDEX IF NOT EXISTS idx_maintenance_logs_user_id ON maintenance_logs (user_id);",
                 "CREATE INDEX IF NOT EXISTS idx_maintenance_logs_maintenance_type ON maintenance_logs (maintenance_type);",
@@ -437,6 +523,28 @@ def health_check() -> bool:
         logger.error(f"❌ Database health check failed: {e}")
         return False
 
+async def async_health_check() -> bool:
+    """Database health check on the async engine (used by the API)"""
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT 1"))
+            
+            from models import User, Station
+            user_count = (await db.execute(select(func.count()).select_from(User))).scalar_one()
+            station_count = (await db.execute(select(func.count()).select_from(Station))).scalar_one()
+            
+            if user_count == 0:
+                logger.warning("⚠️  No users found in database")
+            
+            if station_count == 0:
+                logger.warning("⚠️  No stations found in database")
+            
+            return True
+            
+    except Exception as e:
+        logger.error(f"❌ Database health check failed: {e}")
+        return False
+
 def reset_database():
     """Reset database (drop all tables and recreate)"""
     try:
@@ -0,0 +1,260 @@
+"""
+TOLKAR Zero@Factory - Push Fan-out
+Topic fan-out core shared by the factory (broadcast.py) and the root demo app
+Phase 9.5 - Production Ready
+
+Each published payload is encoded once and the same bytes are handed to
+every subscriber.  Snapshot topics are skipped when nothing but volatile
+timestamp keys changed and are coalesced per subscriber, so a slow client
+only ever holds the newest snapshot.  Append topics keep every message in a
+bounded per-subscriber queue; a subscriber that overflows it, or that has
+not read for ``slow_consumer_seconds``, is disconnected and resynchronizes on
+reconnect.  Publishing never waits on a client.
+
+Streams can carry the time their session ends and an ``authorize`` check
+that is re-run on every heartbeat: a stream closes when either fails, with a
+final ``expired`` message.  Which streams get them is up to each app.
+
+Both apps import this one module (the demo through ../broadcast.py), so it
+only imports ``payloads.dumps``, which both apps provide with the same
+output, and holds no app configuration.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from payloads import dumps
+
+# Keys that change on every rebuild without the state changing
+VOLATILE_KEYS = {"timestamp"}
+
+
+def _strip(value: Any, volatile: set) -> Any:
+    if isinstance(value, dict):
+        return {k: _strip(v, volatile) for k, v in value.items() if k not in volatile}
+    if isinstance(value, list):
+        return [_strip(v, volatile) for v in value]
+    return value
+
+
+def stable_digest(payload: Any, volatile: set = VOLATILE_KEYS) -> str:
+    """Content hash of a payload, ignoring volatile timestamp keys"""
+    encoded = json.dumps(_strip(payload, volatile), sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+class Message:
+    """A published payload, encoded once for SSE and once for WebSocket"""
+
+    __slots__ = ("topic", "version", "text", "sse")
+
+    def __init__(self, topic: str, version: int, payload: Any):
+        self.topic = topic
+        self.version = version
+        self.text = dumps({"topic": topic, "version": version, "data": payload}).decode("utf-8")
+        self.sse = f"event: {topic}\nid: {version}\ndata: ".encode("utf-8") + dumps(payload) + b"\n\n"
+
+
+class Subscriber:
+    """Pending messages for one connected client"""
+
+    def __init__(self, topics: Iterable[str], max_queue: int):
+        self.topics = set(topics)
+        self.max_queue = max_queue
+        self.snapshots: Dict[str, Message] = {}
+        self.queue: deque = deque()
+        self.wakeup = asyncio.Event()
+        self.closed = False
+        self.coalesced = 0
+        self.last_read = time.monotonic()
+
+    def offer(self, message: Message, coalesce: bool) -> bool:
+        """Hand a message to this subscriber; False when its queue is full"""
+        if coalesce:
+            if message.topic in self.snapshots:
+                self.coalesced += 1
+            self.snapshots[message.topic] = message
+        elif len(self.queue) >= self.max_queue:
+            return False
+        else:
+            self.queue.append(message)
+        self.wakeup.set()
+        return True
+
+    @property
+    def pending(self) -> bool:
+        return bool(self.queue or self.snapshots)
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+
+    async def next(self, timeout: float) -> Optional[List[Message]]:
+        """Pending messages in version order; [] on heartbeat timeout, None once closed"""
+        if not (self.pending or self.closed):
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self.wakeup.clear()
+        if self.closed:
+            return None
+        messages = list(self.queue) + list(self.snapshots.values())
+        self.queue.clear()
+        self.snapshots.clear()
+        self.last_read = time.monotonic()
+        return sorted(messages, key=lambda message: message.version)
+
+
+class Broadcaster:
+    """Encode-once topic fan-out with per-subscriber coalescing and drop"""
+
+    def __init__(self, max_queue: int = 100, slow_consumer_seconds: float = 30,
+                 volatile: set = VOLATILE_KEYS):
+        self.max_queue = max_queue
+        self.slow_consumer_seconds = slow_consumer_seconds
+        self.volatile = volatile
+        self.subscribers: set = set()
+        self.latest: Dict[str, Message] = {}
+        self.digests: Dict[str, str] = {}
+        self.version = 0
+        self.published = 0
+        self.skipped = 0
+        self.dropped = 0
+
+    def subscribe(self, topics: Iterable[str]) -> Subscriber:
+        """Register a client; it immediately receives the latest snapshot of each topic"""
+        subscriber = Subscriber(topics, self.max_queue)
+        for topic in subscriber.topics:
+            if topic in self.latest:
+                subscriber.offer(self.latest[topic], True)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+        subscriber.close()
+
+    def publish(self, topic: str, payload: Any, coalesce: bool = True, force: bool = False) -> Optional[Message]:
+        """Fan a payload out to the topic's subscribers without blocking
+
+        ``force`` publishes a snapshot even when it is unchanged.
+        """
+        if coalesce:
+            digest = stable_digest(payload, self.volatile)
+            if self.digests.get(topic) == digest and not force:
+                self.skipped += 1
+                return None
+            self.digests[topic] = digest
+        self.version += 1
+        message = Message(topic, self.version, payload)
+        if coalesce:
+            self.latest[topic] = message
+
+        now = time.monotonic()
+        for subscriber in list(self.subscribers):
+            if topic not in subscriber.topics:
+                continue
+            stalled = subscriber.pending and now - subscriber.last_read > self.slow_consumer_seconds
+            if stalled or not subscriber.offer(message, coalesce):
+                self.dropped += 1
+                self.unsubscribe(subscriber)
+        self.published += 1
+        return message
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self.subscribers),
+            "version": self.version,
+            "published": self.published,
+            "unchanged_skipped": self.skipped,
+            "dropped": self.dropped,
+            "coalesced": sum(subscriber.coalesced for subscriber in self.subscribers)
+        }
+
+
+Authorize = Callable[[], Awaitable[Any]]
+
+EXPIRED_SSE = b"event: expired\ndata: {}\n\n"
+EXPIRED_TEXT = '{"topic":"expired"}'
+
+
+def _wait_seconds(heartbeat: float, expires_at: Optional[float]) -> float:
+    """Heartbeat timeout, shortened so the stream wakes up when its session ends"""
+    if expires_at is None:
+        return heartbeat
+    return max(0.0, min(heartbeat, expires_at - time.time()))
+
+
+async def _still_authorized(authorize: Optional[Authorize], expires_at: Optional[float], heartbeat: bool) -> bool:
+    """Session not expired and, on heartbeats, the user still allowed to stream"""
+    if expires_at is not None and time.time() >= expires_at:
+        return False
+    if heartbeat and authorize is not None:
+        try:
+            return bool(await authorize())
+        except Exception:
+            return False
+    return True
+
+
+async def sse_stream(broadcaster: Broadcaster, subscriber: Subscriber,
+                     heartbeat: float = 15,
+                     authorize: Optional[Authorize] = None,
+                     expires_at: Optional[float] = None) -> AsyncIterator[bytes]:
+    """Server-Sent Events body for one subscriber, until it is dropped or its session ends"""
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            messages = await subscriber.next(_wait_seconds(heartbeat, expires_at))
+            if messages is None:
+                break
+            if not await _still_authorized(authorize, expires_at, heartbeat=not messages):
+                yield EXPIRED_SSE
+                break
+            if not messages:
+                yield b": ping\n\n"
+            for message in messages:
+                yield message.sse
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+async def serve_websocket(broadcaster: Broadcaster, websocket, topics: Iterable[str],
+                          heartbeat: float = 15,
+                          authorize: Optional[Authorize] = None,
+                          expires_at: Optional[float] = None):
+    """Pump messages to an accepted WebSocket until either side goes away or its session ends"""
+    subscriber = broadcaster.subscribe(topics)
+
+    async def watch_disconnect():
+        try:
+            while (await websocket.receive()).get("type") != "websocket.disconnect":
+                pass
+        finally:
+            subscriber.close()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        while True:
+            messages = await subscriber.next(_wait_seconds(heartbeat, expires_at))
+            if messages is None:
+                break
+            if not await _still_authorized(authorize, expires_at, heartbeat=not messages):
+                await websocket.send_text(EXPIRED_TEXT)
+                # 1008: policy violation; the client needs a new token
+                await websocket.close(code=1008)
+                break
+            if not messages:
+                await websocket.send_text('{"topic":"ping"}')
+            for message in messages:
+                await websocket.send_text(message.text)
+    except Exception:
+        pass
+    finally:
+        watcher.cancel()
+        broadcaster.unsubscribe(subscriber)
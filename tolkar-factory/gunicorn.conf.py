@@ -0,0 +1,58 @@
+"""
+TOLKAR Zero@Factory - Gunicorn Configuration
+Worker settings from the GUNICORN_* environment (see .env.example)
+Phase 9.5 - Production Ready
+
+Usage:
+    gunicorn -c gunicorn.conf.py app:app
+
+With PROMETHEUS_ENABLED=true the workers share a multiprocess sample
+directory so /metrics reports all of them, whichever worker answers the
+scrape.  The directory is emptied when the master starts (stale files from a
+previous run would otherwise be summed in) and a worker's live gauges are
+dropped when it exits.
+
+Counter and histogram files of exited workers have to stay (their totals
+would otherwise go backwards), so every worker restart leaves its .db files
+behind and both the directory and the /metrics scrape time grow with the
+number of restarts.  max_requests therefore defaults to 0 (no recycling) when
+Prometheus is enabled; an explicit GUNICORN_MAX_REQUESTS still wins, at the
+cost of that growth until the next master restart.
+"""
+
+import os
+import shutil
+import tempfile
+
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '8000')}"
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "uvicorn.workers.UvicornWorker")
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "2"))
+
+PROMETHEUS_ENABLED = os.getenv("PROMETHEUS_ENABLED", "false").lower() == "true"
+
+# Worker recycling leaves a set of sample files per restart (see above)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0" if PROMETHEUS_ENABLED else "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "50"))
+
+if PROMETHEUS_ENABLED:
+    # Must be in the environment before any worker imports prometheus_client
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(tempfile.gettempdir(), "tolkar_prometheus")
+
+
+def on_starting(server):
+    """Start every run with an empty sample directory"""
+    if PROMETHEUS_ENABLED:
+        path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that exited (max_requests restarts, crashes)"""
+    if PROMETHEUS_ENABLED:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,126 @@
+"""
+TOLKAR Zero@Factory - Password Hashing Pool
+Runs bcrypt off the event loop on a bounded worker pool
+Phase 9.5 - Production Ready
+"""
+
+import asyncio
+import os
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+# bcrypt cost factor for new hashes; existing hashes are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Hashing pool configuration (bcrypt releases the GIL, so threads run in parallel)
+BCRYPT_MAX_CONCURRENCY = int(os.getenv("BCRYPT_MAX_CONCURRENCY", str(min(4, os.cpu_count() or 1))))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "64"))
+
+
+class HashingPoolSaturated(Exception):
+    """Raised when the hashing queue is full and the caller should retry later"""
+
+
+def hash_rounds(hashed_password: str) -> int:
+    """Return the cost factor encoded in a bcrypt hash ($2b$<rounds>$...)"""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def needs_rehash(hashed_password: str, rounds: int = BCRYPT_ROUNDS) -> bool:
+    """Whether a stored hash was produced with a different cost factor"""
+    return hash_rounds(hashed_password) != rounds
+
+
+class PasswordHashingPool:
+    """Bounded thread pool for bcrypt with queueing metrics"""
+
+    def __init__(self, max_workers: int = BCRYPT_MAX_CONCURRENCY, max_queue: int = BCRYPT_MAX_QUEUE):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.busy_seconds_total = 0.0
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run a hashing function on the pool, rejecting when the queue is full"""
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise HashingPoolSaturated("Password hashing queue is full")
+            self.queued += 1
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                waited = started - submitted
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+                    self.busy_seconds_total += time.perf_counter() - started
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, task)
+
+    async def hash_password(self, password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+        """Hash a password on the pool"""
+        return await self.run(hash_password_sync, password, rounds)
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash on the pool"""
+        return await self.run(verify_password_sync, plain_password, hashed_password)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rounds": BCRYPT_ROUNDS,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queued": self.queued,
+            "active": self.active,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_seconds_total / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_wait_ms": round(self.wait_seconds_max * 1000, 2),
+            "avg_hash_ms": round(self.busy_seconds_total / self.completed * 1000, 2) if self.completed else 0.0
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def hash_password_sync(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    """Hash a password with bcrypt (blocking)"""
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def verify_password_sync(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password with bcrypt (blocking)"""
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+# Global hashing pool instance
+hashing_pool = PasswordHashingPool()
@@ -0,0 +1,209 @@
+"""
+TOLKAR Zero@Factory - Telemetry Ingestion
+Queued bulk writer behind POST /api/telemetry/batch
+Phase 9.5 - Production Ready
+
+Request handlers only validate readings and enqueue them; a single
+background writer drains the queue and writes in bulk chunks:
+``COPY`` through asyncpg on PostgreSQL, an ``executemany`` INSERT
+everywhere else.  When the queue holds TELEMETRY_QUEUE_MAX_ROWS readings,
+new batches are rejected so callers back off (HTTP 429 + Retry-After).
+"""
+
+import asyncio
+import math
+import os
+import time
+import uuid
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from models import Telemetry
+from database import async_engine, AsyncSessionLocal
+from state_cache import state_cache
+from rollups import update_rollups, recent_history, to_utc_naive
+
+logger = logging.getLogger(__name__)
+
+# Ingestion configuration
+TELEMETRY_MAX_BATCH_SIZE = int(os.getenv("TELEMETRY_MAX_BATCH_SIZE", "10000"))
+TELEMETRY_QUEUE_MAX_ROWS = int(os.getenv("TELEMETRY_QUEUE_MAX_ROWS", "200000"))
+TELEMETRY_WRITE_CHUNK = int(os.getenv("TELEMETRY_WRITE_CHUNK", "5000"))
+
+TELEMETRY_COLUMNS = [
+    "id", "station_id", "vibration_mms", "temperature_c",
+    "pressure_bar", "power_kw_idx", "recorded_at"
+]
+
+
+class IngestQueueFull(Exception):
+    """Raised when the write queue cannot take another batch"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Telemetry write queue is full")
+        self.retry_after = retry_after
+
+
+class TelemetryIngestor:
+    """Bounded write-behind queue with a single bulk writer task"""
+
+    def __init__(self, max_rows: int = TELEMETRY_QUEUE_MAX_ROWS, chunk_size: int = TELEMETRY_WRITE_CHUNK):
+        self.max_rows = max_rows
+        self.chunk_size = chunk_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._after_write = []
+        self.queued_rows = 0
+        self.rows_accepted = 0
+        self.rows_rejected = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.flushes = 0
+        self.write_seconds_total = 0.0
+        self.last_rows_per_sec = 0.0
+
+    def add_write_hook(self, hook):
+        """Register ``async hook(rows)`` to run after every successful flush"""
+        self._after_write.append(hook)
+
+    async def start(self):
+        """Start the background writer"""
+        if self._writer_task is None:
+            self._queue = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._writer(), name="telemetry-writer")
+            logger.info("✅ Telemetry writer started")
+
+    async def stop(self, timeout: float = 10.0):
+        """Drain the queue and stop the writer"""
+        if self._writer_task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️  Telemetry writer stopped with {self.queued_rows} rows unwritten")
+        self._writer_task.cancel()
+        try:
+            await self._writer_task
+        except asyncio.CancelledError:
+            pass
+        self._writer_task = None
+
+    def submit(self, rows: List[Dict[str, Any]]) -> int:
+        """Enqueue readings for writing, or raise IngestQueueFull"""
+        if self._queue is None:
+            raise RuntimeError("Telemetry writer is not running")
+        if self.queued_rows + len(rows) > self.max_rows:
+            self.rows_rejected += len(rows)
+            raise IngestQueueFull(self.retry_after())
+
+        now = datetime.utcnow()
+        for row in rows:
+            row["id"] = str(uuid.uuid4())
+            # Stored as naive UTC like every other timestamp column
+            if row.get("recorded_at") is None:
+                row["recorded_at"] = now
+            else:
+                row["recorded_at"] = to_utc_naive(row["recorded_at"])
+        self._queue.put_nowait(rows)
+        self.queued_rows += len(rows)
+        self.rows_accepted += len(rows)
+        return len(rows)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        rate = self.rows_per_sec()
+        if rate <= 0:
+            return 1
+        return max(1, math.ceil(self.queued_rows / rate))
+
+    def rows_per_sec(self) -> float:
+        if self.write_seconds_total <= 0:
+            return 0.0
+        return self.rows_written / self.write_seconds_total
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued_rows": self.queued_rows,
+            "max_queued_rows": self.max_rows,
+            "rows_accepted": self.rows_accepted,
+            "rows_rejected": self.rows_rejected,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "flushes": self.flushes,
+            "rows_per_sec": round(self.rows_per_sec(), 1),
+            "last_flush_rows_per_sec": round(self.last_rows_per_sec, 1)
+        }
+
+    async def _writer(self):
+        while True:
+            rows = await self._queue.get()
+            batches = 1
+            # Coalesce queued batches up to one write chunk
+            while len(rows) < self.chunk_size and not self._queue.empty():
+                rows = rows + self._queue.get_nowait()
+                batches += 1
+            try:
+                await self._flush(rows)
+            except Exception as e:
+                self.rows_failed += len(rows)
+                logger.error(f"❌ Telemetry flush of {len(rows)} rows failed: {e}")
+            finally:
+                self.queued_rows -= len(rows)
+                for _ in range(batches):
+                    self._queue.task_done()
+
+    async def _flush(self, rows: List[Dict[str, Any]]):
+        started = time.perf_counter()
+        for offset in range(0, len(rows), self.chunk_size):
+            await self._write_chunk(rows[offset:offset + self.chunk_size])
+        elapsed = time.perf_counter() - started
+
+        self.rows_written += len(rows)
+        self.flushes += 1
+        self.write_seconds_total += elapsed
+        self.last_rows_per_sec = len(rows) / elapsed if elapsed > 0 else 0.0
+
+        for hook in self._after_write:
+            try:
+                await hook(rows)
+            except Exception as e:
+                logger.warning(f"⚠️  Telemetry write hook failed: {e}")
+
+    async def _write_chunk(self, rows: List[Dict[str, Any]]):
+        async with async_engine.connect() as conn:
+            if conn.dialect.name == "postgresql" and conn.dialect.driver == "asyncpg":
+                # COPY is the fastest bulk path on PostgreSQL
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    Telemetry.__tablename__,
+                    records=[tuple(row.get(column) for column in TELEMETRY_COLUMNS) for row in rows],
+                    columns=TELEMETRY_COLUMNS
+                )
+            else:
+                # executemany INSERT (SQLite, MySQL)
+                await conn.execute(
+                    insert(Telemetry),
+                    [{column: row.get(column) for column in TELEMETRY_COLUMNS} for row in rows]
+                )
+                await conn.commit()
+
+
+async def refresh_latest_telemetry(rows: List[Dict[str, Any]]):
+    """Write the newest reading of a flushed batch and the rollup history through to the state cache"""
+    latest = max(rows, key=lambda row: row["recorded_at"])
+    async with AsyncSessionLocal() as db:
+        history = await recent_history(db)
+    state_cache.apply_telemetry(
+        Telemetry(**{column: latest.get(column) for column in TELEMETRY_COLUMNS}),
+        history
+    )
+
+
+# Global telemetry ingestor instance
+telemetry_ingestor = TelemetryIngestor()
+# Rollups first so the refreshed history includes the batch just written
+telemetry_ingestor.add_write_hook(update_rollups)
+telemetry_ingestor.add_write_hook(refresh_latest_telemetry)
@@ -0,0 +1,251 @@
+"""
+TOLKAR Zero@Factory - Prometheus Metrics
+Per-route latency, in-flight requests, database pool and cache statistics
+Phase 9.5 - Production Ready
+
+Served at /metrics when PROMETHEUS_ENABLED=true and prometheus-client is
+installed (see requirements.txt).  Routes are labelled by their template
+(``/api/maintenance/{station_id}``), never by the raw path, so label
+cardinality stays bounded.
+
+Under gunicorn every worker is its own process with its own counters, and a
+scrape would only see whichever worker answered.  When
+PROMETHEUS_MULTIPROC_DIR is set (gunicorn.conf.py sets and cleans it), every
+worker writes its samples to files there and /metrics aggregates all of them;
+gauges sum over live workers.  Cache statistics are kept per worker by the
+caches themselves and copied into counters every METRICS_REFRESH_SECONDS, so
+hit ratios are computed in PromQL over the aggregated counters, e.g.
+``rate(tolkar_cache_hits_total[5m]) / (rate(tolkar_cache_hits_total[5m]) + rate(tolkar_cache_misses_total[5m]))``.
+"""
+
+import asyncio
+import os
+import time
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from starlette.routing import Match
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+        generate_latest, multiprocess
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Metrics configuration
+PROMETHEUS_ENABLED = os.getenv("PROMETHEUS_ENABLED", "false").lower() == "true"
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir")
+METRICS_REFRESH_SECONDS = float(os.getenv("METRICS_REFRESH_SECONDS", "5"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsExporter:
+    """Prometheus metrics for the API process (or all gunicorn workers)"""
+
+    def __init__(self, enabled: bool = PROMETHEUS_ENABLED):
+        self.enabled = enabled and PROMETHEUS_AVAILABLE
+        self.multiprocess = self.enabled and bool(PROMETHEUS_MULTIPROC_DIR)
+        self._caches: Dict[str, Tuple[Callable[[], Dict[str, Any]], str, str]] = {}
+        self._cache_seen: Dict[str, Tuple[int, int]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.scrapes = 0
+        if enabled and not PROMETHEUS_AVAILABLE:
+            logger.warning("⚠️  prometheus-client not installed - /metrics disabled")
+        if not self.enabled:
+            return
+
+        self.requests = Counter(
+            "tolkar_http_requests_total", "HTTP requests by route template and status code",
+            ["method", "route", "status"]
+        )
+        self.latency = Histogram(
+            "tolkar_http_request_duration_seconds", "HTTP request latency by route template",
+            ["method", "route"], buckets=LATENCY_BUCKETS
+        )
+        self.in_flight = Gauge(
+            "tolkar_http_requests_in_flight", "Requests currently being served",
+            ["method", "route"], multiprocess_mode="livesum"
+        )
+        self.pool_checkouts = Counter(
+            "tolkar_db_pool_checkouts_total", "Connections checked out of the SQLAlchemy pool", ["engine"]
+        )
+        self.pool_timeouts = Counter(
+            "tolkar_db_pool_timeouts_total", "Checkouts that gave up waiting for a pooled connection", ["engine"]
+        )
+        self.pool_wait = Histogram(
+            "tolkar_db_pool_wait_seconds", "Time spent obtaining a pooled connection", ["engine"],
+            buckets=POOL_WAIT_BUCKETS
+        )
+        self.pool_checked_out = Gauge(
+            "tolkar_db_pool_checked_out", "Connections currently checked out", ["engine"], multiprocess_mode="livesum"
+        )
+        self.pool_overflow = Gauge(
+            "tolkar_db_pool_overflow", "Connections open beyond pool_size", ["engine"], multiprocess_mode="livesum"
+        )
+        self.pool_size = Gauge(
+            "tolkar_db_pool_size", "Configured pool size", ["engine"], multiprocess_mode="livesum"
+        )
+        self.cache_hits = Counter("tolkar_cache_hits_total", "Cache hits", ["cache"])
+        self.cache_misses = Counter("tolkar_cache_misses_total", "Cache misses", ["cache"])
+
+    # -- Database pools -------------------------------------------------
+
+    def instrument_engine(self, name: str, engine):
+        """Track checkouts, overflow and wait time of a (sync) engine's pool"""
+        if not self.enabled:
+            return
+        pool = engine.pool
+
+        def update_gauges(returning=0):
+            if hasattr(pool, "checkedout"):
+                self.pool_checked_out.labels(name).set(max(pool.checkedout() - returning, 0))
+            if hasattr(pool, "overflow"):
+                self.pool_overflow.labels(name).set(max(pool.overflow(), 0))
+            if hasattr(pool, "size"):
+                self.pool_size.labels(name).set(pool.size())
+
+        @event.listens_for(pool, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            self.pool_checkouts.labels(name).inc()
+            update_gauges()
+
+        @event.listens_for(pool, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            # Fires before the pool takes the connection back
+            update_gauges(returning=1)
+
+        # SQLAlchemy has no "checkout requested" event, so time the pool's connect()
+        connect = pool.connect
+
+        def timed_connect():
+            start = time.perf_counter()
+            try:
+                return connect()
+            except PoolTimeoutError:
+                self.pool_timeouts.labels(name).inc()
+                raise
+            finally:
+                self.pool_wait.labels(name).observe(time.perf_counter() - start)
+
+        pool.connect = timed_connect
+        update_gauges()
+
+    # -- Caches ---------------------------------------------------------
+
+    def register_cache(self, name: str, stats: Callable[[], Dict[str, Any]],
+                       hits: str = "hits", misses: str = "misses"):
+        """Export a cache's cumulative hit/miss counts from its stats()"""
+        if self.enabled:
+            self._caches[name] = (stats, hits, misses)
+
+    def sync_caches(self):
+        """Advance the cache counters by what each cache counted since the last sync"""
+        for name, (stats, hits_key, misses_key) in self._caches.items():
+            current = stats()
+            hits, misses = int(current.get(hits_key, 0)), int(current.get(misses_key, 0))
+            seen_hits, seen_misses = self._cache_seen.get(name, (0, 0))
+            # A cache that was reset counts again from zero
+            self.cache_hits.labels(name).inc(hits - seen_hits if hits >= seen_hits else hits)
+            self.cache_misses.labels(name).inc(misses - seen_misses if misses >= seen_misses else misses)
+            self._cache_seen[name] = (hits, misses)
+
+    async def start(self):
+        """Start the periodic cache sync"""
+        if self.enabled and self._task is None and self._caches:
+            self._task = asyncio.create_task(self._loop(), name="metrics-sync")
+            logger.info("✅ Prometheus metrics enabled%s", " (multiprocess)" if self.multiprocess else "")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.enabled:
+            self.sync_caches()
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(METRICS_REFRESH_SECONDS)
+            try:
+                self.sync_caches()
+            except Exception as e:
+                logger.error(f"Metrics cache sync failed: {e}")
+
+    # -- Exposition -----------------------------------------------------
+
+    def render(self) -> Tuple[bytes, str]:
+        """Text exposition of every metric (all workers in multiprocess mode)"""
+        self.sync_caches()
+        self.scrapes += 1
+        if self.multiprocess:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            return generate_latest(registry), CONTENT_TYPE_LATEST
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "multiprocess": self.multiprocess,
+            "caches": sorted(self._caches),
+            "scrapes": self.scrapes
+        }
+
+
+class PrometheusMiddleware:
+    """ASGI middleware timing each HTTP request under its route template"""
+
+    def __init__(self, app, exporter: MetricsExporter):
+        self.app = app
+        self.exporter = exporter
+
+    def _route(self, scope) -> str:
+        router = scope["app"].router
+        for route in router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", UNMATCHED_ROUTE)
+        return UNMATCHED_ROUTE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        exporter = self.exporter
+        method = scope["method"]
+        route = self._route(scope)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = exporter.in_flight.labels(method, route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            exporter.latency.labels(method, route).observe(time.perf_counter() - start)
+            exporter.requests.labels(method, route, str(status_code)).inc()
+
+
+# Global metrics exporter
+metrics = MetricsExporter()
@@ -174,6 +174,44 @@ class SystemEvent(Base):
     def __repr__(self):
         return f"<SystemEvent(type='{self.event_type}', severity='{self.severity}', label='{self.label}')>"
 
+class TelemetryRollup(Base):
+    """Per-station telemetry aggregates at 1-minute, 15-minute and 1-hour resolution"""
+    __tablename__ = "telemetry_rollups"
+    
+    station_id = Column(Integer, ForeignKey("stations.id"), primary_key=True)
+    resolution_seconds = Column(Integer, primary_key=True)  # 60, 900 or 3600
+    bucket_start = Column(DateTime, primary_key=True)  # UTC bucket start
+    
+    # Vibration (mm/s)
+    vibration_min = Column(Float, nullable=True)
+    vibration_max = Column(Float, nullable=True)
+    vibration_sum = Column(Float, default=0.0, nullable=False)
+    vibration_count = Column(Integer, default=0, nullable=False)
+    
+    # Temperature (°C)
+    temperature_min = Column(Float, nullable=True)
+    temperature_max = Column(Float, nullable=True)
+    temperature_sum = Column(Float, default=0.0, nullable=False)
+    temperature_count = Column(Integer, default=0, nullable=False)
+    
+    # Pressure (bar)
+    pressure_min = Column(Float, nullable=True)
+    pressure_max = Column(Float, nullable=True)
+    pressure_sum = Column(Float, default=0.0, nullable=False)
+    pressure_count = Column(Integer, default=0, nullable=False)
+    
+    # Power consumption index (kW)
+    power_min = Column(Float, nullable=True)
+    power_max = Column(Float, nullable=True)
+    power_sum = Column(Float, default=0.0, nullable=False)
+    power_count = Column(Integer, default=0, nullable=False)
+    
+    # Relationships
+    station = relationship("Station")
+    
+    def __repr__(self):
+        return f"<TelemetryRollup(station_id={self.station_id}, resolution={self.resolution_seconds}, bucket='{self.bucket_start}')>"
+
 # Database initialization function
 def init_db():
     """Initialize database and create default data"""
@@ -376,8 +414,10 @@ Index('idx_stations_status', Station.status)
 Index('idx_production_runs_station_id', ProductionRun.station_id)
 Index('idx_production_runs_created_at', ProductionRun.created_at)
 Index('idx_production_runs_status', ProductionRun.status)
+Index('idx_production_runs_station_created_at_id', ProductionRun.station_id, ProductionRun.created_at, ProductionRun.id)
 Index('idx_telemetry_station_id', Telemetry.station_id)
 Index('idx_telemetry_recorded_at', Telemetry.recorded_at)
+Index('idx_telemetry_rollups_resolution_bucket', TelemetryRollup.resolution_seconds, TelemetryRollup.bucket_start)
 Index('idx_maintenance_logs_station_id', MaintenanceLog.station_id)
 Index('idx_maintenance_logs_user_id', MaintenanceLog.user_id)
 Index('idx_maintenance_logs_maintenance_type', MaintenanceLog.maintenance_type)
@@ -0,0 +1,122 @@
+"""
+TOLKAR Zero@Factory - JSON Encoding
+Fast response encoding for the polled read endpoints
+Phase 9.5 - Production Ready
+
+orjson is used when installed (see requirements.txt) and is several times
+faster than the standard library encoder on the state and event payloads;
+without it everything falls back to ``json`` with identical output apart
+from whitespace.  Payloads that only change with a version (the station
+state) are encoded once per version and served as bytes.
+
+Polled responses carry an ETag (If-None-Match answers 304) and are
+compressed with brotli (when installed) or gzip once they reach
+COMPRESS_MIN_BYTES.  Compressed variants are built once per body, so the
+state snapshot is compressed once per version, not once per poll.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+# Response compression configuration
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode a payload as compact UTF-8 JSON"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the fast encoder"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def pick_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Preferred content coding accepted by the client: br, then gzip"""
+    accepted: Dict[str, float] = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    if BROTLI_AVAILABLE and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any((tag[2:] if tag.startswith("W/") else tag) == opaque for tag in tags)
+
+
+class Encoded:
+    """An encoded JSON body with its strong ETag and compressed variants"""
+
+    __slots__ = ("body", "etag", "variants")
+
+    def __init__(self, body: bytes, etag: Optional[str] = None):
+        self.body = body
+        self.etag = etag or f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        self.variants: Dict[str, bytes] = {}
+
+    def negotiate(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str], str]:
+        """Return (body, content coding or None, ETag of that representation)"""
+        coding = pick_encoding(accept_encoding) if len(self.body) >= COMPRESS_MIN_BYTES else None
+        if coding is None:
+            return self.body, None, self.etag
+        body = self.variants.get(coding)
+        if body is None:
+            if coding == "br":
+                body = brotli.compress(self.body, quality=COMPRESS_BROTLI_QUALITY)
+            else:
+                body = gzip.compress(self.body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+            self.variants[coding] = body
+        return body, coding, f'{self.etag[:-1]}-{coding}"'
+
+
+def encoded_response(request: Request, encoded: Encoded) -> Response:
+    """Conditional, compressed response for a polled endpoint"""
+    body, coding, etag = encoded.negotiate(request.headers.get("accept-encoding"))
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if not_modified(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type="application/json", headers=headers)
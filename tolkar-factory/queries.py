@@ -0,0 +1,65 @@
+"""
+TOLKAR Zero@Factory - Read Queries
+Set-based read paths for the hot API endpoints
+Phase 9.5 - Production Ready
+"""
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional, Tuple
+
+from models import Station, ProductionRun, Telemetry
+
+
+def latest_run_per_station_stmt():
+    """Select every station joined to its latest production run in one statement.
+
+    The latest run is resolved with a correlated ``LIMIT 1`` subquery per
+    station, which both SQLite and PostgreSQL answer with a backward seek on
+    ``idx_production_runs_station_created_at_id``.  Cost therefore grows with
+    the number of stations, not with the size of ``production_runs``.
+    """
+    latest_run_id = (
+        select(ProductionRun.id)
+        .where(ProductionRun.station_id == Station.id)
+        .order_by(ProductionRun.created_at.desc(), ProductionRun.id.desc())
+        .limit(1)
+        .correlate(Station)
+        .scalar_subquery()
+    )
+    return (
+        select(Station, ProductionRun)
+        .outerjoin(ProductionRun, ProductionRun.id == latest_run_id)
+        .order_by(Station.id)
+    )
+
+
+def latest_telemetry_stmt():
+    """Select the most recent telemetry reading"""
+    return select(Telemetry).order_by(Telemetry.recorded_at.desc()).limit(1)
+
+
+def station_state(station: Station, latest_run: Optional[ProductionRun]) -> Dict[str, Any]:
+    """Build the API representation of a station from its latest run, falling back to baselines"""
+    return {
+        "id": station.id,
+        "name": station.name,
+        "wip": latest_run.wip if latest_run else station.wip_baseline,
+        "ct": latest_run.ct if latest_run else station.ct_baseline,
+        "fpy": latest_run.fpy if latest_run else station.fpy_baseline,
+        "oee": latest_run.oee if latest_run else station.oee_baseline,
+        "status": latest_run.status if latest_run else station.status
+    }
+
+
+async def get_latest_runs(db: AsyncSession, station_id: Optional[int] = None) -> List[Tuple[Station, Optional[ProductionRun]]]:
+    """Return (station, latest_run) pairs for all stations (or one) in a single round trip"""
+    stmt = latest_run_per_station_stmt()
+    if station_id is not None:
+        stmt = stmt.where(Station.id == station_id)
+    return [tuple(row) for row in (await db.execute(stmt)).all()]
+
+
+async def get_latest_telemetry(db: AsyncSession) -> Optional[Telemetry]:
+    """Return the most recent telemetry reading, if any"""
+    return (await db.execute(latest_telemetry_stmt())).scalars().first()
@@ -0,0 +1,234 @@
+"""
+TOLKAR Zero@Factory - Telemetry Rollups
+Incrementally maintained 1m / 15m / 1h aggregates and the history query API
+Phase 9.5 - Production Ready
+
+Every telemetry flush is folded into ``telemetry_rollups`` with an upsert
+that merges min/max/sum/count per metric, so rollups never need to be
+recomputed from raw rows.  History queries pick the coarsest resolution
+that still yields the requested number of points, which keeps long-range
+trends off the raw ``telemetry`` table.
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Telemetry, TelemetryRollup
+from database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Number of 1-minute points in the /api/state telemetry history
+TELEMETRY_HISTORY_POINTS = int(os.getenv("TELEMETRY_HISTORY_POINTS", "12"))
+
+# Rollup resolutions, finest first (seconds)
+RESOLUTIONS = (60, 900, 3600)
+
+# Rollup metric name -> raw telemetry column
+METRICS = {
+    "vibration": "vibration_mms",
+    "temperature": "temperature_c",
+    "pressure": "pressure_bar",
+    "power": "power_kw_idx",
+}
+
+
+def to_utc_naive(value: datetime) -> datetime:
+    """Normalize a timestamp to naive UTC, the storage convention for rollup buckets"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_start(recorded_at: datetime, resolution_seconds: int) -> datetime:
+    """Floor a timestamp to the start of its rollup bucket"""
+    ts = to_utc_naive(recorded_at)
+    epoch = int((ts - datetime(1970, 1, 1)).total_seconds())
+    return datetime(1970, 1, 1) + timedelta(seconds=epoch - epoch % resolution_seconds)
+
+
+def aggregate(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fold raw readings into partial rollup rows for every resolution"""
+    buckets: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        for resolution in RESOLUTIONS:
+            key = (row["station_id"], resolution, bucket_start(row["recorded_at"], resolution))
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = {"station_id": key[0], "resolution_seconds": key[1], "bucket_start": key[2]}
+                for metric in METRICS:
+                    bucket.update({f"{metric}_min": None, f"{metric}_max": None,
+                                   f"{metric}_sum": 0.0, f"{metric}_count": 0})
+                buckets[key] = bucket
+            for metric, column in METRICS.items():
+                value = row.get(column)
+                if value is None:
+                    continue
+                current_min = bucket[f"{metric}_min"]
+                current_max = bucket[f"{metric}_max"]
+                bucket[f"{metric}_min"] = value if current_min is None else min(current_min, value)
+                bucket[f"{metric}_max"] = value if current_max is None else max(current_max, value)
+                bucket[f"{metric}_sum"] += value
+                bucket[f"{metric}_count"] += 1
+    return list(buckets.values())
+
+
+def _upsert_stmt(dialect_name: str, values: List[Dict[str, Any]]):
+    """Dialect-specific INSERT .. ON CONFLICT / ON DUPLICATE KEY that merges partial aggregates"""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        least, greatest = func.least, func.greatest
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        least, greatest = func.min, func.max
+    elif dialect_name in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        least, greatest = func.least, func.greatest
+    else:
+        raise NotImplementedError(f"Telemetry rollups are not supported on {dialect_name}")
+
+    stmt = dialect_insert(TelemetryRollup).values(values)
+    # MySQL names the proposed row "inserted", PostgreSQL and SQLite "excluded"
+    excluded = stmt.inserted if dialect_name in ("mysql", "mariadb") else stmt.excluded
+    table = TelemetryRollup.__table__.c
+    merged = {}
+    for metric in METRICS:
+        low, high = f"{metric}_min", f"{metric}_max"
+        # coalesce on both sides so a NULL (no samples yet) never wins
+        merged[low] = least(func.coalesce(table[low], excluded[low]), func.coalesce(excluded[low], table[low]))
+        merged[high] = greatest(func.coalesce(table[high], excluded[high]), func.coalesce(excluded[high], table[high]))
+        merged[f"{metric}_sum"] = table[f"{metric}_sum"] + excluded[f"{metric}_sum"]
+        merged[f"{metric}_count"] = table[f"{metric}_count"] + excluded[f"{metric}_count"]
+    if dialect_name in ("mysql", "mariadb"):
+        # Every assignment reads only its own column, so MySQL's left-to-right evaluation is safe
+        return stmt.on_duplicate_key_update(merged)
+    return stmt.on_conflict_do_update(
+        index_elements=["station_id", "resolution_seconds", "bucket_start"],
+        set_=merged
+    )
+
+
+async def merge_rollups(db: AsyncSession, rows: List[Dict[str, Any]]):
+    """Upsert a batch of raw readings into the rollup table (caller commits)"""
+    values = aggregate(rows)
+    if not values:
+        return
+    dialect_name = db.get_bind().dialect.name
+    # Keep statements well under bind-parameter limits
+    for offset in range(0, len(values), 500):
+        await db.execute(_upsert_stmt(dialect_name, values[offset:offset + 500]))
+
+
+async def update_rollups(rows: List[Dict[str, Any]]):
+    """Telemetry write hook: fold a flushed batch into the rollups"""
+    async with AsyncSessionLocal() as db:
+        await merge_rollups(db, rows)
+        await db.commit()
+
+
+def choose_resolution(start: datetime, end: datetime, points: int) -> int:
+    """Coarsest resolution that still yields at least ``points`` buckets in the range"""
+    span = (end - start).total_seconds()
+    for resolution in reversed(RESOLUTIONS):
+        if span / resolution >= points:
+            return resolution
+    return RESOLUTIONS[0]
+
+
+async def query_history(db: AsyncSession, start: datetime, end: datetime, points: int = 60,
+                        station_id: Optional[int] = None) -> Dict[str, Any]:
+    """Return a min/max/avg/count series per metric for one station or the whole plant"""
+    start, end = to_utc_naive(start), to_utc_naive(end)
+    resolution = choose_resolution(start, end, points)
+    table = TelemetryRollup
+
+    columns = [table.bucket_start]
+    for metric in METRICS:
+        columns += [
+            func.min(getattr(table, f"{metric}_min")).label(f"{metric}_min"),
+            func.max(getattr(table, f"{metric}_max")).label(f"{metric}_max"),
+            func.sum(getattr(table, f"{metric}_sum")).label(f"{metric}_sum"),
+            func.sum(getattr(table, f"{metric}_count")).label(f"{metric}_count"),
+        ]
+    stmt = (
+        select(*columns)
+        .where(
+            table.resolution_seconds == resolution,
+            table.bucket_start >= bucket_start(start, resolution),
+            table.bucket_start <= end
+        )
+        .group_by(table.bucket_start)
+        .order_by(table.bucket_start)
+    )
+    if station_id is not None:
+        stmt = stmt.where(table.station_id == station_id)
+
+    series = []
+    for row in (await db.execute(stmt)).mappings():
+        point = {"bucket_start": row["bucket_start"].isoformat()}
+        for metric in METRICS:
+            count = row[f"{metric}_count"] or 0
+            point[metric] = {
+                "min": row[f"{metric}_min"],
+                "max": row[f"{metric}_max"],
+                "avg": round(row[f"{metric}_sum"] / count, 3) if count else None,
+                "count": count
+            }
+        series.append(point)
+
+    return {
+        "station_id": station_id,
+        "resolution_seconds": resolution,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "points": series
+    }
+
+
+async def recent_history(db: AsyncSession, points: int = TELEMETRY_HISTORY_POINTS) -> Optional[Dict[str, List[float]]]:
+    """Plant-wide average per metric over the last ``points`` minutes, oldest first"""
+    end = datetime.utcnow()
+    history = await query_history(db, end - timedelta(minutes=points), end, points=points)
+    if not history["points"]:
+        return None
+    return {
+        metric: [point[metric]["avg"] for point in history["points"] if point[metric]["avg"] is not None]
+        for metric in METRICS
+    }
+
+
+async def rebuild_rollups(since: Optional[datetime] = None, chunk_size: int = 5000):
+    """Rebuild rollups from raw telemetry (backfill after enabling rollups on existing data)"""
+    async with AsyncSessionLocal() as db:
+        delete_stmt = TelemetryRollup.__table__.delete()
+        raw_stmt = select(Telemetry).order_by(Telemetry.recorded_at)
+        if since is not None:
+            delete_stmt = delete_stmt.where(TelemetryRollup.bucket_start >= bucket_start(since, RESOLUTIONS[-1]))
+            raw_stmt = raw_stmt.where(Telemetry.recorded_at >= bucket_start(since, RESOLUTIONS[-1]))
+        await db.execute(delete_stmt)
+
+        total = 0
+        result = await db.stream(raw_stmt.execution_options(yield_per=chunk_size))
+        async for partition in result.scalars().partitions():
+            rows = [
+                {"station_id": t.station_id, "recorded_at": t.recorded_at,
+                 **{column: getattr(t, column) for column in METRICS.values()}}
+                for t in partition if t.recorded_at is not None
+            ]
+            await merge_rollups(db, rows)
+            total += len(rows)
+        await db.commit()
+        logger.info(f"✅ Rebuilt telemetry rollups from {total} raw readings")
+        return total
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    # Backfill rollups from the raw telemetry table
+    asyncio.run(rebuild_rollups())
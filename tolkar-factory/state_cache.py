@@ -0,0 +1,286 @@
+"""
+TOLKAR Zero@Factory - Materialized Station State
+In-process current-state model served by /api/state
+Phase 9.5 - Production Ready
+
+Station state only changes through the control endpoints (reset, shock,
+kaizen, maintenance).  Those endpoints write through to this cache after
+their transaction commits, so polling reads are answered from memory and
+never touch the database.  Every change of content bumps ``version``, and
+the encoded (and compressed) response body is built once per version and
+shared by every poll.
+
+The cache is per process: with several gunicorn workers, a write updates
+only the worker that served it, and the others re-materialize from the
+database once their snapshot is STATE_CACHE_MAX_AGE_SECONDS old.  Only one
+reload runs at a time per process (concurrent polls wait for it rather than
+query), and a reload that overlapped a write-through is discarded because
+its snapshot may predate that write.  The
+payload's ``timestamp`` is the newest change recorded in the database (latest
+production run or telemetry reading), not a worker's clock, so every worker
+holding the same state encodes the same bytes.  The ETag is a strong
+validator over those bytes and a poll gets a 304 whichever worker served the
+previous one.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import ProductionRun, Telemetry
+from payloads import dumps, Encoded
+from queries import get_latest_runs, get_latest_telemetry, station_state
+from rollups import recent_history, to_utc_naive
+
+logger = logging.getLogger(__name__)
+
+# Re-materialize from the database when the snapshot is older than this (0 = never)
+STATE_CACHE_MAX_AGE_SECONDS = float(os.getenv("STATE_CACHE_MAX_AGE_SECONDS", "2"))
+
+# Telemetry defaults used when no reading has been recorded yet
+DEFAULT_TELEMETRY = {
+    "vibration": 2.3,
+    "temperature": 78,
+    "pressure": 6.2,
+    "power": 85,
+    "history": {
+        "vibration": [2.0, 2.1, 2.2, 2.3],
+        "temperature": [80, 79, 78, 78],
+        "pressure": [5.9, 6.0, 6.1, 6.2],
+        "power": [81, 82, 84, 85]
+    }
+}
+
+
+# State timestamp before anything has been recorded
+EPOCH = datetime(1970, 1, 1)
+
+
+def _changed_at(*values: Optional[datetime]) -> datetime:
+    """Newest of the given change times, as naive UTC at the precision every database keeps"""
+    times = [to_utc_naive(value).replace(microsecond=0) for value in values if value is not None]
+    return max(times, default=EPOCH)
+
+
+def run_update(run: ProductionRun) -> Dict[str, Any]:
+    """Capture the state fields of a pending production run before it is committed
+    
+    The run's ``created_at`` is stamped here rather than by the database so
+    the write-through state carries the same timestamp other workers read back.
+    """
+    if run.created_at is None:
+        run.created_at = datetime.utcnow().replace(microsecond=0)
+    return {
+        "station_id": run.station_id,
+        "created_at": run.created_at,
+        "wip": run.wip,
+        "ct": run.ct,
+        "fpy": run.fpy,
+        "oee": run.oee,
+        "status": run.status
+    }
+
+
+class StationStateCache:
+    """Versioned in-memory view of stations and their latest production run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stations: Dict[int, Dict[str, Any]] = {}
+        self._telemetry: Dict[str, Any] = dict(DEFAULT_TELEMETRY)
+        self._telemetry_at: Optional[datetime] = None
+        self._changed_at = EPOCH
+        self._reload_lock = asyncio.Lock()
+        # Bumped by every write-through, so a reload can tell it was overtaken
+        self._generation = 0
+        self._telemetry_generation = 0
+        self._payload: Optional[Dict[str, Any]] = None
+        self._body: Optional[Encoded] = None
+        self._loaded_at = 0.0
+        self._invalidated = False
+        self._digest = ""
+        self.version = 0
+        self.hits = 0
+        self.loads = 0
+        self.loads_dropped = 0
+        self.encodes = 0
+        self._listeners = []
+
+    @property
+    def loaded(self) -> bool:
+        return self._payload is not None
+
+    @property
+    def etag(self) -> str:
+        return f'"state-{self._digest}"'
+
+    def add_listener(self, listener):
+        """Register ``listener(version, payload)``, called on every version bump"""
+        self._listeners.append(listener)
+
+    def _publish(self) -> bool:
+        """Re-encode the payload and bump the version if it changed (lock must be held)"""
+        payload = {
+            "stations": [self._stations[station_id] for station_id in sorted(self._stations)],
+            "telemetry": self._telemetry,
+            "timestamp": self._changed_at.isoformat()
+        }
+        body = dumps(payload)
+        digest = hashlib.sha1(body).hexdigest()[:20]
+        if self._payload is not None and digest == self._digest:
+            return False
+        self._digest = digest
+        self.version += 1
+        self._payload = payload
+        self._body = Encoded(body, etag=self.etag)
+        self.encodes += 1
+        # Listeners must not block or call back into the cache
+        for listener in self._listeners:
+            try:
+                listener(self.version, self._payload)
+            except Exception as e:
+                logger.warning(f"State listener failed: {e}")
+        return True
+
+    async def load(self, db: AsyncSession) -> bool:
+        """Materialize the full state from the database; False if a write-through overtook it"""
+        generation, telemetry_generation = self._generation, self._telemetry_generation
+        station_runs = await get_latest_runs(db)
+        latest_telemetry = await get_latest_telemetry(db)
+        history = await recent_history(db)
+        stations = {
+            station.id: station_state(station, latest_run)
+            for station, latest_run in station_runs
+        }
+        station_times = [latest_run.created_at if latest_run else station.created_at for station, latest_run in station_runs]
+        with self._lock:
+            if self._generation != generation:
+                # Stations were written through while the queries ran: this snapshot may be older
+                self.loads_dropped += 1
+                logger.debug("Station state reload discarded - overtaken by a write")
+                return False
+            self._stations = stations
+            if self._telemetry_generation == telemetry_generation:
+                self._telemetry = self._telemetry_block(latest_telemetry, history)
+                self._telemetry_at = latest_telemetry.recorded_at if latest_telemetry else None
+            self._changed_at = _changed_at(self._telemetry_at, *station_times)
+            self._loaded_at = time.monotonic()
+            self._invalidated = False
+            self.loads += 1
+            changed = self._publish()
+        if changed:
+            logger.info(f"Station state materialized ({len(stations)} stations, version {self.version})")
+        return True
+
+    async def refresh(self, session_factory) -> bool:
+        """Reload the state if it is stale, with at most one reload in flight per process
+        
+        Polls arriving during a reload wait for it and then use its result
+        instead of running the same queries again.
+        """
+        if not self.is_stale():
+            return False
+        loads = self.loads + self.loads_dropped
+        async with self._reload_lock:
+            if self.loads + self.loads_dropped != loads or not self.is_stale():
+                return False
+            async with session_factory() as db:
+                return await self.load(db)
+
+    async def reload_station(self, db: AsyncSession, station_id: int):
+        """Re-read a single station and its latest run after a write"""
+        for station, latest_run in await get_latest_runs(db, station_id=station_id):
+            with self._lock:
+                self._stations[station.id] = station_state(station, latest_run)
+                self._generation += 1
+                self._changed_at = _changed_at(self._changed_at, latest_run.created_at if latest_run else None)
+                self._publish()
+
+    def apply_updates(self, updates: List[Dict[str, Any]]):
+        """Write committed production runs through to the cached state"""
+        if not updates:
+            return
+        with self._lock:
+            if any(update["station_id"] not in self._stations for update in updates):
+                # Unknown station: apply nothing and reload on the next read
+                self._invalidated = True
+                return
+            for update in updates:
+                self._stations[update["station_id"]] = {
+                    **self._stations[update["station_id"]],
+                    **{key: value for key, value in update.items() if key not in ("station_id", "created_at")}
+                }
+            self._generation += 1
+            self._changed_at = _changed_at(self._changed_at, *[update.get("created_at") for update in updates])
+            self._publish()
+
+    def apply_telemetry(self, telemetry: Optional[Telemetry],
+                        history: Optional[Dict[str, List[float]]] = None):
+        """Write the latest telemetry reading (and rollup history, if given) through to the cached state"""
+        with self._lock:
+            self._telemetry = self._telemetry_block(telemetry, history or self._telemetry.get("history"))
+            self._telemetry_generation += 1
+            if telemetry is not None:
+                self._telemetry_at = telemetry.recorded_at
+                self._changed_at = _changed_at(self._changed_at, telemetry.recorded_at)
+            self._publish()
+
+    def station_ids(self) -> List[int]:
+        return list(self._stations)
+
+    def is_stale(self) -> bool:
+        if not self.loaded or self._invalidated:
+            return True
+        if STATE_CACHE_MAX_AGE_SECONDS > 0:
+            return time.monotonic() - self._loaded_at > STATE_CACHE_MAX_AGE_SECONDS
+        return False
+
+    def snapshot(self) -> Tuple[str, Dict[str, Any]]:
+        """Return (etag, payload) for the current version"""
+        with self._lock:
+            self.hits += 1
+            return self.etag, self._payload
+
+    def snapshot_encoded(self) -> Encoded:
+        """Return the encoded payload for the current version (encoded once, when it was published)"""
+        with self._lock:
+            self.hits += 1
+            return self._body
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "stations": len(self._stations),
+            "reads": self.hits,
+            "loads": self.loads,
+            "loads_dropped": self.loads_dropped,
+            "encodes": self.encodes
+        }
+
+    def _telemetry_block(self, telemetry: Optional[Telemetry],
+                         history: Optional[Dict[str, List[float]]] = None) -> Dict[str, Any]:
+        # Metrics without rollup points yet keep the default trend
+        history = {
+            metric: (history or {}).get(metric) or default
+            for metric, default in DEFAULT_TELEMETRY["history"].items()
+        }
+        if telemetry is None:
+            return {**DEFAULT_TELEMETRY, "history": history}
+        return {
+            "vibration": telemetry.vibration_mms,
+            "temperature": telemetry.temperature_c,
+            "pressure": telemetry.pressure_bar,
+            "power": telemetry.power_kw_idx,
+            "history": history
+        }
+
+
+# Global state cache instance
+state_cache = StationStateCache()
@@ -0,0 +1,40 @@
+"""
+TOLKAR Zero@Factory - Test Configuration
+Scratch SQLite database and import path for the test suite
+Phase 9.5 - Production Ready
+
+The models and database modules bind their engines at import time, so the
+environment is configured here before any test module imports them.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix="tolkar_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(SCRATCH_DIR, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["RETENTION_ENABLED"] = "false"
+os.environ["PROMETHEUS_ENABLED"] = "false"
+os.environ["AUDIT_SPOOL_PATH"] = os.path.join(SCRATCH_DIR, "audit_spool.jsonl")
+os.environ["ARCHIVE_PATH"] = os.path.join(SCRATCH_DIR, "archive")
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Create the schema and default stations once per test run"""
+    from database import init_db
+    init_db()
+    return os.environ["DATABASE_URL"]
+
+
+@pytest.fixture
+def station_ids(database):
+    from models import SessionLocal, Station
+    with SessionLocal() as db:
+        return [station.id for station in db.query(Station).order_by(Station.id).all()]
@@ -0,0 +1,58 @@
+"""Audit spool: per-process files and single replay"""
+
+import json
+import os
+import subprocess
+import sys
+import uuid
+from datetime import datetime
+
+from sqlalchemy import select, func
+
+from audit import AuditQueue
+from models import SessionLocal, SystemEvent
+
+FACTORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_spool(path, count):
+    events = [{"id": str(uuid.uuid4()), "event_type": "reset", "station_id": None, "label": "spooled",
+               "severity": "info", "created_at": datetime.utcnow().isoformat()} for _ in range(count)]
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.writelines(json.dumps(event) + "\n" for event in events)
+    return [event["id"] for event in events]
+
+
+def stored(ids):
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(SystemEvent).where(SystemEvent.id.in_(ids)))
+
+
+def test_spools_of_exited_processes_are_replayed_once(database, tmp_path):
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    spool = str(tmp_path / "audit_spool.jsonl")
+    dead_ids = write_spool(str(tmp_path / f"audit_spool.{exited.pid}.jsonl"), 3)
+    legacy_ids = write_spool(spool, 2)
+    live_ids = write_spool(str(tmp_path / f"audit_spool.{os.getppid()}.jsonl"), 4)
+
+    # Two workers starting at the same time, each in its own process
+    worker = ("import asyncio, sys; sys.path.insert(0, sys.argv[1]); from audit import AuditQueue; "
+              "queue = AuditQueue(spool_path=sys.argv[2]); asyncio.run(queue._replay_spool()); print(queue.replayed)")
+    workers = [subprocess.Popen([sys.executable, "-c", worker, FACTORY_DIR, spool], stdout=subprocess.PIPE, text=True)
+               for _ in range(2)]
+    replayed = [int(process.communicate()[0].strip().splitlines()[-1]) for process in workers]
+
+    assert sum(replayed) == 5
+    assert stored(dead_ids) == 3 and stored(legacy_ids) == 2
+    assert stored(live_ids) == 0
+    assert sorted(os.listdir(tmp_path)) == [f"audit_spool.{os.getppid()}.jsonl"]
+
+
+def test_failed_flush_spools_to_own_pid_file(tmp_path):
+    queue = AuditQueue(spool_path=str(tmp_path / "audit_spool.jsonl"))
+    queue.record("shock", "spool me")
+    queue._spool(queue._buffer)
+
+    assert os.listdir(tmp_path) == [f"audit_spool.{os.getpid()}.jsonl"]
+    assert queue.spooled == 1
@@ -0,0 +1,76 @@
+"""Push streams: stream tickets and session checks on open streams"""
+
+import asyncio
+import time
+
+from auth import AuthService
+from broadcast import EXPIRED_SSE, Broadcaster, sse_stream
+
+
+def collect(stream, limit=5):
+    async def run():
+        chunks = []
+        async for chunk in stream:
+            chunks.append(chunk)
+            if len(chunks) >= limit:
+                break
+        return chunks
+
+    return asyncio.run(run())
+
+
+def test_stream_ticket_opens_streams_only(database):
+    service = AuthService()
+    access_token = service.create_access_token({"sub": "admin"})
+    ticket = service.create_stream_ticket(access_token)
+
+    assert asyncio.run(service.verify_token(ticket)) is None
+    assert service.create_stream_ticket(ticket) is None
+
+    user, ends_at = asyncio.run(service.verify_stream_credentials(ticket))
+    _, session_ends_at = asyncio.run(service.verify_stream_credentials(access_token))
+    assert user.username == "admin"
+    assert ends_at == session_ends_at > time.time() + 60
+
+
+def test_stream_closes_when_its_session_has_expired():
+    broadcaster = Broadcaster()
+    subscriber = broadcaster.subscribe(["stations"])
+
+    chunks = collect(sse_stream(broadcaster, subscriber, heartbeat=5, expires_at=time.time() - 1))
+
+    assert chunks[-1] == EXPIRED_SSE
+    assert not broadcaster.subscribers
+
+
+def test_stream_closes_when_the_user_is_no_longer_authorized():
+    broadcaster = Broadcaster()
+    subscriber = broadcaster.subscribe(["stations"])
+    checks = []
+
+    async def authorize():
+        checks.append(True)
+        return len(checks) < 2
+
+    chunks = collect(sse_stream(broadcaster, subscriber, heartbeat=0.01, authorize=authorize))
+
+    assert chunks == [b"retry: 3000\n\n", b": ping\n\n", EXPIRED_SSE]
+    assert not broadcaster.subscribers
+
+
+def test_access_token_in_the_query_string_is_refused(database):
+    from fastapi.testclient import TestClient
+    import app as factory_app
+
+    service = factory_app.auth_service
+    access_token = service.create_access_token({"sub": "admin"})
+    ticket = service.create_stream_ticket(access_token)
+
+    assert asyncio.run(service.verify_stream_credentials(access_token, ticket_only=True)) is None
+    assert asyncio.run(factory_app.stream_session(access_token, None)) is None
+    assert asyncio.run(factory_app.stream_session(ticket, None)) is not None
+
+    client = TestClient(factory_app.app)
+    assert client.get("/api/stream", params={"ticket": access_token}).status_code == 401
+    with client.websocket_connect(f"/api/ws?ticket={access_token}") as websocket:
+        assert websocket.receive()["code"] == 1008
@@ -0,0 +1,123 @@
+"""Streaming export and the archive tier: bounded memory, merge order and de-duplication"""
+
+import asyncio
+import os
+import shutil
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete
+
+import export
+import retention
+from database import AsyncSessionLocal
+from models import SessionLocal, Telemetry
+
+T0 = datetime(2020, 3, 1)
+
+
+def reading(station_id, seconds, vibration=2.0):
+    return {"id": str(uuid.uuid4()), "station_id": station_id, "recorded_at": T0 + timedelta(seconds=seconds),
+            "vibration_mms": vibration, "temperature_c": 78.0, "pressure_bar": 6.0, "power_kw_idx": 84.0}
+
+
+@pytest.fixture
+def hot_rows(database):
+    """Insert telemetry rows (older than any retention horizon) and remove them afterwards"""
+    inserted = []
+
+    def insert(rows):
+        with SessionLocal() as db:
+            db.bulk_insert_mappings(Telemetry, rows)
+            db.commit()
+        inserted.extend(row["id"] for row in rows)
+
+    yield insert
+    with SessionLocal() as db:
+        for offset in range(0, len(inserted), 500):
+            db.execute(delete(Telemetry).where(Telemetry.id.in_(inserted[offset:offset + 500])))
+        db.commit()
+
+
+@pytest.fixture
+def archive(monkeypatch):
+    """Archive tier switched on, in the scratch ARCHIVE_PATH, emptied afterwards"""
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(retention, "RETENTION_ENABLED", True)
+    yield retention.ARCHIVE_PATH
+    shutil.rmtree(os.path.join(retention.ARCHIVE_PATH, "telemetry"), ignore_errors=True)
+
+
+def export_peak(**kwargs):
+    """Lines exported and peak traced memory while consuming the export"""
+    async def run():
+        lines = 0
+        async for chunk in export.stream_export("telemetry", "ndjson", **kwargs):
+            lines += chunk.count(b"\n")
+        return lines
+
+    tracemalloc.start()
+    try:
+        lines = asyncio.run(run())
+        return lines, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_export_memory_does_not_grow_with_old_rows(hot_rows, station_ids, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_CHUNK_ROWS", 200)
+    station = station_ids[0]
+    hot_rows([reading(station, i) for i in range(3000)])
+    small = export_peak(start=T0, end=T0 + timedelta(seconds=2999))
+    hot_rows([reading(station, i) for i in range(3000, 30000)])
+    large = export_peak(start=T0, end=T0 + timedelta(seconds=29999))
+
+    assert (small[0], large[0]) == (3000, 30000)
+    assert large[1] < small[1] * 1.5
+
+
+def test_export_merges_archive_and_hot_rows_once_in_time_order(hot_rows, archive, station_ids, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_CHUNK_ROWS", 7)
+    station = station_ids[1]
+    table = retention.ARCHIVED_TABLES["telemetry"]
+    rows = [reading(station, i * 10) for i in range(40)]
+    # Two retention runs over one month, the second retrying part of the first,
+    # and rows 30-34 left in the hot table by an interrupted run
+    retention.write_archive(table, rows[:20], root=archive)
+    retention.write_archive(table, rows[15:35], root=archive)
+    hot_rows(rows[30:])
+
+    async def run():
+        chunks = [chunk async for chunk in export.stream_export("telemetry", "csv", start=T0, end=T0 + timedelta(days=1), station_id=station)]
+        return b"".join(chunks).decode().splitlines()[1:]
+
+    ids = [line.split(",")[0] for line in asyncio.run(run())]
+    assert ids == [row["id"] for row in rows]
+
+    async def history(limit):
+        async with AsyncSessionLocal() as db:
+            return await retention.read_rows(db, "telemetry", start=T0, end=T0 + timedelta(days=1), station_id=station, limit=limit)
+
+    assert [row["id"] for row in asyncio.run(history(12))] == [row["id"] for row in rows[::-1][:12]]
+    assert [row["id"] for row in asyncio.run(history(None))] == [row["id"] for row in rows[::-1]]
+
+
+def test_newest_archive_rows_are_read_within_the_limit(archive, station_ids):
+    station = station_ids[2]
+    table = retention.ARCHIVED_TABLES["telemetry"]
+    rows = [reading(station, i) for i in range(30000)]
+    for offset in range(0, len(rows), 10000):
+        retention.write_archive(table, rows[offset:offset + 10000], root=archive)
+
+    tracemalloc.start()
+    try:
+        newest = retention._read_archive_newest(table, None, None, station, set(), 5)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert sorted(row["id"] for row in newest) == sorted(row["id"] for row in rows[-5:])
+    # Python objects are only built for the newest rows of each scanned batch
+    assert peak < 1_000_000
@@ -0,0 +1,44 @@
+"""Telemetry ingestion: timestamp normalization and bulk writes"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from ingest import TelemetryIngestor, refresh_latest_telemetry
+from models import SessionLocal, Telemetry, TelemetryRollup
+from rollups import update_rollups
+
+
+def reading(station_id, recorded_at):
+    return {"station_id": station_id, "vibration_mms": 2.1, "temperature_c": 78.0,
+            "pressure_bar": 6.0, "power_kw_idx": 84.0, "recorded_at": recorded_at}
+
+
+def test_mixed_timezone_batch_is_stored_as_naive_utc(station_ids, caplog):
+    station = station_ids[0]
+    aware = datetime(2031, 3, 4, 5, 0, 30, tzinfo=timezone(timedelta(hours=2)))
+    naive = datetime(2031, 3, 4, 3, 0, 45)
+    rows = [reading(station, aware), reading(station, naive)]
+
+    async def run():
+        ingestor = TelemetryIngestor()
+        ingestor.add_write_hook(update_rollups)
+        ingestor.add_write_hook(refresh_latest_telemetry)
+        await ingestor.start()
+        ingestor.submit(rows)
+        await ingestor.stop()
+        return ingestor
+
+    ingestor = asyncio.run(run())
+
+    assert ingestor.rows_written == 2 and ingestor.rows_failed == 0
+    assert all(row["recorded_at"].tzinfo is None for row in rows)
+    assert "write hook failed" not in caplog.text
+
+    with SessionLocal() as db:
+        stored = db.scalars(select(Telemetry.recorded_at).where(Telemetry.id == rows[0]["id"])).one()
+        assert stored == datetime(2031, 3, 4, 3, 0, 30)
+        rollup = db.get(TelemetryRollup, (station, 3600, datetime(2031, 3, 4, 3, 0)))
+        assert rollup is not None and rollup.vibration_count == 2
+        assert db.get(TelemetryRollup, (station, 3600, datetime(2031, 3, 4, 5, 0))) is None
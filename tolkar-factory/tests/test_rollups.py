@@ -0,0 +1,76 @@
+"""Telemetry rollups: bucketing, aggregation and the merging upsert"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.dialects import mysql, postgresql
+
+from database import AsyncSessionLocal
+from models import SessionLocal, TelemetryRollup
+from rollups import aggregate, bucket_start, merge_rollups, query_history, _upsert_stmt
+
+
+def reading(station_id, recorded_at, vibration, temperature=None):
+    return {"station_id": station_id, "recorded_at": recorded_at, "vibration_mms": vibration,
+            "temperature_c": temperature, "pressure_bar": None, "power_kw_idx": None}
+
+
+def test_bucket_start_floors_to_resolution_in_utc():
+    ts = datetime(2031, 5, 6, 7, 38, 59)
+    assert bucket_start(ts, 60) == datetime(2031, 5, 6, 7, 38)
+    assert bucket_start(ts, 900) == datetime(2031, 5, 6, 7, 30)
+    assert bucket_start(ts, 3600) == datetime(2031, 5, 6, 7, 0)
+    aware = datetime(2031, 5, 6, 9, 38, 59, tzinfo=timezone(timedelta(hours=2)))
+    assert bucket_start(aware, 3600) == datetime(2031, 5, 6, 7, 0)
+
+
+def test_aggregate_folds_every_resolution():
+    base = datetime(2031, 5, 6, 7, 0, 10)
+    rows = aggregate([reading(1, base, 2.0, 70.0), reading(1, base + timedelta(seconds=70), 4.0)])
+    minute = {row["bucket_start"]: row for row in rows if row["resolution_seconds"] == 60}
+    hour = [row for row in rows if row["resolution_seconds"] == 3600]
+    assert len(minute) == 2 and len(hour) == 1
+    assert (hour[0]["vibration_min"], hour[0]["vibration_max"], hour[0]["vibration_sum"], hour[0]["vibration_count"]) == (2.0, 4.0, 6.0, 2)
+    # A metric missing from a reading is not counted
+    assert (hour[0]["temperature_count"], hour[0]["temperature_min"]) == (1, 70.0)
+    assert (hour[0]["pressure_count"], hour[0]["pressure_min"]) == (0, None)
+
+
+def test_upsert_merges_partial_aggregates(station_ids):
+    station = station_ids[-1]
+    hour = datetime(2032, 1, 2, 3, 0)
+
+    async def merge(rows):
+        async with AsyncSessionLocal() as db:
+            await merge_rollups(db, rows)
+            await db.commit()
+
+    asyncio.run(merge([reading(station, hour + timedelta(minutes=1), 3.0)]))
+    asyncio.run(merge([reading(station, hour + timedelta(minutes=2), 1.0, 80.0),
+                       reading(station, hour + timedelta(minutes=2, seconds=5), 5.0)]))
+
+    with SessionLocal() as db:
+        row = db.get(TelemetryRollup, (station, 3600, hour))
+        assert (row.vibration_min, row.vibration_max, row.vibration_sum, row.vibration_count) == (1.0, 5.0, 9.0, 3)
+        assert (row.temperature_min, row.temperature_max, row.temperature_count) == (80.0, 80.0, 1)
+        assert (row.pressure_min, row.pressure_count) == (None, 0)
+
+    async def history():
+        async with AsyncSessionLocal() as db:
+            return await query_history(db, hour, hour + timedelta(minutes=5), points=5, station_id=station)
+
+    result = asyncio.run(history())
+    assert result["resolution_seconds"] == 60
+    assert [point["vibration"]["avg"] for point in result["points"]] == [3.0, 3.0]
+
+
+@pytest.mark.parametrize("dialect, clause", [
+    (postgresql.dialect(), "ON CONFLICT (station_id, resolution_seconds, bucket_start) DO UPDATE"),
+    (mysql.dialect(), "ON DUPLICATE KEY UPDATE"),
+])
+def test_upsert_compiles_for_server_backends(dialect, clause):
+    values = aggregate([reading(1, datetime(2031, 5, 6, 7, 0), 2.0)])
+    sql = str(_upsert_stmt(dialect.name, values).compile(dialect=dialect))
+    assert clause in sql
+    assert "vibration_count" in sql.split(clause)[1]
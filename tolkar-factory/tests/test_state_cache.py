@@ -0,0 +1,151 @@
+"""Materialized station state: publishing, versions and ETags"""
+
+import asyncio
+import time
+import uuid
+
+from database import AsyncSessionLocal
+import payloads
+import state_cache
+from payloads import not_modified
+from models import ProductionRun, SessionLocal
+from state_cache import StationStateCache, run_update
+
+
+def loaded_cache():
+    cache = StationStateCache()
+
+    async def load():
+        async with AsyncSessionLocal() as db:
+            await cache.load(db)
+
+    asyncio.run(load())
+    return cache, load
+
+
+def test_reload_without_changes_keeps_version_and_etag(database):
+    cache, load = loaded_cache()
+    version, etag = cache.version, cache.etag
+    published = []
+    cache.add_listener(lambda v, payload: published.append(v))
+
+    asyncio.run(load())
+
+    assert (cache.version, cache.etag) == (version, etag)
+    assert cache.loads == 2 and published == []
+
+
+def test_workers_with_the_same_state_share_an_etag(database):
+    worker_a, _ = loaded_cache()
+    worker_b, _ = loaded_cache()
+
+    etag_a = worker_a.snapshot_encoded().negotiate("gzip")[2]
+    etag_b = worker_b.snapshot_encoded().negotiate("gzip")[2]
+
+    assert worker_a.etag == worker_b.etag
+    assert not_modified(etag_a, etag_b)
+
+
+def test_update_publishes_once_per_change(database, station_ids):
+    cache, _ = loaded_cache()
+    version, etag = cache.version, cache.etag
+    published = []
+    cache.add_listener(lambda v, payload: published.append(v))
+    update = {"station_id": station_ids[0], "wip": 42, "ct": 61, "fpy": 93.5, "oee": 80.0, "status": "warning"}
+
+    cache.apply_updates([update])
+    cache.apply_updates([update])
+
+    assert cache.version == version + 1 and published == [version + 1]
+    assert cache.etag != etag
+    station = cache.snapshot()[1]["stations"][0]
+    assert (station["wip"], station["status"]) == (42, "warning")
+
+
+def test_update_with_unknown_station_applies_nothing(database, station_ids):
+    cache, _ = loaded_cache()
+    before = [dict(station) for station in cache.snapshot()[1]["stations"]]
+    version = cache.version
+
+    cache.apply_updates([
+        {"station_id": station_ids[0], "wip": 99, "ct": 99, "fpy": 50.0, "oee": 50.0, "status": "critical"},
+        {"station_id": 10_000, "wip": 1, "ct": 1, "fpy": 1.0, "oee": 1.0, "status": "ok"},
+    ])
+
+    assert cache.version == version
+    assert cache.snapshot()[1]["stations"] == before
+    assert cache.is_stale()
+
+
+def test_etags_are_strong_and_compared_weakly(database, monkeypatch):
+    monkeypatch.setattr(payloads, "COMPRESS_MIN_BYTES", 0)
+    cache, _ = loaded_cache()
+    plain, gzipped = cache.snapshot_encoded().negotiate(None)[2], cache.snapshot_encoded().negotiate("gzip")[2]
+    assert plain == cache.etag == f'"state-{cache._digest}"'
+    assert gzipped == f'"state-{cache._digest}-gzip"'
+    # Clients may send the weak form back; If-None-Match still matches it
+    assert not_modified(f"W/{plain}", plain)
+    assert not_modified(f'W/"x", {gzipped}', gzipped)
+    assert not not_modified(plain, gzipped)
+    assert not not_modified(None, plain)
+
+
+def test_write_through_and_reload_encode_the_same_bytes(database, station_ids):
+    writer, _ = loaded_cache()
+    run = ProductionRun(id=str(uuid.uuid4()), station_id=station_ids[1], batch_number="ETAG",
+                        wip=7, ct=52, fpy=95.5, oee=88.0, status="warning")
+    update = run_update(run)
+    with SessionLocal() as db:
+        db.add(run)
+        db.commit()
+    writer.apply_updates([update])
+
+    reader, _ = loaded_cache()
+
+    assert reader.snapshot_encoded().body == writer.snapshot_encoded().body
+    assert reader.etag == writer.etag
+    assert reader.snapshot()[1]["timestamp"] >= update["created_at"].isoformat()
+
+
+def test_concurrent_stale_polls_share_one_reload(database, monkeypatch):
+    cache, _ = loaded_cache()
+    monkeypatch.setattr(state_cache, "STATE_CACHE_MAX_AGE_SECONDS", 0.01)
+    queries = []
+    get_latest_runs = state_cache.get_latest_runs
+
+    async def counted(db, **kwargs):
+        queries.append(True)
+        await asyncio.sleep(0.05)
+        return await get_latest_runs(db, **kwargs)
+
+    monkeypatch.setattr(state_cache, "get_latest_runs", counted)
+    time.sleep(0.02)
+
+    async def polls():
+        return await asyncio.gather(*[cache.refresh(AsyncSessionLocal) for _ in range(20)])
+
+    results = asyncio.run(polls())
+
+    assert len(queries) == 1 and results.count(True) == 1
+    assert not cache.is_stale()
+
+
+def test_reload_overtaken_by_a_write_is_discarded(database, station_ids, monkeypatch):
+    cache, _ = loaded_cache()
+    get_latest_runs = state_cache.get_latest_runs
+    update = {"station_id": station_ids[0], "wip": 77, "ct": 70, "fpy": 90.0, "oee": 70.0, "status": "critical"}
+
+    async def write_during_queries(db, **kwargs):
+        rows = await get_latest_runs(db, **kwargs)
+        cache.apply_updates([update])
+        return rows
+
+    monkeypatch.setattr(state_cache, "get_latest_runs", write_during_queries)
+
+    async def reload():
+        async with AsyncSessionLocal() as db:
+            return await cache.load(db)
+
+    assert asyncio.run(reload()) is False
+    assert cache.loads_dropped == 1
+    assert cache.snapshot()[1]["stations"][0]["wip"] == 77